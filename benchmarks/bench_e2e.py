@@ -0,0 +1,99 @@
+"""代替サーバーを相手に check_rss_and_posting.py を通しで動かし、投稿のスループットとレイテンシを測る
+
+合成フィードをローカルHTTPサーバーから配信し、benchmarks/mock_api.py を X API の代わりに立てて
+`--target` 付きでスクリプトを実行します。DEBUG_CHECK と違い、クライアントの初期化・リトライ・
+レート制御も含めて計測されます。
+
+    python benchmarks/bench_e2e.py --size 1000 --latency-ms 120 --jitter-ms 40 --inject-429-rate 0.05
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_server import FeedServer  # noqa: E402
+from mock_api import MockAPIServer, MockConfig  # noqa: E402
+from synth_feeds import build_feeds  # noqa: E402
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts", "check_rss_and_posting.py")
+
+
+def run(size: int, items_per_day: int, minutes: int, config: MockConfig) -> dict:
+    """1回分を実行し、スクリプトの実行レポートと代替サーバーの集計を返す。"""
+    feed_body, toc_body, _ = build_feeds(size, items_per_day=items_per_day)
+    with FeedServer({"/feed.xml": feed_body, "/feed_toc.xml": toc_body}) as feeds, MockAPIServer(config) as api:
+        with tempfile.TemporaryDirectory() as work_dir:
+            report_path = os.path.join(work_dir, "report.json")
+            env = dict(
+                os.environ,
+                FEED_CACHE="0",
+                FEED_SNAPSHOT="0",
+                POST_OUTBOX_PATH=os.path.join(work_dir, "outbox.sqlite3"),
+                TOC_INDEX_PATH=os.path.join(work_dir, "toc.sqlite3"),
+                RUN_REPORT_PATH=report_path,
+                DEBUG_CHECK="0",
+            )
+            env.pop("GITHUB_OUTPUT", None)
+            subprocess.run(
+                [sys.executable, SCRIPT, feeds.url("/feed.xml"), feeds.url("/feed_toc.xml"), str(minutes), "--target", api.base_url],
+                env=env,
+                check=True,
+            )
+            with open(report_path, encoding="utf-8") as fh:
+                report = json.load(fh)
+        return {"report": report, "mock": api.stats()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1000, help="feed_toc.xml の項目数")
+    parser.add_argument("--items-per-day", type=int, default=120, help="1日あたりの詳細版項目数")
+    parser.add_argument("--minutes", type=int, default=60 * 24 * 30, help="スクリプトに渡す時間幅（分）")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="X API の応答遅延（ミリ秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="遅延の揺らぎ（±ミリ秒）")
+    parser.add_argument("--rate-limit", type=int, default=0, help="ウィンドウあたりの投稿上限（0 で無制限）")
+    parser.add_argument("--rate-window", type=float, default=900.0, help="レート制限のウィンドウ（秒）")
+    parser.add_argument("--inject-429-rate", type=float, default=0.0, help="ランダムに 429 を返す確率")
+    parser.add_argument("--retry-after", type=float, default=2.0, help="注入した 429 のリセットまでの秒数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 を返す確率")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力）")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        inject_429_rate=args.inject_429_rate,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    result = run(args.size, args.items_per_day, args.minutes, config)
+    latency = result["report"].get("latencies", {}).get("post_seconds", {})
+    post_seconds = result["report"].get("stages", {}).get("post", 0.0)
+    result["summary"] = {
+        "posts_sent": result["report"].get("values", {}).get("posts_sent", 0),
+        "post_stage_seconds": post_seconds,
+        "posts_per_second": (latency.get("count", 0) / post_seconds) if post_seconds else 0.0,
+        "p50": latency.get("p50"),
+        "p95": latency.get("p95"),
+        "p99": latency.get("p99"),
+    }
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""check_rss_and_posting.main() の各段階をフィードの大きさごとに計測するベンチマーク
+
+合成した feed.xml / feed_toc.xml をローカルHTTPサーバーから配信し、
+取得・パース・時間幅フィルタ・タイトル照合・本文生成・ポスト分割の時間を個別に測ります。
+本文生成とポスト分割は、f-string で組み立てる以前の方法（render / pack）と post_renderer.PostRenderer
+（render_compiled / pack_compiled）の両方を測ります。
+結果はJSONで出力するので、コミット間で比較できます。
+
+    python benchmarks/bench_pipeline.py --sizes 100 1000 10000 100000 --output bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from kanpo_tweet.feed_fetch import HTTPSession, fetch_feeds_concurrently  # noqa: E402
+from kanpo_tweet.feed_stream import entries_in_window, iter_entries, iter_items  # noqa: E402
+from kanpo_tweet.post_renderer import PostRenderer  # noqa: E402
+from kanpo_tweet.toc_matcher import group_toc_entries  # noqa: E402
+from kanpo_tweet.tweet_packer import pack_posts, weighted_length  # noqa: E402
+from local_server import FeedServer  # noqa: E402
+from synth_feeds import build_feeds  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+MINUTES = 720
+MAX_TWEET_LENGTH = 25000
+BASE_TAGS = "#官報 #官報通知"
+EXTRA = "👇各項目のリンクなどは以下項目ごとのリンクをご覧ください"
+END_MSG = "👇以下RSSビューワーwebで項目ごとで見ることも可能です\nhttps://kanpo-viewer.com"
+
+
+def _count_function():
+    """parse_tweet が使えればそれを、なければ近似値を使う。"""
+    try:
+        from twitter_text import parse_tweet
+    except ImportError:
+        return "weighted_length", weighted_length
+    return "parse_tweet", lambda text: parse_tweet(text).weightedLength
+
+
+def _to_toc_dicts(items: List[dict]) -> List[dict]:
+    return [
+        {
+            "title": item["title"],
+            "link": item["link"],
+            "description": item["description"],
+            "pubDate": item["published"].strftime("%Y-%m-%d %H:%M:%S, GMT"),
+            "categories": item["categories"],
+        }
+        for item in items
+    ]
+
+
+def render_issue(entry: dict, toc_entries: List[dict]):
+    """main() と同じ形式で、号の先頭文と各項目の文を作る。"""
+    header = f"📚{entry['title']}\n{entry['link']}\n\n{BASE_TAGS}\n\n{EXTRA}\n\n"
+    fragments = []
+    for toc_entry in toc_entries:
+        categories = toc_entry.get("categories", [])
+        if categories:
+            categories_tags = " ".join([f"#{cat}" for cat in categories])
+            fragments.append(f"{toc_entry.get('title', '')}\n{toc_entry.get('link', '')}\n{categories_tags}\n\n")
+    return header, fragments
+
+
+def _retained_bytes(func: Callable[[], object]) -> int:
+    """func() の戻り値が保持しているメモリ量（tracemalloc で測った増分）を返す。"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained
+
+
+def _measure(func: Callable[[], object], repeat: int) -> Dict[str, object]:
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - started)
+    return {"seconds": min(runs), "median": statistics.median(runs), "runs": runs, "_result": result}
+
+
+def bench_size(size: int, repeat: int, items_per_day: int, count_name: str, count: Callable[[str], int]) -> List[dict]:
+    feed_body, toc_body, newest = build_feeds(size, items_per_day=items_per_day)
+    window_start = newest + timedelta(minutes=1) - timedelta(minutes=MINUTES)
+    results = []
+
+    def _record(stage: str, measured: Dict[str, object], **extra) -> object:
+        value = measured.pop("_result")
+        results.append({"size": size, "stage": stage, **measured, **extra})
+        return value
+
+    with FeedServer({"/feed.xml": feed_body, "/feed_toc.xml": toc_body}) as server:
+        urls = [server.url("/feed.xml"), server.url("/feed_toc.xml")]
+
+        def _fetch():
+            session = HTTPSession()
+            tasks = fetch_feeds_concurrently(urls, lambda response: None, cache_dir="", session=session)
+            session.close()
+            return tasks
+
+        tasks = _record("fetch", _measure(_fetch, repeat), bytes=len(feed_body) + len(toc_body))
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            fetch_feeds_concurrently(urls, lambda response: None, cache_dir=cache_dir)
+            _record("fetch_304", _measure(lambda: fetch_feeds_concurrently(urls, lambda response: None, cache_dir=cache_dir), repeat))
+
+    toc_body = tasks[1].response.body
+    feed_body = tasks[0].response.body
+    _record("parse_full", _measure(lambda: sum(1 for _ in iter_items(toc_body)), repeat))
+    _record("parse_full_compact", _measure(lambda: sum(1 for _ in iter_entries(toc_body)), repeat))
+    toc_items = _record("window_filter", _measure(lambda: entries_in_window(toc_body, window_start), repeat))
+    _record("window_filter_compact", _measure(lambda: entries_in_window(toc_body, window_start, compact=True), repeat))
+    dict_bytes = _retained_bytes(lambda: list(iter_items(toc_body)))
+    entry_bytes = _retained_bytes(lambda: list(iter_entries(toc_body)))
+    results.append({
+        "size": size,
+        "stage": "memory",
+        "dict_bytes": dict_bytes,
+        "entry_bytes": entry_bytes,
+        "dict_bytes_per_item": dict_bytes / size,
+        "entry_bytes_per_item": entry_bytes / size,
+    })
+    main_items = entries_in_window(feed_body, window_start)
+    toc_entries = _to_toc_dicts(toc_items)
+    titles = [item["title"] for item in main_items]
+
+    groups = _record("match", _measure(lambda: group_toc_entries(titles, toc_entries), repeat), items=len(toc_entries), titles=len(titles))
+    _record(
+        "match_naive",
+        _measure(lambda: {title: [e for e in toc_entries if title in e.get("description", "")] for title in titles}, repeat),
+    )
+
+    rendered = _record("render", _measure(lambda: [render_issue(entry, groups[entry["title"]]) for entry in main_items], repeat))
+
+    def _pack():
+        return [pack_posts(header, fragments, END_MSG, max_length=MAX_TWEET_LENGTH, count=count) for header, fragments in rendered]
+
+    def _pack_naive():
+        # 以前の実装: 項目を足すたびに溜まった本文全体を数え直す
+        posts = 0
+        for header, fragments in rendered:
+            batch_text = header
+            for entry_text in fragments:
+                if count(batch_text + entry_text + END_MSG) > MAX_TWEET_LENGTH:
+                    posts += 1
+                    batch_text = entry_text
+                else:
+                    batch_text += entry_text
+            posts += 1
+        return posts
+
+    def _render_compiled():
+        # 実行ごとに新しく作る（項目の文のキャッシュが空の状態から測る。カテゴリのハッシュタグはモジュールで覚えている）
+        renderer = PostRenderer(viewer_url="https://kanpo-viewer.com")
+        return renderer, [(entry, renderer.render_fragments(groups[entry["title"]])) for entry in main_items]
+
+    renderer, compiled = _record("render_compiled", _measure(_render_compiled, repeat))
+
+    def _pack_compiled():
+        return [renderer.pack(entry, fragments, max_length=MAX_TWEET_LENGTH, count=count) for entry, fragments in compiled]
+
+    packed = _record("pack", _measure(_pack, repeat), counter=count_name)
+    packed_compiled = _record("pack_compiled", _measure(_pack_compiled, repeat), counter=count_name)
+    if packed_compiled != packed:
+        raise AssertionError("PostRenderer のポストが f-string で組み立てたものと一致しません")
+    _record("pack_naive", _measure(_pack_naive, repeat), counter=count_name)
+    results.append({"size": size, "stage": "summary", "main_items": len(main_items), "toc_items_in_window": len(toc_entries), "posts": sum(len(posts) for posts in packed)})
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="feed_toc.xml の項目数")
+    parser.add_argument("--repeat", type=int, default=3, help="各段階の繰り返し回数（最小値と中央値を出力）")
+    parser.add_argument("--items-per-day", type=int, default=120, help="1日あたりの詳細版項目数（時間幅内の件数）")
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力）")
+    args = parser.parse_args()
+
+    count_name, count = _count_function()
+    report = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "items_per_day": args.items_per_day,
+        },
+        "results": [],
+    }
+    for size in args.sizes:
+        print(f"size={size} ...", file=sys.stderr)
+        report["results"].extend(bench_size(size, args.repeat, args.items_per_day, count_name, count))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""詳細版の全文検索インデックス（kanpo_tweet/toc_index.py）の取り込みと検索の時間を測るベンチマーク
+
+合成した feed_toc.xml を取り込み、キーワード（trigram / 2文字の LIKE）・カテゴリ・期間・その組み合わせで
+検索したときの1回あたりの時間（中央値・p95）と、同じ条件で本文を毎回パースして探した場合の時間を比べます。
+
+    python benchmarks/bench_toc_index.py --sizes 1000 10000 100000 --output bench_index.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from kanpo_tweet.feed_stream import iter_entries  # noqa: E402
+from kanpo_tweet.toc_index import TocIndex  # noqa: E402
+from synth_feeds import build_feeds  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+
+def _timings(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        runs.append(time.perf_counter() - started)
+    runs.sort()
+    return {
+        "median_ms": statistics.median(runs) * 1000,
+        "p95_ms": runs[min(len(runs) - 1, int(len(runs) * 0.95))] * 1000,
+        "results": len(result) if result is not None else 0,
+    }
+
+
+def bench_size(size: int, repeat: int) -> List[dict]:
+    _, toc_body, newest = build_feeds(size)
+    since = newest - timedelta(days=7)
+    queries = {
+        "keyword": dict(keyword="道路交通法"),
+        "keyword_short": dict(keyword="電波"),
+        "category": dict(category="告示"),
+        "date_range": dict(since=since),
+        "combined": dict(keyword="所得税法", category="法律", since=since),
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        index = TocIndex(os.path.join(work_dir, "toc.sqlite3"))
+        started = time.perf_counter()
+        added = index.ingest(toc_body)
+        results.append({"size": size, "stage": "ingest", "seconds": time.perf_counter() - started, "added": added})
+        started = time.perf_counter()
+        index.ingest(toc_body)
+        results.append({"size": size, "stage": "ingest_unchanged", "seconds": time.perf_counter() - started})
+
+        for name, query in queries.items():
+            results.append({"size": size, "stage": f"search_{name}", **_timings(lambda: index.search(**query), repeat)})
+        index.close()
+
+    # 比較: インデックスなしで毎回本文をパースして同じ条件（キーワード）で探す
+    def _scan():
+        return [entry for entry in iter_entries(toc_body) if "道路交通法" in entry.title or "道路交通法" in entry.description][:50]
+
+    results.append({"size": size, "stage": "scan_keyword", **_timings(_scan, max(1, repeat // 10))})
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="feed_toc.xml の項目数")
+    parser.add_argument("--repeat", type=int, default=50, help="各検索の繰り返し回数")
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力）")
+    args = parser.parse_args()
+
+    report = {"results": []}
+    for size in args.sizes:
+        print(f"size={size} ...", file=sys.stderr)
+        report["results"].extend(bench_size(size, args.repeat))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""現在時刻（datetime.now）を固定して kanpo_tweet のコマンドを実行する
+
+時間幅の起点や対象日（当日 JST）は datetime.now から決まるので、記録した日のフィードを後から
+同じ結果で動かすために使います（benchmarks/replay.py がサブプロセスとして起動します）。
+固定するのは datetime.now / utcnow だけで、time.time / time.perf_counter は実時間のままです
+（所要時間・レート制御・リトライの待ち時間はそのまま計測されます）。
+
+    python benchmarks/frozen_clock.py 2026-10-16T23:35:00+00:00 post <rss_url> <rss_toc_url> 720 --target <URL>
+"""
+
+import importlib
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+
+class FrozenDatetime(datetime):
+    """now() / utcnow() が frozen_at を返す datetime。"""
+
+    frozen_at = datetime.now(timezone.utc)
+
+    @classmethod
+    def now(cls, tz=None):
+        if tz is None:
+            return cls.frozen_at.astimezone().replace(tzinfo=None)
+        return cls.frozen_at.astimezone(tz)
+
+    @classmethod
+    def utcnow(cls):
+        return cls.frozen_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def freeze(frozen_at: datetime, prefix: str = "kanpo_tweet") -> None:
+    """読み込み済みの prefix のモジュールの datetime を FrozenDatetime に差し替える。"""
+    if frozen_at.tzinfo is None:
+        raise ValueError(f"タイムゾーン付きの時刻を指定してください: {frozen_at.isoformat()}")
+    FrozenDatetime.frozen_at = frozen_at
+    for name, module in list(sys.modules.items()):
+        if (name == prefix or name.startswith(prefix + ".")) and getattr(module, "datetime", None) is datetime:
+            module.datetime = FrozenDatetime
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print("Usage: python benchmarks/frozen_clock.py <ISO8601 の時刻> <command> [args...]", file=sys.stderr)
+        return 2
+    frozen_at = datetime.fromisoformat(argv[0])
+    command = argv[1]
+
+    from kanpo_tweet import cli
+
+    if command in cli.COMMANDS:
+        # コマンドのモジュールを先に読み込んでから時刻を固定する
+        importlib.import_module(cli.COMMANDS[command].module)
+    freeze(frozen_at)
+    return cli.main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,291 @@
+"""X API v2（create_tweet）と Gemini（generate_content）のローカル代替サーバー
+
+1つのサーバーで両方のエンドポイントに応答します。各スクリプトを `--target http://127.0.0.1:8700`
+で起動すると、本物のAPIの代わりにここへ投稿・要約リクエストが送られます。
+
+    python benchmarks/mock_api.py --port 8700 --latency-ms 120 --jitter-ms 40 --rate-limit 50 --error-rate 0.02
+
+`--model-latency gemini-2.5-flash-lite=20000` のようにモデルごとの遅延を指定すると、
+締め切り・ヘッジ（GEMINI_DEADLINE_SECONDS / GEMINI_HEDGE_MODEL）の動作を確認できます。
+
+エンドポイント:
+    POST /2/tweets                                  create_tweet
+    POST /v1beta/models/<model>:generateContent     generate_content
+    POST /v1beta/models/<model>:streamGenerateContent?alt=sse
+                                                    generate_content_stream（1行ずつ SSE で返す）
+    GET  /__stats                                   受け付けたリクエストの集計（JSON）
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+_GENERATE_RE = re.compile(r"^/v1(?:beta|alpha)?/models/([^/:]+):(generateContent|streamGenerateContent)$")
+
+
+class MockConfig:
+    """応答の遅延・レート制限・失敗の注入設定。"""
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        jitter_ms: float = 0.0,
+        rate_limit: int = 0,
+        rate_window: float = 900.0,
+        inject_429_rate: float = 0.0,
+        retry_after: float = 2.0,
+        error_rate: float = 0.0,
+        gemini_latency_ms: Optional[float] = None,
+        model_latency_ms: Optional[Dict[str, float]] = None,
+        stream_interval_ms: float = 20.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.inject_429_rate = inject_429_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.gemini_latency_ms = latency_ms if gemini_latency_ms is None else gemini_latency_ms
+        # モデルごとの最初の応答までの遅延（gemini_latency_ms より優先）と、ストリーミングのチャンク間隔
+        self.model_latency_ms = dict(model_latency_ms or {})
+        self.stream_interval_ms = stream_interval_ms
+        self.random = random.Random(seed)
+
+
+class MockAPIServer:
+    """X / Gemini の代替サーバー。別スレッドで動き、with 文で停止できる。"""
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.tweets: List[dict] = []
+        self.generations: List[dict] = []
+        self.responses = {"201": 0, "200": 0, "429": 0, "503": 0}
+        self._lock = threading.Lock()
+        self._window_started = time.time()
+        self._window_used = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, str(value))
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.responses[str(status)] = server.responses.get(str(status), 0) + 1
+
+            def _read_json(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                try:
+                    return json.loads(raw or b"{}")
+                except ValueError:
+                    return {}
+
+            def do_GET(self):
+                if self.path == "/__stats":
+                    self._send_json(200, server.stats())
+                    return
+                self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                payload = self._read_json()
+                path = self.path.split("?", 1)[0]
+                if path == "/2/tweets":
+                    server._handle_tweet(self, payload)
+                    return
+                match = _GENERATE_RE.match(path)
+                if match:
+                    server._handle_generate(self, match.group(1), payload, stream=match.group(2) == "streamGenerateContent")
+                    return
+                self._send_json(404, {"error": "not found"})
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _sleep(self, latency_ms: float) -> None:
+        jitter = self.config.random.uniform(-self.config.jitter_ms, self.config.jitter_ms) if self.config.jitter_ms else 0.0
+        time.sleep(max(0.0, latency_ms + jitter) / 1000)
+
+    def _rate_headers(self) -> dict:
+        """現在のウィンドウの残り回数を消費し、x-rate-limit-* ヘッダーを返す。枯渇時は None。"""
+        with self._lock:
+            now = time.time()
+            if now - self._window_started >= self.config.rate_window:
+                self._window_started = now
+                self._window_used = 0
+            reset = int(self._window_started + self.config.rate_window)
+            if self.config.rate_limit and self._window_used >= self.config.rate_limit:
+                return {"x-rate-limit-limit": self.config.rate_limit, "x-rate-limit-remaining": 0, "x-rate-limit-reset": reset, "_exhausted": True}
+            self._window_used += 1
+            limit = self.config.rate_limit or 10**6
+            return {"x-rate-limit-limit": limit, "x-rate-limit-remaining": limit - self._window_used, "x-rate-limit-reset": reset}
+
+    def _handle_tweet(self, handler, payload: dict) -> None:
+        self._sleep(self.config.latency_ms)
+        config = self.config
+        if config.inject_429_rate and config.random.random() < config.inject_429_rate:
+            reset = int(time.time() + config.retry_after)
+            handler._send_json(429, {"title": "Too Many Requests", "status": 429}, {"x-rate-limit-remaining": 0, "x-rate-limit-reset": reset})
+            return
+        headers = self._rate_headers()
+        if headers.pop("_exhausted", False):
+            handler._send_json(429, {"title": "Too Many Requests", "status": 429}, headers)
+            return
+        if config.error_rate and config.random.random() < config.error_rate:
+            handler._send_json(503, {"title": "Service Unavailable", "status": 503}, headers)
+            return
+        with self._lock:
+            tweet_id = str(1_900_000_000_000_000_000 + len(self.tweets) + 1)
+            self.tweets.append({
+                "id": tweet_id,
+                "text": payload.get("text", ""),
+                "in_reply_to_tweet_id": (payload.get("reply") or {}).get("in_reply_to_tweet_id"),
+                "received_at": time.time(),
+            })
+        handler._send_json(201, {"data": {"id": tweet_id, "text": payload.get("text", "")}}, headers)
+
+    def _handle_generate(self, handler, model: str, payload: dict, stream: bool = False) -> None:
+        self._sleep(self.config.model_latency_ms.get(model, self.config.gemini_latency_ms))
+        config = self.config
+        if config.inject_429_rate and config.random.random() < config.inject_429_rate:
+            message = f"Resource has been exhausted. Please retry in {config.retry_after}s."
+            handler._send_json(429, {"error": {"code": 429, "message": message, "status": "RESOURCE_EXHAUSTED"}})
+            return
+        if config.error_rate and config.random.random() < config.error_rate:
+            handler._send_json(503, {"error": {"code": 503, "message": "The model is overloaded.", "status": "UNAVAILABLE"}})
+            return
+        prompt = "".join(
+            part.get("text", "")
+            for content in payload.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        titles = re.findall(r"【([^】]+)】", prompt)
+        lines = [f"・{title}" for title in titles[:20]] or ["・本日の官報の要約（モック）"]
+        text = "本日の官報（モック要約）\n" + "\n".join(lines) + "\nhttps://kanpo-viewer.com\n#官報 #官報通知"
+        with self._lock:
+            self.generations.append({"model": model, "prompt_chars": len(prompt), "stream": stream, "received_at": time.time()})
+        usage = {"promptTokenCount": len(prompt), "candidatesTokenCount": len(text), "totalTokenCount": len(prompt) + len(text)}
+        if not stream:
+            handler._send_json(200, {
+                "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP", "index": 0}],
+                "usageMetadata": usage,
+                "modelVersion": model,
+            })
+            return
+        self._stream_text(handler, model, text, usage)
+
+    def _stream_text(self, handler, model: str, text: str, usage: dict) -> None:
+        """1行ずつ SSE のチャンクとして返す（最後のチャンクに usageMetadata と finishReason を付ける）。"""
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        lines = text.splitlines(keepends=True)
+        for index, line in enumerate(lines):
+            if index:
+                time.sleep(self.config.stream_interval_ms / 1000)
+            chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": line}]}, "index": 0}], "modelVersion": model}
+            if index == len(lines) - 1:
+                chunk["candidates"][0]["finishReason"] = "STOP"
+                chunk["usageMetadata"] = usage
+            try:
+                handler.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n".encode("utf-8"))
+                handler.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # クライアントが打ち切った（締め切り・ヘッジの勝敗が決まった）
+                break
+        with self._lock:
+            self.responses["200"] = self.responses.get("200", 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"tweets": len(self.tweets), "generations": len(self.generations), "responses": dict(self.responses)}
+
+    def start(self) -> "MockAPIServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="X API の応答遅延（ミリ秒）")
+    parser.add_argument("--gemini-latency-ms", type=float, help="Gemini の応答遅延（省略時は --latency-ms）")
+    parser.add_argument(
+        "--model-latency",
+        action="append",
+        default=[],
+        metavar="MODEL=MS",
+        help="モデルごとの Gemini の応答遅延（ミリ秒、複数指定可）",
+    )
+    parser.add_argument("--stream-interval-ms", type=float, default=20.0, help="ストリーミングのチャンク間隔（ミリ秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="遅延の揺らぎ（±ミリ秒）")
+    parser.add_argument("--rate-limit", type=int, default=0, help="ウィンドウあたりの投稿上限（0 で無制限）")
+    parser.add_argument("--rate-window", type=float, default=900.0, help="レート制限のウィンドウ（秒）")
+    parser.add_argument("--inject-429-rate", type=float, default=0.0, help="ランダムに 429 を返す確率")
+    parser.add_argument("--retry-after", type=float, default=2.0, help="注入した 429 のリセットまでの秒数")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="503 を返す確率")
+    parser.add_argument("--seed", type=int, help="乱数のシード")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        inject_429_rate=args.inject_429_rate,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        gemini_latency_ms=args.gemini_latency_ms,
+        model_latency_ms={name: float(ms) for name, _, ms in (item.partition("=") for item in args.model_latency)},
+        stream_interval_ms=args.stream_interval_ms,
+        seed=args.seed,
+    )
+    server = MockAPIServer(config, host=args.host, port=args.port)
+    print(f"mock API: {server.base_url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+        print(json.dumps(server.stats(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
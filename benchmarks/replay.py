@@ -0,0 +1,539 @@
+"""実際の日のフィードと X / Gemini とのやり取りを記録し、時刻を固定して再生する回帰・性能テスト
+
+record: フィード（引数の http(s):// / file:// / ローカルパス）を取得して本文を保存し、ローカルHTTPサーバーから
+配信してコマンドを実行します。X / Gemini へのリクエストは中継サーバーを通して上流（既定は benchmarks/mock_api.py、
+production で本物のAPI）へ送り、リクエストの本文と応答を時刻付きで保存します（認証ヘッダーは保存しません）。
+
+replay: 保存した本文を配信し、記録時の時刻に固定して（benchmarks/frozen_clock.py）同じコマンドを実行します。
+X / Gemini には記録した応答を返し、投稿したポストと標準出力が記録と同じかを確かめて、段階ごとの所要時間を出力します。
+一致しない記録が1つでもあれば終了コード 1 です。照合・分割・パースの変更を、号外の多い日など実際の日で比較できます。
+
+    python benchmarks/replay.py record .cache/recordings/2026-10-17 post https://kanpo-viewer.com/feed.xml https://kanpo-viewer.com/feed_toc.xml 720
+    python benchmarks/replay.py record --gemini production .cache/recordings/2026-10-17-gemini summarize https://kanpo-viewer.com/feed_toc.xml
+    python benchmarks/replay.py replay .cache/recordings/* --repeat 3 --output replay.json
+
+記録のディレクトリ:
+    recording.json   コマンド・引数・固定した時刻・フィード・投稿したポスト・記録時の実行レポート
+    feeds/           取得したフィードの本文
+    exchanges.jsonl  X / Gemini とのやり取り（1行1件）
+
+記録・再生とも、スナップショット・フィードのキャッシュは使わず（FEED_SNAPSHOT=0 / FEED_CACHE=0）、
+アウトボックス・詳細版のインデックス・要約のキャッシュは実行ごとの一時ディレクトリに作ります。
+常駐モード（--watch）は記録できません。
+"""
+
+import abc
+import argparse
+import base64
+import difflib
+import hashlib
+import itertools
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from local_server import FeedServer  # noqa: E402
+from mock_api import MockAPIServer, MockConfig  # noqa: E402
+
+RECORDING_VERSION = 1
+FROZEN_CLOCK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frozen_clock.py")
+PRODUCTION_UPSTREAMS = {"x": "https://api.twitter.com", "gemini": "https://generativelanguage.googleapis.com"}
+# --target で X / Gemini の接続先を変えられるコマンド
+TARGET_COMMANDS = ("post", "summarize")
+# 保存・中継するレスポンスヘッダー
+RESPONSE_HEADERS = ("content-type", "x-rate-limit-limit", "x-rate-limit-remaining", "x-rate-limit-reset", "retry-after")
+# 上流へ中継しないリクエストヘッダー（本文は展開済みで受け取る）
+_HOP_HEADERS = {"host", "content-length", "connection", "keep-alive", "transfer-encoding", "accept-encoding"}
+_FILE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+DIFF_LINES = 40
+
+
+def api_of(path: str) -> str:
+    """リクエストのパスから X / Gemini のどちら宛てかを返す。"""
+    return "x" if path.startswith("/2/") else "gemini"
+
+
+def canonical_body(text: str) -> str:
+    """JSON の本文はキーの順序によらず比べられる形にする。"""
+    try:
+        return json.dumps(json.loads(text), ensure_ascii=False, sort_keys=True)
+    except ValueError:
+        return text
+
+
+def _encode_body(payload: bytes) -> dict:
+    try:
+        return {"body": payload.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"body_base64": base64.b64encode(payload).decode("ascii")}
+
+
+def _decode_body(data: dict) -> bytes:
+    if "body_base64" in data:
+        return base64.b64decode(data["body_base64"])
+    return data.get("body", "").encode("utf-8")
+
+
+def posts_of(exchanges: List[dict]) -> List[dict]:
+    """X への投稿のうち受け付けられた（2xx）ものを、投稿した順に返す。"""
+    posts = []
+    for exchange in exchanges:
+        if exchange["api"] != "x" or not 200 <= exchange["status"] < 300:
+            continue
+        try:
+            payload = json.loads(exchange["request"])
+        except ValueError:
+            continue
+        posts.append({
+            "text": payload.get("text", ""),
+            "in_reply_to_tweet_id": (payload.get("reply") or {}).get("in_reply_to_tweet_id"),
+        })
+    return posts
+
+
+class _APIServer(abc.ABC):
+    """X / Gemini 宛てのリクエストを受けて respond() の結果を返すサーバー。別スレッドで動き、with 文で停止できる。"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.exchanges: List[dict] = []
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                headers = {name: value for name, value in self.headers.items() if name.lower() not in _HOP_HEADERS}
+                status, response_headers, payload = server.respond(self.command, self.path, headers, body)
+                self.send_response(status)
+                for name, value in response_headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @abc.abstractmethod
+    def respond(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        """1件のリクエストに対する (ステータス, ヘッダー, 本文) を返す。"""
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+class RecordingProxy(_APIServer):
+    """リクエストを上流へ中継し、本文と応答を時刻付きで記録する。"""
+
+    def __init__(self, upstreams: Dict[str, str], timeout: float = 300.0):
+        super().__init__()
+        self.upstreams = {api: url.rstrip("/") for api, url in upstreams.items()}
+        self.timeout = timeout
+
+    def respond(self, method, path, headers, body):
+        api = api_of(path)
+        request = urllib.request.Request(self.upstreams[api] + path, data=body or None, headers=headers, method=method)
+        started_at = time.time()
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, response_headers, payload = response.status, response.headers, response.read()
+        except urllib.error.HTTPError as error:
+            status, response_headers, payload = error.code, error.headers, error.read()
+        except OSError as error:
+            status, response_headers, payload = 502, {}, json.dumps({"error": str(error)}).encode("utf-8")
+        kept = {name: value for name, value in response_headers.items() if name.lower() in RESPONSE_HEADERS}
+        with self._lock:
+            self.exchanges.append({
+                "seq": len(self.exchanges),
+                "api": api,
+                "method": method,
+                "path": path,
+                "request": body.decode("utf-8", "replace"),
+                "status": status,
+                "headers": kept,
+                **_encode_body(payload),
+                "started_at": started_at,
+                "seconds": time.perf_counter() - started,
+            })
+        return status, kept, payload
+
+
+class ReplayServer(_APIServer):
+    """記録した応答を返す。
+
+    同じ宛先・同じ本文の記録を先頭から順に使います。本文が一致しない場合も、同じ宛先の次の記録を返して
+    先へ進めます（スレッドの返信先を記録どおりに保つため。一致しなかったことは exchanges に残します）。
+    latency=True の場合は記録時と同じ秒数だけ待ってから返します。
+    """
+
+    def __init__(self, recorded: List[dict], latency: bool = False):
+        super().__init__()
+        self.recorded = recorded
+        self.latency = latency
+        self._canonical = [canonical_body(exchange["request"]) for exchange in recorded]
+        self._used = [False] * len(recorded)
+
+    def _match(self, api: str, path: str, canonical: str) -> Tuple[Optional[int], bool]:
+        candidates = [index for index, exchange in enumerate(self.recorded) if not self._used[index] and exchange["api"] == api]
+        for index in candidates:
+            if self.recorded[index]["path"] == path and self._canonical[index] == canonical:
+                return index, True
+        for index in candidates:
+            if self.recorded[index]["path"].split("?", 1)[0] == path.split("?", 1)[0]:
+                return index, False
+        return None, False
+
+    def respond(self, method, path, headers, body):
+        api = api_of(path)
+        request = body.decode("utf-8", "replace")
+        with self._lock:
+            index, exact = self._match(api, path, canonical_body(request))
+            if index is not None:
+                self._used[index] = True
+            recorded = self.recorded[index] if index is not None else None
+            self.exchanges.append({
+                "seq": len(self.exchanges),
+                "api": api,
+                "path": path,
+                "request": request,
+                "matched": None if recorded is None else recorded["seq"],
+                "exact": exact,
+                "status": 500 if recorded is None else recorded["status"],
+            })
+        if recorded is None:
+            return 500, {"Content-Type": "application/json"}, json.dumps({"error": f"記録にないリクエストです: {path}"}).encode("utf-8")
+        if self.latency:
+            time.sleep(recorded["seconds"])
+        return recorded["status"], dict(recorded["headers"]), _decode_body(recorded)
+
+    def unused(self) -> int:
+        with self._lock:
+            return self._used.count(False)
+
+
+def _feed_args(args: List[str]) -> List[int]:
+    """引数のうちフィード（http(s):// / file:// / 存在するファイル）の位置。"""
+    return [
+        index
+        for index, arg in enumerate(args)
+        if arg.startswith(("http://", "https://", "file://")) or os.path.isfile(arg)
+    ]
+
+
+def run_command(command: str, args: List[str], frozen_at: datetime, env: Optional[Dict[str, str]] = None) -> dict:
+    """時刻を固定してコマンドを1回実行し、終了コード・標準出力・所要時間・実行レポートを返す。"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        report_path = os.path.join(work_dir, "report.json")
+        run_env = dict(
+            os.environ,
+            FEED_CACHE="0",
+            FEED_SNAPSHOT="0",
+            POST_OUTBOX_PATH=os.path.join(work_dir, "outbox.sqlite3"),
+            TOC_INDEX_PATH=os.path.join(work_dir, "toc.sqlite3"),
+            GEMINI_CACHE_PATH=os.path.join(work_dir, "summaries.sqlite3"),
+            RUN_REPORT_PATH=report_path,
+            DEBUG_CHECK="0",
+            DEBUG_GEMINI_POST="0",
+            **(env or {}),
+        )
+        run_env.pop("GITHUB_OUTPUT", None)
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, FROZEN_CLOCK, frozen_at.isoformat(), command, *args],
+            env=run_env,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+        )
+        wall_seconds = time.perf_counter() - started
+        report = {}
+        if os.path.exists(report_path):
+            with open(report_path, encoding="utf-8") as fh:
+                report = json.load(fh)
+    return {"returncode": completed.returncode, "stdout": completed.stdout, "wall_seconds": wall_seconds, "report": report}
+
+
+def _upstream(api: str, value: str, mock: MockAPIServer) -> str:
+    """--x / --gemini の値（mock / production / ベースURL）から上流のURLを返す。"""
+    if value == "mock":
+        return mock.base_url
+    if value == "production":
+        return PRODUCTION_UPSTREAMS[api]
+    return value
+
+
+def record(directory: str, command: str, args: List[str], x: str = "mock", gemini: str = "mock") -> dict:
+    """コマンドを実行し、フィード・X / Gemini とのやり取り・投稿したポストを directory に保存する。"""
+    from kanpo_tweet.feed_fetch import fetch_feed
+
+    if os.path.exists(os.path.join(directory, "recording.json")):
+        raise ValueError(f"記録がすでにあります: {directory}")
+    if "--watch" in args or "--target" in args:
+        raise ValueError("--watch / --target 付きのコマンドは記録できません")
+    feed_indexes = _feed_args(args)
+    if not feed_indexes:
+        raise ValueError("フィードのURL（またはファイル）を引数に指定してください")
+
+    os.makedirs(os.path.join(directory, "feeds"), exist_ok=True)
+    frozen_at = datetime.now(timezone.utc).replace(microsecond=0)
+    feeds = []
+    bodies = {}
+    for number, index in enumerate(feed_indexes):
+        url = args[index]
+        response = fetch_feed(url, cache_dir="")
+        if response.status is None or not response.body:
+            raise RuntimeError(f"フィードを取得できません（{response.status}）: {url}")
+        name = f"{number}-" + _FILE_NAME_RE.sub("_", os.path.basename(url.split("?", 1)[0]) or "feed.xml")
+        with open(os.path.join(directory, "feeds", name), "wb") as fh:
+            fh.write(response.body)
+        bodies["/" + name] = response.body
+        feeds.append({
+            "arg_index": index,
+            "url": url,
+            "path": os.path.join("feeds", name),
+            "fetched_at": time.time(),
+            "bytes": len(response.body),
+            "sha1": hashlib.sha1(response.body).hexdigest(),
+        })
+
+    with MockAPIServer(MockConfig(latency_ms=0.0, stream_interval_ms=0.0)) as mock, FeedServer(bodies) as feed_server:
+        upstreams = {"x": _upstream("x", x, mock), "gemini": _upstream("gemini", gemini, mock)}
+        with RecordingProxy(upstreams) as proxy:
+            run_args = list(args)
+            for feed in feeds:
+                run_args[feed["arg_index"]] = feed_server.url("/" + os.path.basename(feed["path"]))
+            if command in TARGET_COMMANDS:
+                run_args += ["--target", proxy.base_url]
+            # 本物の X に投稿するときだけ投稿間隔（X_POST_MIN_INTERVAL）を守る
+            result = run_command(command, run_args, frozen_at, env=None if x == "production" else {"X_POST_MIN_INTERVAL": "0"})
+            exchanges = sorted(proxy.exchanges, key=lambda exchange: exchange["started_at"])
+
+    for seq, exchange in enumerate(exchanges):
+        exchange["seq"] = seq
+    with open(os.path.join(directory, "exchanges.jsonl"), "w", encoding="utf-8") as fh:
+        for exchange in exchanges:
+            fh.write(json.dumps(exchange, ensure_ascii=False) + "\n")
+    recording = {
+        "version": RECORDING_VERSION,
+        "command": command,
+        "args": args,
+        "frozen_at": frozen_at.isoformat(),
+        "upstreams": {"x": x, "gemini": gemini},
+        "feeds": feeds,
+        "returncode": result["returncode"],
+        "stdout": result["stdout"],
+        "posts": posts_of(exchanges),
+        "wall_seconds": result["wall_seconds"],
+        "report": result["report"],
+    }
+    with open(os.path.join(directory, "recording.json"), "w", encoding="utf-8") as fh:
+        json.dump(recording, fh, ensure_ascii=False, indent=2)
+        fh.write("\n")
+    return recording
+
+
+def load_recording(directory: str) -> Tuple[dict, List[dict], Dict[str, bytes]]:
+    with open(os.path.join(directory, "recording.json"), encoding="utf-8") as fh:
+        recording = json.load(fh)
+    if recording.get("version") != RECORDING_VERSION:
+        raise ValueError(f"記録の形式が違います（version {recording.get('version')}）: {directory}")
+    exchanges = []
+    with open(os.path.join(directory, "exchanges.jsonl"), encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                exchanges.append(json.loads(line))
+    bodies = {}
+    for feed in recording["feeds"]:
+        with open(os.path.join(directory, feed["path"]), "rb") as fh:
+            body = fh.read()
+        if hashlib.sha1(body).hexdigest() != feed["sha1"]:
+            raise ValueError(f"フィードの本文が記録時と違います: {feed['path']}")
+        bodies["/" + os.path.basename(feed["path"])] = body
+    return recording, exchanges, bodies
+
+
+def compare_posts(expected: List[dict], actual: List[dict]) -> List[dict]:
+    """ポストの違い（位置と unified diff）を返す。同じなら空のリスト。"""
+    mismatches = []
+    for index, (want, got) in enumerate(itertools.zip_longest(expected, actual)):
+        if want == got:
+            continue
+        diff = difflib.unified_diff(
+            (want or {}).get("text", "").splitlines(),
+            (got or {}).get("text", "").splitlines(),
+            "recorded",
+            "replay",
+            lineterm="",
+        )
+        mismatches.append({
+            "index": index,
+            "missing": got is None,
+            "unexpected": want is None,
+            "reply_to": [(want or {}).get("in_reply_to_tweet_id"), (got or {}).get("in_reply_to_tweet_id")],
+            "diff": list(itertools.islice(diff, DIFF_LINES)),
+        })
+    return mismatches
+
+
+def replay(directory: str, repeat: int = 1, latency: bool = False) -> dict:
+    """記録を repeat 回再生し、記録との一致と所要時間を返す。"""
+    recording, exchanges, bodies = load_recording(directory)
+    frozen_at = datetime.fromisoformat(recording["frozen_at"])
+    runs = []
+    with FeedServer(bodies) as feed_server:
+        args = list(recording["args"])
+        for feed in recording["feeds"]:
+            args[feed["arg_index"]] = feed_server.url("/" + os.path.basename(feed["path"]))
+        for _ in range(repeat):
+            with ReplayServer(exchanges, latency=latency) as server:
+                run_args = args + (["--target", server.base_url] if recording["command"] in TARGET_COMMANDS else [])
+                result = run_command(recording["command"], run_args, frozen_at, env={"X_POST_MIN_INTERVAL": "0"})
+                replayed = list(server.exchanges)
+                unused = server.unused()
+            mismatches = compare_posts(recording["posts"], posts_of(replayed))
+            runs.append({
+                **result,
+                "post_mismatches": mismatches,
+                "stdout_identical": result["stdout"] == recording["stdout"],
+                "returncode_identical": result["returncode"] == recording["returncode"],
+                "unmatched_requests": sum(1 for exchange in replayed if not exchange["exact"]),
+                "unused_exchanges": unused,
+            })
+
+    identical = all(
+        not run["post_mismatches"] and run["stdout_identical"] and run["returncode_identical"] and not run["unmatched_requests"]
+        for run in runs
+    )
+    best = min(runs, key=lambda run: run["wall_seconds"])
+    walls = [run["wall_seconds"] for run in runs]
+    return {
+        "recording": directory,
+        "command": recording["command"],
+        "frozen_at": recording["frozen_at"],
+        "identical": identical,
+        "posts": len(recording["posts"]),
+        "post_mismatches": next((run["post_mismatches"] for run in runs if run["post_mismatches"]), []),
+        "stdout_identical": all(run["stdout_identical"] for run in runs),
+        "unmatched_requests": max(run["unmatched_requests"] for run in runs),
+        "unused_exchanges": max(run["unused_exchanges"] for run in runs),
+        "wall_seconds": {"min": min(walls), "median": statistics.median(walls), "runs": walls},
+        "stages": best["report"].get("stages", {}),
+        "values": best["report"].get("values", {}),
+        "recorded": {"wall_seconds": recording["wall_seconds"], "stages": recording["report"].get("stages", {})},
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    record_parser = subparsers.add_parser("record", help="フィードと X / Gemini とのやり取りを記録する")
+    record_parser.add_argument("directory", help="記録を保存するディレクトリ")
+    record_parser.add_argument("command", choices=("check", "post", "summarize"), help="python -m kanpo_tweet のコマンド")
+    record_parser.add_argument("command_args", nargs=argparse.REMAINDER, help="コマンドの引数（フィードのURLを含む）")
+    # --x / --gemini はディレクトリより前に書く（コマンドより後ろはすべてコマンドの引数）
+    record_parser.add_argument(
+        "--x",
+        default="mock",
+        help="X の上流。mock（既定、benchmarks/mock_api.py）/ production（本物の X に投稿する）/ ベースURL",
+    )
+    record_parser.add_argument(
+        "--gemini",
+        default="mock",
+        help="Gemini の上流。mock（既定）/ production（本物の Gemini。GEMINI_API_KEY が必要）/ ベースURL",
+    )
+
+    replay_parser = subparsers.add_parser("replay", help="記録を再生し、投稿したポストが同じかを確かめる")
+    replay_parser.add_argument("directories", nargs="+", help="記録のディレクトリ")
+    replay_parser.add_argument("--repeat", type=int, default=1, help="各記録の再生回数（所要時間の最小値と中央値を出力）")
+    replay_parser.add_argument("--latency", action="store_true", help="X / Gemini の応答を記録時と同じ秒数だけ遅らせる")
+    replay_parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.mode == "record":
+        try:
+            recording = record(args.directory, args.command, args.command_args, x=args.x, gemini=args.gemini)
+        except (ValueError, RuntimeError) as error:
+            print(f"記録できません: {error}", file=sys.stderr)
+            return 2
+        summary = {
+            "recording": args.directory,
+            "frozen_at": recording["frozen_at"],
+            "returncode": recording["returncode"],
+            "feeds": {feed["url"]: feed["bytes"] for feed in recording["feeds"]},
+            "posts": len(recording["posts"]),
+            "wall_seconds": recording["wall_seconds"],
+        }
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+        return 0 if recording["returncode"] == 0 else 1
+
+    results = []
+    for directory in args.directories:
+        print(f"{directory} ...", file=sys.stderr)
+        results.append(replay(directory, repeat=args.repeat, latency=args.latency))
+    report = {
+        "meta": {"revision": _git_revision(), "python": sys.version.split()[0], "repeat": args.repeat, "latency": args.latency},
+        "identical": all(result["identical"] for result in results),
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+    return 0 if report["identical"] else 1
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+if __name__ == "__main__":
+    sys.exit(main())
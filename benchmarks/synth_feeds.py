@@ -0,0 +1,84 @@
+"""ベンチマーク用に官報RSS（feed.xml / feed_toc.xml）に似た合成フィードを生成する
+
+本体フィードには日ごとの号（本紙・号外・政府調達・特別号外）を、詳細版フィードには
+各号の目次項目（法令名・カテゴリ・PDFリンク、description に号名を含む）を新しい順に並べます。
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Tuple
+from xml.sax.saxutils import escape
+
+CATEGORIES = ["法律", "政令", "府令", "省令", "告示", "公告", "人事異動", "叙位・叙勲", "官庁報告", "公示", "会社その他", "地方自治"]
+SUBJECTS = ["地方税法", "所得税法", "道路交通法", "個人情報の保護に関する法律", "電波法", "食品衛生法", "建築基準法", "労働基準法", "国家公務員法", "特定商取引に関する法律"]
+VERBS = ["の一部を改正する法律", "施行令の一部を改正する政令", "施行規則の一部を改正する省令", "に基づく告示", "の施行期日を定める政令"]
+ISSUE_KINDS = [("本紙", 1), ("号外", 3), ("政府調達", 1), ("特別号外", 1)]
+
+
+def _issue_titles(day_index: int, day: datetime):
+    date_text = f"令和{day.year - 2018}年{day.month}月{day.day}日"
+    titles = []
+    for kind, count in ISSUE_KINDS:
+        for number in range(count):
+            issue_no = 1000 + day_index * 10 + number
+            titles.append(f"{date_text} {kind} 第{issue_no}号")
+    return titles
+
+
+def build_feeds(toc_items: int, seed: int = 0, items_per_day: int = 120, now: datetime = None) -> Tuple[bytes, bytes, datetime]:
+    """合成した (feed.xml, feed_toc.xml, 最新のpubDate) を返す。
+
+    Args:
+        toc_items (int): 詳細版フィードの項目数。
+        seed (int): 乱数のシード（同じ値なら同じフィードになる）。
+        items_per_day (int): 1日あたりの詳細版項目数（1日分が時間幅内のデータ量になる）。
+        now (datetime): 最新の号の公開日時（省略時は固定の日時）。
+    """
+    rng = random.Random(seed)
+    if now is None:
+        now = datetime(2026, 10, 16, 23, 30, tzinfo=timezone.utc)
+    days = max(1, -(-toc_items // items_per_day))
+
+    main_items = []
+    toc = []
+    remaining = toc_items
+    for day_index in range(days):
+        published = now - timedelta(days=day_index)
+        titles = _issue_titles(days - day_index, published + timedelta(hours=9))
+        for title in titles:
+            main_items.append(
+                "<item>"
+                f"<title>{escape(title)}</title>"
+                f"<link>https://www.kanpo.go.jp/{published:%Y%m%d}/{rng.randrange(10**8):08d}/index.html</link>"
+                f"<description>{escape(title)}</description>"
+                f"<guid isPermaLink=\"false\">{escape(title)}</guid>"
+                f"<pubDate>{format_datetime(published)}</pubDate>"
+                "</item>"
+            )
+        for position in range(min(items_per_day, remaining)):
+            issue = titles[position % len(titles)]
+            subject = rng.choice(SUBJECTS) + rng.choice(VERBS)
+            number = rng.randrange(1, 300)
+            categories = rng.sample(CATEGORIES, rng.randint(1, 3))
+            link = f"https://www.kanpo.go.jp/{published:%Y%m%d}/{published:%Y%m%d}h{number:05d}/pdf/{published:%Y%m%d}h{number:05d}{position:04d}.pdf"
+            toc.append(
+                "<item>"
+                f"<title>{escape(subject)}（第{number}号）</title>"
+                f"<link>{link}</link>"
+                f"<description>{escape(issue)} {escape(subject)} {position + 1}頁</description>"
+                + "".join(f"<category>{escape(category)}</category>" for category in categories)
+                + f"<guid isPermaLink=\"false\">{link}</guid>"
+                f"<pubDate>{format_datetime(published)}</pubDate>"
+                "</item>"
+            )
+        remaining -= min(items_per_day, remaining)
+
+    def _rss(items):
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<rss version="2.0"><channel><title>官報</title><link>https://kanpo-viewer.com</link>'
+            "<description>官報RSS（合成）</description>" + "".join(items) + "</channel></rss>"
+        ).encode("utf-8")
+
+    return _rss(main_items), _rss(toc), now
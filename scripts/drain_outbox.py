@@ -0,0 +1,78 @@
+"""アウトボックスに残っている投稿待ちのポストを再送するスクリプト
+
+投稿に失敗したポストや、途中で止まったスレッドの続きを、送信時刻（指数バックオフ）になったものから投稿します。
+--wait を指定すると、その秒数を上限に送信時刻まで待ちながら未投稿がなくなるまで繰り返します。
+
+    python scripts/drain_outbox.py --wait 600
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+from kanpo_tweet.post_outbox import PostOutbox, poster_sender
+from kanpo_tweet.run_metrics import metrics_run
+from kanpo_tweet.x_poster import get_default_poster
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する。"""
+    parser = argparse.ArgumentParser(description="アウトボックスに残っているポストを再送します。")
+    parser.add_argument("--wait", type=float, default=0.0, help="送信時刻まで待ちながら再送を続ける最大秒数（既定 0 = 1回だけ）")
+    parser.add_argument(
+        "--target",
+        default="production",
+        help="投稿先。production（既定）または代替サーバーのベースURL（例: http://127.0.0.1:8700）",
+    )
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    """送信時刻を過ぎたポストを投稿し、未投稿が残っていれば 1 を返す。"""
+    args = parse_args()
+    base_url = None if args.target == "production" else args.target
+    outbox = PostOutbox.from_env()
+    if outbox is None:
+        logging.warning("アウトボックスが無効です（POST_OUTBOX=0）。")
+        return 0
+    poster = get_default_poster(base_url=base_url)
+    if poster is None:
+        logging.error("X API の認証情報が環境変数に設定されていません。")
+        return 1
+
+    send = poster_sender(poster)
+    deadline = time.time() + args.wait
+    sent = failed = dead = 0
+    try:
+        while True:
+            result = outbox.drain(send)
+            sent += result.sent
+            failed += result.failed
+            dead += result.dead
+            next_at = outbox.next_attempt_at()
+            if not result.pending or next_at is None or next_at > deadline or time.time() >= deadline:
+                break
+            time.sleep(max(0.0, next_at - time.time()))
+    finally:
+        pending = outbox.pending_count()
+        outbox.close()
+
+    logging.info(f"アウトボックス: 投稿 {sent} 件 / 失敗 {failed} 件 / 諦め {dead} 件 / 未投稿 {pending} 件")
+    if "GITHUB_OUTPUT" in os.environ:
+        with open(os.environ["GITHUB_OUTPUT"], "a") as fh:
+            print(f"outbox={json.dumps({'sent': sent, 'failed': failed, 'dead': dead, 'pending': pending})}", file=fh)
+    return 1 if pending else 0
+
+
+if __name__ == "__main__":
+    with metrics_run("drain_outbox"):
+        status = main()
+    sys.exit(status)
@@ -0,0 +1,306 @@
+"""設定ファイルに書いた複数のフィード・アカウントへ、1回の実行でまとめて投稿するスクリプト
+
+    python scripts/fanout_post.py config/fanout.example.json 720
+    python scripts/fanout_post.py config/fanout.example.json 720 --account laws --dry-run
+
+処理の流れ:
+    1. 全アカウントが使うフィード（本体・詳細版）を重複なく同時に取得する
+    2. 各フィードをプロセスプールで1回だけパースする（本体は各アカウントの記録のうち最も古い時刻以降、
+       詳細版は新着の号に必要な時間幅だけ）
+    3. アカウントごとのスレッドで、記録（FeedSnapshot）との差分・絞り込み・投稿文の組み立て・投稿を行う
+
+アカウントごとに XPoster（クライアントとレートリミッター）・アウトボックス・記録を別々に持つので、
+1つのアカウントがレート制限で待っていても、ほかのアカウントの投稿は止まりません。
+設定ファイルの書き方は kanpo_tweet/fanout.py を参照してください。
+
+環境変数:
+    <credentials>API_KEY など: 各アカウントの認証情報（credentials が "X_" なら X_API_KEY など）。
+    FANOUT_PARSE_WORKERS: パースに使うプロセス数（既定: CPU数。1 以下ならこのプロセスでパースする）。
+    FANOUT_OUTBOX_DIR: アカウントごとのアウトボックスの保存先（既定: .cache/outbox/fanout）。
+    POST_OUTBOX* / FEED_SNAPSHOT*: check_rss_and_posting.py と同じ。
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from kanpo_tweet.fanout import AccountConfig, FanoutConfig, load_config, parse_window
+from kanpo_tweet.feed_entry import Entry
+from kanpo_tweet.feed_fetch import fetch_feeds_concurrently
+from kanpo_tweet.feed_snapshot import FeedSnapshot
+from kanpo_tweet.post_outbox import PostOutbox, poster_sender
+from kanpo_tweet.run_metrics import get_metrics, metrics_run
+from kanpo_tweet.summary_cache import make_key
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+PARSE_WORKERS = int(os.getenv("FANOUT_PARSE_WORKERS", str(os.cpu_count() or 1)))
+OUTBOX_DIR = os.getenv("FANOUT_OUTBOX_DIR") or os.path.join(".cache", "outbox", "fanout")
+
+
+@dataclass
+class AccountResult:
+    """アカウントごとの結果（ログと GITHUB_OUTPUT に出す）。
+
+    status は posted / no_update / dry_run / skipped（認証情報なし）/ failed（投稿に失敗したポストがある）/ error。
+    """
+
+    account: str
+    status: str = "no_update"
+    new_entries: int = 0
+    issues: int = 0
+    posts: int = 0
+    sent: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+
+def count_tweet_length(text: str) -> int:
+    """X の文字数カウント仕様での長さ。"""
+    from twitter_text import parse_tweet
+
+    return parse_tweet(text).weightedLength
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する。"""
+    parser = argparse.ArgumentParser(description="設定ファイルの各アカウントへ、フィードの更新をまとめて投稿します。")
+    parser.add_argument("config", help="設定ファイル（JSON）のパス")
+    parser.add_argument("minutes", type=int, help="記録がないアカウントで、何分前からの更新を新着とするか")
+    parser.add_argument(
+        "--target",
+        default="production",
+        help="投稿先。production（既定）または代替サーバーのベースURL（例: http://127.0.0.1:8080）",
+    )
+    parser.add_argument("--account", action="append", help="投稿するアカウント名（複数指定可。省略時は全アカウント）")
+    parser.add_argument("--dry-run", action="store_true", help="投稿せずに投稿文をログに出す（記録も更新しない）")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS, help="パースに使うプロセス数")
+    return parser.parse_args(argv)
+
+
+def parse_feeds(jobs: Dict[str, tuple], workers: int) -> Dict[str, List[Entry]]:
+    """{URL: (本文, 開始のエポック秒)} をパースする。2件以上かつ workers > 1 ならプロセスプールで並列に行う。"""
+    if workers <= 1 or len(jobs) <= 1:
+        return {url: parse_window(body, start_ts) for url, (body, start_ts) in jobs.items()}
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = {url: pool.submit(parse_window, body, start_ts) for url, (body, start_ts) in jobs.items()}
+        return {url: future.result() for url, future in futures.items()}
+
+
+def post_account(
+    account: AccountConfig,
+    snapshot: FeedSnapshot,
+    feed_items: List[Entry],
+    toc_items: List[Entry],
+    diff_time: datetime,
+    api_target: Optional[str],
+    dry_run: bool,
+) -> AccountResult:
+    """1つのアカウントの新着を選び、投稿文を組み立てて投稿する（アカウントごとのスレッドで実行する）。"""
+    started = time.perf_counter()
+    result = AccountResult(account=account.name)
+    metrics = get_metrics()
+    dry_run = dry_run or account.dry_run
+
+    poster = None
+    if not dry_run:
+        from kanpo_tweet.x_poster import RateLimiter, XPoster
+
+        limiter = RateLimiter(min_interval=account.min_interval) if account.min_interval is not None else None
+        poster = XPoster.from_env(prefix=account.credentials, base_url=api_target, limiter=limiter)
+
+    with snapshot.locked():
+        new_items = snapshot.select(feed_items, diff_time)
+        result.new_entries = len(new_items)
+        if not new_items:
+            if not dry_run:
+                snapshot.save()
+            result.seconds = time.perf_counter() - started
+            return result
+        if not dry_run and poster is None:
+            # 記録しないので、認証情報を設定した次の実行で改めて新着として扱われる
+            logging.warning(f"[{account.name}] {account.credentials}API_KEY などの認証情報がないため投稿をスキップします")
+            result.status = "skipped"
+            result.seconds = time.perf_counter() - started
+            return result
+
+        issues, groups = account.select(new_items, toc_items)
+        result.issues = len(issues)
+        outbox = None if dry_run else PostOutbox.from_env(path=os.path.join(OUTBOX_DIR, f"{account.name}.sqlite3"))
+        try:
+            if outbox is not None:
+                # 前回の実行で途中になったスレッドを先に続ける
+                drained = outbox.drain(poster_sender(poster))
+                result.sent += drained.sent
+                result.failed += drained.failed
+            for entry in issues:
+                posts = account.render(entry, groups[entry.title], count=count_tweet_length)
+                result.posts += len(posts)
+                metrics.incr("posts_built", len(posts))
+                logging.info(f"[{account.name}] {entry.title}: {len(groups[entry.title])} 項目を {len(posts)} ポストに分割")
+                if dry_run:
+                    for text in posts:
+                        logging.info(f"[{account.name}] (dry-run)\n{text}")
+                    continue
+                if outbox is not None:
+                    thread_key = f"{account.name}:{entry.link}#{make_key(posts)[:16]}"
+                    outbox.enqueue_thread(thread_key, posts)
+                    drained = outbox.drain(poster_sender(poster), thread_keys=[thread_key])
+                    result.sent += drained.sent
+                    result.failed += drained.failed
+                else:
+                    tweet_ids = poster.post_thread(posts)
+                    result.sent += sum(1 for tweet_id in tweet_ids if tweet_id is not None)
+                    result.failed += sum(1 for tweet_id in tweet_ids if tweet_id is None)
+        finally:
+            if outbox is not None:
+                outbox.close()
+
+        if dry_run:
+            result.status = "dry_run"
+        else:
+            # 失敗したポストはアウトボックスに残っているので、号は確認済みとして記録する
+            snapshot.mark(new_items)
+            snapshot.save()
+            result.status = "failed" if result.failed else "posted"
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def fanout(
+    config: FanoutConfig,
+    accounts: List[AccountConfig],
+    diff_time: datetime,
+    api_target: Optional[str],
+    dry_run: bool,
+    parse_workers: int,
+) -> List[AccountResult]:
+    """フィードを1回ずつ取得・パースし、アカウントごとのスレッドに振り分けて投稿する。"""
+    metrics = get_metrics()
+    feeds = {feed.name: feed for feed in config.feeds_in_use(accounts)}
+    snapshots = {}
+    for account in accounts:
+        rss_url = feeds[account.feed].rss_url
+        snapshot = FeedSnapshot.for_feed(rss_url, f"fanout:{account.name}") or FeedSnapshot()
+        snapshot.load()
+        snapshots[account.name] = snapshot
+
+    urls = list(dict.fromkeys(url for feed in feeds.values() for url in (feed.rss_url, feed.rss_toc_url)))
+    with metrics.stage("fetch"):
+        tasks = fetch_feeds_concurrently(urls, lambda response: None)
+    bodies = {task.response.url: task.response.body for task in tasks}
+
+    # 本体フィードは、そのフィードを使うアカウントの記録のうち最も古い時刻以降をパースする
+    feed_starts: Dict[str, float] = {}
+    for account in accounts:
+        rss_url = feeds[account.feed].rss_url
+        start = snapshots[account.name].start(diff_time).timestamp()
+        feed_starts[rss_url] = min(feed_starts.get(rss_url, start), start)
+    with metrics.stage("parse"):
+        feed_items = parse_feeds(
+            {url: (bodies[url], math.floor(start)) for url, start in feed_starts.items()}, parse_workers
+        )
+
+    # 詳細版は、新着になりうる号のうち最も古いものまで時間幅を広げてパースする（新着がなければパースしない）
+    toc_starts: Dict[str, float] = {}
+    for account in accounts:
+        feed = feeds[account.feed]
+        start = snapshots[account.name].start(diff_time)
+        candidates = [item.published for item in feed_items[feed.rss_url] if item.published and item.published >= start]
+        if candidates:
+            toc_start = min([diff_time] + candidates).timestamp()
+            toc_starts[feed.rss_toc_url] = min(toc_starts.get(feed.rss_toc_url, toc_start), toc_start)
+    with metrics.stage("parse"):
+        toc_items = parse_feeds(
+            {url: (bodies[url], math.floor(start)) for url, start in toc_starts.items()}, parse_workers
+        )
+    for url, items in toc_items.items():
+        logging.info(f"詳細版 {url}: {len(items)} 件")
+
+    # アカウントごとに別のスレッドで投稿する（レート制限の待ちはそのアカウントのスレッドだけで起きる）
+    with metrics.stage("post"), ThreadPoolExecutor(max_workers=len(accounts)) as executor:
+        futures = {
+            account.name: executor.submit(
+                post_account,
+                account,
+                snapshots[account.name],
+                feed_items[feeds[account.feed].rss_url],
+                toc_items.get(feeds[account.feed].rss_toc_url, []),
+                diff_time,
+                api_target,
+                dry_run,
+            )
+            for account in accounts
+        }
+        results = []
+        for name, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as error:  # noqa: BLE001 - 1つのアカウントの失敗でほかのアカウントの結果を失わない
+                logging.error(f"[{name}] 投稿処理に失敗しました: {error}")
+                results.append(AccountResult(account=name, status="error"))
+    return results
+
+
+def write_outputs(results: List[AccountResult]) -> None:
+    """GitHub Actions 用（または標準出力）に更新有無とアカウントごとの結果を出力する。"""
+    updated = any(result.new_entries for result in results)
+    accounts = [asdict(result) for result in results]
+    if "GITHUB_OUTPUT" in os.environ:
+        with open(os.environ["GITHUB_OUTPUT"], "a") as fh:
+            print(f"updated={'true' if updated else 'false'}", file=fh)
+            print(f"accounts={json.dumps(accounts, ensure_ascii=False)}", file=fh)
+    else:
+        print(json.dumps({"updated": updated, "accounts": accounts}, ensure_ascii=False, indent=2))
+
+
+def main() -> int:
+    """失敗したアカウントがあれば 1 を返す。"""
+    args = parse_args()
+    try:
+        config = load_config(args.config)
+    except (OSError, ValueError) as error:
+        logging.error(f"設定ファイルを読み込めません: {error}")
+        return 2
+    accounts = config.accounts
+    if args.account:
+        unknown = sorted(set(args.account) - {account.name for account in accounts})
+        if unknown:
+            logging.error(f"設定ファイルにないアカウントです: {', '.join(unknown)}")
+            return 2
+        accounts = [account for account in accounts if account.name in args.account]
+    api_target = None if args.target == "production" else args.target
+    if api_target:
+        logging.info(f"投稿先: {api_target}（代替サーバー）")
+    diff_time = datetime.now(timezone.utc) - timedelta(minutes=args.minutes)
+    logging.info(f"アカウント {len(accounts)} 件 / フィード {len(config.feeds_in_use(accounts))} 組 / {diff_time.isoformat()} 以降")
+
+    results = fanout(config, accounts, diff_time, api_target, args.dry_run, args.parse_workers)
+    metrics = get_metrics()
+    metrics.set("entries_in_window", sum(result.new_entries for result in results))
+    for result in results:
+        logging.info(
+            f"[{result.account}] {result.status}: 新着 {result.new_entries} 件 / 号 {result.issues} 件 / "
+            f"ポスト {result.posts} 件（投稿 {result.sent} 件・失敗 {result.failed} 件） {result.seconds:.2f}秒"
+        )
+    if api_target:
+        metrics.log_latency_summary("post_seconds", stage="post")
+    write_outputs(results)
+    return 1 if any(result.status in ("failed", "error") for result in results) else 0
+
+
+if __name__ == "__main__":
+    with metrics_run("fanout_post"):
+        status = main()
+    sys.exit(status)
@@ -0,0 +1 @@
+"""官報RSS-Tweet の各スクリプトで共有する処理をまとめたパッケージ"""
@@ -0,0 +1,7 @@
+"""python -m kanpo_tweet <command> の入口（kanpo_tweet/cli.py を参照）"""
+
+import sys
+
+from kanpo_tweet.cli import main
+
+sys.exit(main())
@@ -0,0 +1,89 @@
+"""check コマンド: 指定した時間幅内でRSSフィードの更新をチェックする（投稿はしない）
+
+    python -m kanpo_tweet check <rss_url> <minutes>
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+import os
+import logging
+import json
+
+from kanpo_tweet.feed_fetch import fetch_feed
+from kanpo_tweet.feed_snapshot import FeedSnapshot
+from kanpo_tweet.feed_stream import entries_in_window
+from kanpo_tweet.run_metrics import get_metrics
+
+
+def main(argv=None):
+    """指定した時間幅内でRSSフィードのエントリをチェックします。
+
+    引数（argv、省略時は sys.argv[1:]）:
+        argv[0]: RSSフィードのURL
+        argv[1]: 時間幅（分）。前回までの記録（FEED_SNAPSHOT）がある場合は初回だけ使う。
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        logging.error("使い方: python -m kanpo_tweet check <rss_url> <minutes>")
+        return 2
+    rss_url = argv[0]
+    minutes = int(argv[1])
+    window_start = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+
+    logging.info(f"RSS URL: {rss_url}")
+    logging.info(f"チェック時間幅: {minutes}分前 = {window_start.isoformat()}以降")
+
+    metrics = get_metrics()
+    with metrics.stage("fetch"):
+        response = fetch_feed(rss_url)
+    updated_entries = []
+    items = []
+    snapshot = FeedSnapshot.for_feed(rss_url, "check_rss")
+
+    if response.not_modified:
+        # 前回取得から変更がなければパースせずに「更新なし」とする（前回の本文は記録と突き合わせ済み）
+        logging.info("フィードは前回取得から変更されていません。更新なしとして扱います。")
+    elif snapshot is not None:
+        # 時間幅ではなく前回までの記録との差分で新着を決める
+        with snapshot.locked():
+            with metrics.stage("parse_filter"):
+                items = snapshot.delta(response.body, window_start, compact=True)
+            snapshot.mark(items)
+            snapshot.save()
+    else:
+        with metrics.stage("parse_filter"):
+            items = entries_in_window(response.body, window_start, compact=True)
+
+    for item in items:
+        logging.info(f"公開日時: {item.published.isoformat()}")
+        entry = item.to_output()
+        entry["summary"] = entry.pop("description")
+        updated_entries.append(entry)
+
+    is_updated = bool(updated_entries)
+    metrics.set("entries_in_window", len(updated_entries))
+
+    # 結果の出力
+    if "GITHUB_OUTPUT" in os.environ:
+        output_path = os.environ["GITHUB_OUTPUT"]
+        logging.info("GITHUB_OUTPUT環境変数が設定されています。出力を行います。")
+        with open(output_path, "a") as file_handle:
+            print(f"updated={'true' if is_updated else 'false'}", file=file_handle)
+            print(f"entries={json.dumps(updated_entries, ensure_ascii=False)}", file=file_handle)
+
+        logging.info(f"GITHUB_OUTPUTのパス: {output_path}")
+        try:
+            with open(output_path, "r") as file_handle:
+                content = file_handle.read()
+            logging.info("GITHUB_OUTPUTファイルの中身:")
+            logging.info(content)
+        except Exception as error:
+            logging.error(f"ファイル読み込みエラー: {error}")
+    else:
+        logging.info("ローカルで起動しているか、GITHUB_OUTPUT環境変数が未設定です。標準出力します。")
+        result = {"updated": is_updated, "entries": updated_entries}
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
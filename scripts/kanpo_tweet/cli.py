@@ -0,0 +1,56 @@
+"""官報RSS-Tweet のコマンドラインの入口（python -m kanpo_tweet <command>）
+
+    python -m kanpo_tweet check <rss_url> <minutes>
+    python -m kanpo_tweet post <rss_url> <rss_toc_url> <minutes> [--watch ...]
+    python -m kanpo_tweet summarize [rss_toc_url] [YYYY-MM-DD] [--from ... --to ...]
+
+ワークフローの実行は毎回 Python の起動から始まるため、ここではサブコマンドのモジュールだけを読み込み、
+tweepy・twitter_text・google.genai などの重い依存は各コマンドの中で使うときに初めて読み込みます
+（更新がない実行ではどれも読み込まれません）。scripts/check_rss*.py はこの入口を呼ぶだけのラッパーです。
+"""
+
+import importlib
+import sys
+from typing import List, NamedTuple, Optional
+
+from kanpo_tweet.run_metrics import metrics_run
+
+
+class Command(NamedTuple):
+    module: str
+    # 計測値（実行レポート）のスクリプト名。ダッシュボードの系列が変わらないように従来のスクリプト名にする
+    script: str
+    help: str
+
+
+COMMANDS = {
+    "check": Command("kanpo_tweet.check", "check_rss", "フィードの更新をチェックする（投稿しない）"),
+    "post": Command("kanpo_tweet.post", "check_rss_and_posting", "新着の号を詳細版の項目付きで X に投稿する"),
+    "summarize": Command("kanpo_tweet.summarize", "check_rss_gemini_and_posting", "当日分の詳細版を Gemini で要約して投稿する"),
+}
+
+
+def usage() -> str:
+    lines = ["使い方: python -m kanpo_tweet <command> [args...]", "", "command:"]
+    lines.extend(f"  {name:<10} {command.help}" for name, command in COMMANDS.items())
+    lines.append("")
+    lines.append("各コマンドの引数は python -m kanpo_tweet <command> --help で確認できます。")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """サブコマンドを実行し、終了コードを返す。"""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage(), file=sys.stdout if argv else sys.stderr)
+        return 0 if argv else 2
+    command = COMMANDS.get(argv[0])
+    if command is None:
+        print(f"不明なコマンドです: {argv[0]}\n\n{usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(command.module)
+    # argparse の使い方の表示（prog）をサブコマンド名にする
+    sys.argv = [f"python -m kanpo_tweet {argv[0]}", *argv[1:]]
+    with metrics_run(command.script):
+        status = module.main(argv[1:])
+    return status or 0
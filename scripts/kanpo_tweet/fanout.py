@@ -0,0 +1,220 @@
+"""設定ファイルで複数のフィード・アカウントへ投稿を振り分ける処理（scripts/fanout_post.py で使う）
+
+設定ファイル（JSON）には、取得するフィードの組（本体と詳細版）と、投稿するアカウントを書きます。
+アカウントごとに、使うフィード・認証情報の環境変数の接頭辞・ハッシュタグ・テンプレート・
+詳細版の項目の絞り込み（カテゴリ・タイトル）を指定できます。
+
+    {
+      "feeds": {
+        "kanpo": {"rss_url": "https://kanpo-viewer.com/feed.xml",
+                  "rss_toc_url": "https://kanpo-viewer.com/feed_toc.xml"}
+      },
+      "defaults": {"viewer_url": "https://kanpo-viewer.com"},
+      "accounts": [
+        {"name": "main", "feed": "kanpo", "credentials": "X_"},
+        {"name": "laws", "feed": "kanpo", "credentials": "X_LAWS_",
+         "hashtags": ["#官報", "#法令"], "filter": {"categories": ["法律", "政令"]}}
+      ]
+    }
+
+"defaults" の値は各アカウントの既定値になります。テンプレートは str.format の書式で、
+既定値は check_rss_and_posting.py の投稿文と同じです（post_renderer.DEFAULT_TEMPLATES を参照）。
+"""
+
+import json
+import re
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timezone
+from functools import cached_property
+from typing import Callable, Dict, List, Optional, Tuple
+
+from kanpo_tweet.feed_entry import Entry
+from kanpo_tweet.feed_stream import entries_in_window
+from kanpo_tweet.post_renderer import DEFAULT_EXTRA, DEFAULT_HASHTAGS, DEFAULT_TEMPLATES, DEFAULT_VIEWER_URL, PostRenderer
+from kanpo_tweet.toc_matcher import group_toc_entries
+from kanpo_tweet.tweet_packer import MAX_TWEET_LENGTH, PACK_MODES
+
+# アカウント名は保存先のファイル名にも使う
+_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+@dataclass(frozen=True)
+class FeedConfig:
+    """本体フィードと詳細版フィードの組。"""
+
+    name: str
+    rss_url: str
+    rss_toc_url: str
+
+
+@dataclass(frozen=True)
+class AccountFilter:
+    """アカウントに投稿する項目の条件。空の条件は絞り込まない。
+
+    Attributes:
+        categories (Tuple[str, ...]): 詳細版の項目のうち、いずれかのカテゴリを持つものだけを使う。
+            指定した場合、該当する項目が1つもない号は投稿しない。
+        exclude_categories (Tuple[str, ...]): いずれかのカテゴリを持つ詳細版の項目は使わない。
+        title_contains (Tuple[str, ...]): 号のタイトルにいずれかの文字列を含むものだけを投稿する。
+    """
+
+    categories: Tuple[str, ...] = ()
+    exclude_categories: Tuple[str, ...] = ()
+    title_contains: Tuple[str, ...] = ()
+
+    def accepts_issue(self, entry: Entry) -> bool:
+        return not self.title_contains or any(text in entry.title for text in self.title_contains)
+
+    def accepts_item(self, entry: Entry) -> bool:
+        if any(category in self.exclude_categories for category in entry.categories):
+            return False
+        return not self.categories or any(category in self.categories for category in entry.categories)
+
+
+@dataclass(frozen=True)
+class AccountConfig:
+    """投稿するアカウント1つ分の設定。
+
+    Attributes:
+        name (str): アカウントの名前（ログ・スナップショット・アウトボックスのファイル名に使う）。
+        feed (str): 使うフィードの名前（FanoutConfig.feeds のキー）。
+        credentials (str): 認証情報の環境変数の接頭辞（"X_" なら X_API_KEY などを読む）。
+        viewer_url (str): 末尾に付けるRSSビューワーのURL。
+        hashtags (Tuple[str, ...]): 1つ目のポストに付けるハッシュタグ。
+        extra (str): 1つ目のポストのハッシュタグの後に付ける文。
+        templates (Dict[str, str]): header / fragment / footer のテンプレート。
+        filter (AccountFilter): 投稿する項目の条件。
+        pack_mode (str): ポストへの詰め方（tweet_packer.PACK_MODES）。
+        max_length (int): ポストの上限文字数（重み付き）。
+        min_interval (Optional[float]): 投稿の最小間隔（秒）。省略時は X_POST_MIN_INTERVAL。
+        dry_run (bool): True の場合は投稿せずにログに出すだけにする。
+    """
+
+    name: str
+    feed: str
+    credentials: str = "X_"
+    viewer_url: str = DEFAULT_VIEWER_URL
+    hashtags: Tuple[str, ...] = DEFAULT_HASHTAGS
+    extra: str = DEFAULT_EXTRA
+    templates: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_TEMPLATES))
+    filter: AccountFilter = field(default_factory=AccountFilter)
+    pack_mode: str = "sequential"
+    max_length: int = MAX_TWEET_LENGTH
+    min_interval: Optional[float] = None
+    dry_run: bool = False
+
+    def select(self, issues: List[Entry], toc_entries: List[Entry]) -> Tuple[List[Entry], Dict[str, List[Entry]]]:
+        """このアカウントに投稿する号と、号のタイトルごとの詳細版の項目を返す。"""
+        issues = [entry for entry in issues if self.filter.accepts_issue(entry)]
+        toc_groups = group_toc_entries([entry.title for entry in issues], toc_entries)
+        groups = {}
+        for entry in issues:
+            groups[entry.title] = [item for item in toc_groups[entry.title] if item.categories and self.filter.accepts_item(item)]
+        if self.filter.categories:
+            issues = [entry for entry in issues if groups[entry.title]]
+        return issues, groups
+
+    @cached_property
+    def renderer(self) -> PostRenderer:
+        return PostRenderer(self.templates, hashtags=self.hashtags, extra=self.extra, viewer_url=self.viewer_url)
+
+    def render(self, entry: Entry, toc_items: List[Entry], count: Optional[Callable[[str], int]] = None) -> List[str]:
+        """1つの号のスレッド（ポスト本文のリスト）を作る。"""
+        return self.renderer.render_thread(entry, toc_items, max_length=self.max_length, mode=self.pack_mode, count=count)
+
+
+@dataclass(frozen=True)
+class FanoutConfig:
+    """設定ファイル全体。"""
+
+    feeds: Dict[str, FeedConfig]
+    accounts: List[AccountConfig]
+
+    def feeds_in_use(self, accounts: Optional[List[AccountConfig]] = None) -> List[FeedConfig]:
+        """accounts（省略時は全アカウント）が使うフィード（重複なし、設定ファイルの順）。"""
+        used = {account.feed for account in (self.accounts if accounts is None else accounts)}
+        return [feed for name, feed in self.feeds.items() if name in used]
+
+
+def _strings(value, where: str) -> Tuple[str, ...]:
+    if isinstance(value, str):
+        return (value,)
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{where} は文字列のリストで指定してください")
+    return tuple(value)
+
+
+def _account(data: dict, defaults: dict, feeds: Dict[str, FeedConfig]) -> AccountConfig:
+    merged = {**defaults, **data}
+    name = merged.get("name")
+    if not isinstance(name, str) or not _NAME_RE.match(name):
+        raise ValueError(f"アカウント名が不正です（英数字と _ . - のみ）: {name!r}")
+    known = {f.name for f in fields(AccountConfig)}
+    unknown = sorted(set(merged) - known)
+    if unknown:
+        raise ValueError(f"アカウント {name} に不明な項目があります: {', '.join(unknown)}")
+    if merged.get("feed") not in feeds:
+        raise ValueError(f"アカウント {name} のフィードが feeds にありません: {merged.get('feed')!r}")
+
+    templates = dict(DEFAULT_TEMPLATES)
+    templates.update(merged.get("templates") or {})
+    try:
+        PostRenderer(templates)
+    except ValueError as error:
+        raise ValueError(f"アカウント {name} の templates が不正です: {error}")
+    filter_data = merged.get("filter") or {}
+    unknown = sorted(set(filter_data) - {f.name for f in fields(AccountFilter)})
+    if unknown:
+        raise ValueError(f"アカウント {name} の filter に不明な項目があります: {', '.join(unknown)}")
+    if merged.get("pack_mode", "sequential") not in PACK_MODES:
+        raise ValueError(f"アカウント {name} の pack_mode が不正です: {merged['pack_mode']!r}")
+
+    merged["templates"] = templates
+    merged["filter"] = AccountFilter(
+        **{key: _strings(value, f"{name}.filter.{key}") for key, value in filter_data.items()}
+    )
+    if "hashtags" in merged:
+        merged["hashtags"] = _strings(merged["hashtags"], f"{name}.hashtags")
+    return AccountConfig(**merged)
+
+
+def parse_config(data: dict) -> FanoutConfig:
+    """設定（JSON を読み込んだ dict）を検証して FanoutConfig にする。
+
+    Raises:
+        ValueError: 必須の項目がない、フィード名・アカウント名が重複しているなど、設定が不正な場合。
+    """
+    feeds_data = data.get("feeds")
+    if not isinstance(feeds_data, dict) or not feeds_data:
+        raise ValueError("feeds にフィードを1つ以上指定してください")
+    feeds = {}
+    for name, feed in feeds_data.items():
+        if not isinstance(feed, dict) or not feed.get("rss_url") or not feed.get("rss_toc_url"):
+            raise ValueError(f"フィード {name} には rss_url と rss_toc_url を指定してください")
+        feeds[name] = FeedConfig(name=name, rss_url=feed["rss_url"], rss_toc_url=feed["rss_toc_url"])
+
+    accounts_data = data.get("accounts")
+    if not isinstance(accounts_data, list) or not accounts_data:
+        raise ValueError("accounts にアカウントを1つ以上指定してください")
+    defaults = data.get("defaults") or {}
+    accounts = [_account(account, defaults, feeds) for account in accounts_data]
+    names = [account.name for account in accounts]
+    duplicated = sorted({name for name in names if names.count(name) > 1})
+    if duplicated:
+        raise ValueError(f"アカウント名が重複しています: {', '.join(duplicated)}")
+    return FanoutConfig(feeds=feeds, accounts=accounts)
+
+
+def load_config(path: str) -> FanoutConfig:
+    """設定ファイル（JSON）を読み込む。"""
+    with open(path, "r", encoding="utf-8") as fh:
+        return parse_config(json.load(fh))
+
+
+def parse_window(body: bytes, start_ts: int) -> List[Entry]:
+    """本文のうち start_ts（エポック秒）以降のアイテムを Entry で返す（プロセスプールで実行する）。
+
+    時間幅に何もない場合でも、最新の pubDate のアイテムは含めます（スナップショットの初回の基準にするため）。
+    本文は1回だけ走査します。
+    """
+    return entries_in_window(body, datetime.fromtimestamp(start_ts, timezone.utc), compact=True, include_newest=True)
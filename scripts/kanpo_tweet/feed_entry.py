@@ -0,0 +1,98 @@
+"""フィードの1アイテムを表す省メモリのレコード
+
+feed_toc.xml を何か月分も読み込む場合や、常駐モードで投稿済みのアイテムを持ち続ける場合に、
+アイテムごとの dict と整形済みの日時文字列を持たないようにするための型です。
+
+- __slots__ で属性を固定し、インスタンスごとの __dict__ を持たない
+- pubDate は UTC のエポック秒（int）で持ち、文字列への整形は出力時（to_output）だけ行う
+- カテゴリは sys.intern した文字列のタプルで、同じ組み合わせのタプルは1つを共有する
+
+iter_items が返す dict と同じキーで読めるように、読み取り専用の __getitem__ / get を持ちます
+（"published" は datetime、"summary" は description の別名）。
+"""
+
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+OUTPUT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S, GMT"
+
+_category_tuples: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+
+def intern_categories(categories: Iterable[str]) -> Tuple[str, ...]:
+    """カテゴリの並びを、文字列・タプルとも共有されたタプルにする。"""
+    key = tuple(sys.intern(category) for category in categories)
+    return _category_tuples.setdefault(key, key)
+
+
+class Entry:
+    """フィードの1アイテム。"""
+
+    __slots__ = ("title", "link", "description", "guid", "published_ts", "categories")
+
+    def __init__(
+        self,
+        title: str = "",
+        link: str = "",
+        description: str = "",
+        guid: str = "",
+        published_ts: Optional[int] = None,
+        categories: Tuple[str, ...] = (),
+    ):
+        self.title = title
+        self.link = link
+        self.description = description
+        self.guid = guid
+        self.published_ts = published_ts
+        self.categories = categories
+
+    @classmethod
+    def from_item(cls, item: dict) -> "Entry":
+        """iter_items / parse_all_items が返す dict から作る。"""
+        published = item.get("published")
+        return cls(
+            title=item.get("title", ""),
+            link=item.get("link", ""),
+            description=item.get("description", ""),
+            guid=item.get("guid", ""),
+            published_ts=int(published.timestamp()) if published is not None else None,
+            categories=intern_categories(item.get("categories", ())),
+        )
+
+    @property
+    def published(self) -> Optional[datetime]:
+        if self.published_ts is None:
+            return None
+        return datetime.fromtimestamp(self.published_ts, timezone.utc)
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "published":
+            return self.published
+        if key == "summary":
+            return self.description
+        if key in Entry.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def to_output(self, with_categories: bool = False, date_format: str = OUTPUT_DATE_FORMAT) -> dict:
+        """GITHUB_OUTPUT / JSON 出力用の dict（pubDate は文字列）にする。"""
+        output = {
+            "title": self.title,
+            "link": self.link,
+            "description": self.description,
+            "pubDate": self.published.strftime(date_format) if self.published_ts is not None else "",
+        }
+        if with_categories:
+            output["categories"] = list(self.categories)
+        return output
+
+    def __repr__(self) -> str:
+        return f"Entry(title={self.title!r}, link={self.link!r}, published_ts={self.published_ts})"
@@ -0,0 +1,384 @@
+"""ETag / Last-Modified による条件付きGETでフィードを取得する共通処理
+
+取得したフィード本文と検証子（ETag, Last-Modified）をローカルにキャッシュし、
+次回以降は If-None-Match / If-Modified-Since を付けてリクエストします。
+サーバーが 304 を返した場合は本文をダウンロードせず、キャッシュ済みの本文を返します。
+プロキシは urllib と同じく環境変数 HTTP_PROXY / HTTPS_PROXY / NO_PROXY に従います。
+"""
+
+import base64
+import gzip
+import hashlib
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+from kanpo_tweet.run_metrics import get_metrics
+
+DEFAULT_CACHE_DIR = os.path.join(".cache", "feeds")
+DEFAULT_TIMEOUT = 30
+MAX_REDIRECTS = 5
+USER_AGENT = "kanpo-tweet (+https://github.com/testkun08080/kanpo-tweet)"
+
+
+@dataclass
+class FeedResponse:
+    """フィード取得結果。
+
+    Attributes:
+        url (str): 取得したURL。
+        status (Optional[int]): HTTPステータス。通信に失敗した場合はNone。
+        body (bytes): フィード本文（展開済み）。304 の場合はキャッシュ済みの本文。
+        not_modified (bool): サーバーが 304 Not Modified を返したかどうか。
+        bytes_received (int): 実際に受信したバイト数（圧縮後）。
+        elapsed (float): 取得にかかった秒数。
+    """
+
+    url: str
+    status: Optional[int]
+    body: bytes
+    not_modified: bool = False
+    bytes_received: int = 0
+    elapsed: float = 0.0
+
+
+class HTTPSession:
+    """http.client のコネクションをホストごとに使い回す簡易HTTPセッション（スレッドセーフ）。
+
+    feed.xml と feed_toc.xml は同じホストにあるため、同一実行内のリクエストでは
+    TCP/TLS のハンドシェイクを再利用します。
+    """
+
+    def __init__(self, max_per_host: int = 4, timeout: float = DEFAULT_TIMEOUT):
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self._pool: Dict[Tuple[str, str], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _acquire(self, scheme: str, netloc: str, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._pool.get((scheme, netloc))
+            conn = idle.pop() if idle else None
+        if conn is None:
+            return self._connect(scheme, netloc, timeout), False
+        # 使い回すコネクションにも今回のリクエストのタイムアウトを設定する
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _connect(self, scheme: str, netloc: str, timeout: float) -> http.client.HTTPConnection:
+        proxy = _proxy_for(scheme, netloc)
+        if proxy is None:
+            if scheme == "https":
+                return http.client.HTTPSConnection(netloc, timeout=timeout)
+            return http.client.HTTPConnection(netloc, timeout=timeout)
+        proxy_netloc, auth_headers = proxy
+        if scheme == "https":
+            # HTTPS はプロキシに CONNECT でトンネルを張ってから TLS で接続する
+            conn = http.client.HTTPSConnection(proxy_netloc, timeout=timeout)
+            conn.set_tunnel(netloc, headers=auth_headers)
+            return conn
+        return http.client.HTTPConnection(proxy_netloc, timeout=timeout)
+
+    def _release(self, scheme: str, netloc: str, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._pool.setdefault((scheme, netloc), [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _request_once(self, url: str, headers: Dict[str, str], timeout: float):
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        proxy = _proxy_for(parts.scheme, parts.netloc) if parts.scheme == "http" else None
+        if proxy is not None:
+            # HTTP のプロキシには絶対URIで送る
+            path = f"{parts.scheme}://{parts.netloc}{path}"
+            headers = {**headers, **proxy[1]}
+        conn, reused = self._acquire(parts.scheme, parts.netloc, timeout)
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            raw = response.read()
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            if not reused:
+                raise
+            # keep-alive 切れの再利用コネクションだった場合は新しい接続で1回だけやり直す
+            conn = self._connect(parts.scheme, parts.netloc, timeout)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                raw = response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(parts.scheme, parts.netloc, conn)
+        return response.status, response.headers, raw
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None):
+        """GETリクエストを送り、(status, headers, raw_body, final_url) を返す。リダイレクトは追従する。
+
+        timeout を省略した場合はセッションの設定値を使う（指定してもセッションの設定値は変えない）。
+        """
+        headers = dict(headers or {})
+        if timeout is None:
+            timeout = self.timeout
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response_headers, raw = self._request_once(url, headers, timeout)
+            location = response_headers.get("Location")
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            return status, response_headers, raw, url
+        raise http.client.HTTPException(f"リダイレクトが多すぎます: {url}")
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._pool.values())
+            self._pool.clear()
+        for idle in pools:
+            for conn in idle:
+                conn.close()
+
+
+_default_session = HTTPSession()
+
+
+def _proxy_for(scheme: str, netloc: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """環境変数のプロキシ設定から (プロキシの host:port, 認証ヘッダー) を返す。使わない場合は None。"""
+    proxy = getproxies().get(scheme)
+    if not proxy or proxy_bypass(urlsplit(f"//{netloc}").hostname or netloc):
+        return None
+    parts = urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+    proxy_netloc = parts.hostname + (f":{parts.port}" if parts.port else "")
+    auth_headers = {}
+    if parts.username is not None:
+        credentials = f"{unquote(parts.username)}:{unquote(parts.password or '')}".encode("utf-8")
+        auth_headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials).decode("ascii")
+    return proxy_netloc, auth_headers
+
+
+def get_cache_dir() -> Optional[str]:
+    """キャッシュディレクトリを返す。環境変数 FEED_CACHE=0 の場合はキャッシュを使わない。"""
+    if os.getenv("FEED_CACHE", "1").lower() in ("0", "false", "no"):
+        return None
+    return os.getenv("FEED_CACHE_DIR") or DEFAULT_CACHE_DIR
+
+
+def _cache_paths(cache_dir: str, url: str):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()[:24]
+    return os.path.join(cache_dir, f"{key}.json"), os.path.join(cache_dir, f"{key}.body")
+
+
+def _load_cache(cache_dir: Optional[str], url: str):
+    """キャッシュ済みの検証子と本文を返す。存在しない・壊れている場合は (None, None)。"""
+    if not cache_dir:
+        return None, None
+    meta_path, body_path = _cache_paths(cache_dir, url)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            meta = json.load(fh)
+        with open(body_path, "rb") as fh:
+            body = fh.read()
+    except (OSError, ValueError):
+        return None, None
+    if meta.get("url") != url:
+        return None, None
+    return meta, body
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+
+def _save_cache(cache_dir: Optional[str], url: str, etag: Optional[str], last_modified: Optional[str], body: bytes) -> None:
+    if not cache_dir or not (etag or last_modified):
+        return
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        meta_path, body_path = _cache_paths(cache_dir, url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+        # 本文を先に書き、検証子は最後に書く（途中で落ちても不整合な組み合わせを残さない）
+        _write_atomic(body_path, body)
+        _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    except OSError as error:
+        logging.warning(f"フィードキャッシュの書き込みに失敗: {error}")
+
+
+def decode_body(raw: bytes, content_encoding: Optional[str]) -> bytes:
+    """Content-Encoding に応じて本文を展開する。"""
+    encoding = (content_encoding or "").strip().lower()
+    if encoding == "gzip":
+        return gzip.decompress(raw)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(raw)
+        except zlib.error:
+            return zlib.decompress(raw, -zlib.MAX_WBITS)
+    return raw
+
+
+def _read_local(url: str) -> FeedResponse:
+    """file:// またはローカルパスのフィードを読み込む。"""
+    path = url[len("file://"):] if url.startswith("file://") else url
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as fh:
+            body = fh.read()
+    except OSError as error:
+        # HTTP と同じく、読めない場合は「エントリなし」として扱えるように空の本文を返す
+        logging.error(f"フィード取得に失敗: {url}: {error}")
+        get_metrics().incr("fetch_errors")
+        return FeedResponse(url=url, status=None, body=b"", elapsed=time.perf_counter() - started)
+    return FeedResponse(url=url, status=200, body=body, bytes_received=len(body), elapsed=time.perf_counter() - started)
+
+
+def fetch_feed(
+    url: str,
+    cache_dir: Optional[str] = None,
+    timeout: Optional[float] = None,
+    session: Optional[HTTPSession] = None,
+) -> FeedResponse:
+    """条件付きGETでフィードを取得する。
+
+    Args:
+        url (str): フィードのURL（http(s)、file:// またはローカルパス）。
+        cache_dir (Optional[str]): キャッシュディレクトリ。省略時は get_cache_dir() の値。
+        timeout (Optional[float]): タイムアウト秒数。省略時はセッションの設定値。
+        session (Optional[HTTPSession]): 使用するセッション。省略時はモジュール共通のセッション。
+
+    Returns:
+        FeedResponse: 取得結果。通信に失敗した場合は status=None・空の本文を返す
+            （feedparser.parse(url) と同様に「エントリなし」として扱えるようにするため）。
+    """
+    if not url.startswith(("http://", "https://")):
+        return _read_local(url)
+
+    if session is None:
+        session = _default_session
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    meta, cached_body = _load_cache(cache_dir, url)
+
+    headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    started = time.perf_counter()
+    try:
+        status, response_headers, raw, _ = session.get(url, headers, timeout=timeout)
+        body = decode_body(raw, response_headers.get("Content-Encoding")) if status == 200 else b""
+    except (http.client.HTTPException, OSError, zlib.error) as error:
+        logging.error(f"フィード取得に失敗: {url}: {error}")
+        get_metrics().incr("fetch_errors")
+        return FeedResponse(url=url, status=None, body=b"", elapsed=time.perf_counter() - started)
+    elapsed = time.perf_counter() - started
+    metrics = get_metrics()
+    metrics.observe("fetch_seconds", elapsed)
+    metrics.incr("fetch_bytes", len(raw))
+
+    if status == 304 and cached_body is not None:
+        logging.info(f"フィード未更新 (304): {url} ({elapsed:.2f}秒)")
+        metrics.incr("fetch_not_modified")
+        return FeedResponse(url=url, status=304, body=cached_body, not_modified=True, elapsed=elapsed)
+    if status != 200:
+        logging.error(f"フィード取得に失敗 ({status}): {url}")
+        metrics.incr("fetch_errors")
+        return FeedResponse(url=url, status=status, body=b"", bytes_received=len(raw), elapsed=elapsed)
+
+    logging.info(f"フィード取得 ({status}): {url} {len(raw)} bytes ({elapsed:.2f}秒)")
+    _save_cache(cache_dir, url, response_headers.get("ETag"), response_headers.get("Last-Modified"), body)
+    return FeedResponse(url=url, status=status, body=body, bytes_received=len(raw), elapsed=elapsed)
+
+
+@dataclass
+class FetchTask:
+    """並列取得での1フィード分の結果。
+
+    Attributes:
+        response (FeedResponse): 取得結果。
+        parsed (Any): パース結果。304 で本文が変わっていない場合はパースせず None。
+        fetch_seconds (float): 取得にかかった秒数。
+        parse_seconds (float): パースにかかった秒数。
+        finished_at (float): 取得開始からパース完了までの経過秒数。
+    """
+
+    response: FeedResponse
+    parsed: Any = None
+    fetch_seconds: float = 0.0
+    parse_seconds: float = 0.0
+    finished_at: float = 0.0
+
+
+def fetch_feeds_concurrently(
+    urls: List[str],
+    parse: Optional[Callable[[FeedResponse], Any]] = None,
+    cache_dir: Optional[str] = None,
+    session: Optional[HTTPSession] = None,
+) -> List[FetchTask]:
+    """複数のフィードを同時に取得し、取得できたものから順にパースする。
+
+    各フィードは別スレッドで「取得 → パース」を行うため、一方のパースともう一方の
+    ダウンロードが重なります。コネクションは1つのセッションで共有します。
+
+    Args:
+        urls (List[str]): 取得するフィードのURL。
+        parse (Optional[Callable[[FeedResponse], Any]]): 取得結果をパースする関数。304 の場合は呼ばれない。
+            省略時は取得だけを同時に行う。
+        cache_dir (Optional[str]): キャッシュディレクトリ。
+        session (Optional[HTTPSession]): 共有するセッション。
+
+    Returns:
+        List[FetchTask]: urls と同じ順序の結果。
+    """
+    if session is None:
+        session = _default_session
+    started = time.perf_counter()
+
+    def _run(url: str) -> FetchTask:
+        fetch_started = time.perf_counter()
+        response = fetch_feed(url, cache_dir=cache_dir, session=session)
+        task = FetchTask(response=response, fetch_seconds=time.perf_counter() - fetch_started)
+        if parse is not None and not response.not_modified:
+            parse_started = time.perf_counter()
+            task.parsed = parse(response)
+            task.parse_seconds = time.perf_counter() - parse_started
+            get_metrics().observe("parse_seconds", task.parse_seconds)
+        task.finished_at = time.perf_counter() - started
+        return task
+
+    with ThreadPoolExecutor(max_workers=max(1, len(urls))) as executor:
+        tasks = list(executor.map(_run, urls))
+
+    critical = max(tasks, key=lambda t: t.finished_at)
+    logging.info(
+        f"並列取得完了 {critical.finished_at:.2f}秒 / クリティカルパス: {critical.response.url}"
+        f" (取得 {critical.fetch_seconds:.2f}秒 + パース {critical.parse_seconds:.2f}秒)"
+    )
+    return tasks
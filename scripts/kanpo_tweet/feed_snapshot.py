@@ -0,0 +1,219 @@
+"""投稿済み（確認済み）アイテムの記録と、それとの差分で新着を判定する処理
+
+「現在時刻 − N分」の時間幅で新着を決めると、実行が遅れたときは取りこぼし、
+実行が重なったときは二重に投稿してしまいます。ここではフィードごとに
+
+    high_water: 確認済みアイテムの最新の pubDate
+    ids: high_water 付近（high_water − 猶予 以降）の確認済みアイテムの guid/link のハッシュ
+    since: 記録を始めた時刻（これより古いアイテムは ids になくても新着としない）
+
+だけを JSON で保存し、high_water − 猶予 より新しく、ids に含まれないアイテムを新着とします。
+遅れて追加されたアイテム（pubDate が high_water より古い）も、猶予の間は新着として拾えます。
+フィードは新しい順に並んでいるため、パースは新着と high_water 付近のアイテムを読んだところで打ち切られます。
+
+読み込みから保存まではファイルロックを取るため、同じマシン上で実行が重なっても同じアイテムを二重に扱いません
+（ロックが効くのは同じ保存先を使う実行の間だけです。GitHub Actions では実行ごとにランナーとキャッシュが
+別になるため、ワークフローの concurrency で実行が重ならないようにしています）。
+保存は置き換えで行うため、途中で落ちても前回の記録が残ります。
+
+環境変数:
+    FEED_SNAPSHOT: 0 で無効（従来どおり時間幅だけで判定する）。
+    FEED_SNAPSHOT_DIR: 保存先（既定: .cache/snapshots）。
+    FEED_SNAPSHOT_GRACE_MINUTES: high_water より古くても新着として扱う猶予（分、既定 1440）。
+    FEED_SNAPSHOT_LOCK_TIMEOUT: ロックを待つ最大秒数（既定 600）。
+"""
+
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+from kanpo_tweet.feed_stream import entries_in_window, iter_items
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(".cache", "snapshots")
+DEFAULT_GRACE_MINUTES = 1440
+SNAPSHOT_VERSION = 1
+
+
+def item_id(item: dict) -> str:
+    """アイテムを識別する短いハッシュ（guid → link → title の順に使う）。"""
+    key = item.get("guid") or item.get("link") or item.get("title") or ""
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _newest_published(body: bytes) -> Optional[datetime]:
+    """先頭（最新）のアイテムの pubDate を返す。"""
+    if not body:
+        return None
+    try:
+        for item in iter_items(body):
+            if item["published"] is not None:
+                return item["published"]
+    except (ET.ParseError, ValueError):
+        return None
+    return None
+
+
+class FeedSnapshot:
+    """1つのフィードの確認済みアイテムの記録。path が None の場合はメモリ上だけで保持する。"""
+
+    def __init__(self, path: Optional[str] = None, grace: Optional[timedelta] = None, lock_timeout: Optional[float] = None):
+        self.path = path
+        if grace is None:
+            grace = timedelta(minutes=float(os.getenv("FEED_SNAPSHOT_GRACE_MINUTES", str(DEFAULT_GRACE_MINUTES))))
+        self.grace = grace
+        self.lock_timeout = lock_timeout if lock_timeout is not None else float(os.getenv("FEED_SNAPSHOT_LOCK_TIMEOUT", "600"))
+        self.high_water: Optional[datetime] = None
+        self.since: Optional[datetime] = None
+        self.ids: Dict[str, int] = {}
+
+    @classmethod
+    def for_feed(cls, url: str, consumer: str) -> Optional["FeedSnapshot"]:
+        """フィードURLと利用するスクリプト名ごとの記録を返す。FEED_SNAPSHOT=0 の場合は None。"""
+        if os.getenv("FEED_SNAPSHOT", "1").lower() in ("0", "false", "no"):
+            return None
+        snapshot_dir = os.getenv("FEED_SNAPSHOT_DIR") or DEFAULT_SNAPSHOT_DIR
+        key = hashlib.sha256(f"{consumer}\n{url}".encode("utf-8")).hexdigest()[:24]
+        return cls(os.path.join(snapshot_dir, f"{key}.json"))
+
+    def load(self) -> None:
+        """保存済みの記録を読み込む。存在しない・壊れている場合は空の記録として扱う。"""
+        self.high_water = None
+        self.since = None
+        self.ids = {}
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as error:
+            logging.warning(f"スナップショットを読み込めないため空として扱います: {error}")
+            return
+        if data.get("version") != SNAPSHOT_VERSION:
+            return
+        if data.get("high_water") is not None:
+            self.high_water = datetime.fromtimestamp(data["high_water"], timezone.utc)
+        if data.get("since") is not None:
+            self.since = datetime.fromtimestamp(data["since"], timezone.utc)
+        else:
+            # since のない記録は high_water より前の ids を持っていないので、そこから始める
+            self.since = self.high_water
+        self.ids = dict(data.get("ids") or {})
+
+    def save(self) -> None:
+        """記録を置き換えで書き込む。high_water − 猶予 より古い ids は捨てる。"""
+        if self.high_water is not None:
+            floor = int((self.high_water - self.grace).timestamp())
+            self.ids = {key: published for key, published in self.ids.items() if published >= floor}
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "high_water": self.high_water.timestamp() if self.high_water else None,
+            "since": self.since.timestamp() if self.since else None,
+            "ids": self.ids,
+            "saved_at": time.time(),
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    @contextmanager
+    def locked(self) -> Iterator["FeedSnapshot"]:
+        """ファイルロックを取って記録を読み込む。with ブロックの間は他の実行を待たせる。
+
+        Raises:
+            TimeoutError: lock_timeout 秒待ってもロックが取れない場合。
+        """
+        if not self.path:
+            yield self
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.lock", "a") as lock_file:
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"スナップショットのロックを取得できません: {self.path}")
+                    time.sleep(0.2)
+            try:
+                self.load()
+                yield self
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def delta(self, body: bytes, bootstrap_start: datetime, compact: bool = False) -> List[dict]:
+        """本文のうち、まだ記録にないアイテムを文書順で返す。
+
+        記録がまだない（初回の）場合は bootstrap_start 以降のアイテムを新着とします。
+        その時間幅に何もなければ、現在の最新アイテムまでを確認済みとして基準にします
+        （次回以降の実行が遅れても、それより新しいアイテムは取りこぼさない）。
+
+        Args:
+            body (bytes): フィード本文。
+            bootstrap_start (datetime): 初回に新着とみなす時間幅の開始。
+            compact (bool): True の場合は Entry で返す（entries_in_window と同じ）。
+        """
+        if self.high_water is None:
+            items = entries_in_window(body, bootstrap_start, compact=compact)
+            self.since = bootstrap_start
+            if not items:
+                newest = _newest_published(body)
+                if newest is not None:
+                    self.since = newest
+                    self.mark(entries_in_window(body, newest, compact=compact))
+            return items
+        items = entries_in_window(body, self.start(bootstrap_start), compact=compact)
+        return [item for item in items if item_id(item) not in self.ids]
+
+    def start(self, bootstrap_start: datetime) -> datetime:
+        """delta() が新着として見る時間幅の開始（記録がない場合は bootstrap_start）。"""
+        if self.high_water is None:
+            return bootstrap_start
+        start = self.high_water - self.grace
+        if self.since is not None and self.since > start:
+            return self.since
+        return start
+
+    def select(self, items: List[dict], bootstrap_start: datetime) -> List[dict]:
+        """パース済みのアイテムから、delta() と同じ規則で新着を選ぶ。
+
+        複数の記録で同じ本文を使う場合に、本文は1回だけパースして（start() のうち最も古い時刻以降と、
+        最新の pubDate のアイテムを含めて）それぞれの記録で選ぶためのものです。
+        """
+        start = self.start(bootstrap_start)
+        new_items = [
+            item for item in items
+            if item["published"] is not None and item["published"] >= start and item_id(item) not in self.ids
+        ]
+        if self.high_water is None:
+            self.since = bootstrap_start
+            if not new_items:
+                newest = max((item["published"] for item in items if item["published"] is not None), default=None)
+                if newest is not None:
+                    self.since = newest
+                    self.mark([item for item in items if item["published"] == newest])
+        return new_items
+
+    def mark(self, items: List[dict]) -> None:
+        """アイテムを確認済みとして記録し、high_water を進める（保存は save() で行う）。"""
+        for item in items:
+            published = item.get("published")
+            if published is None:
+                continue
+            self.ids[item_id(item)] = int(published.timestamp())
+            if self.high_water is None or published > self.high_water:
+                self.high_water = published
@@ -0,0 +1,221 @@
+"""RSSの <item> を先頭から逐次パースし、時間幅の外に出たところで打ち切る処理
+
+feed_toc.xml は履歴が増え続けるため、feedparser で全件パースしてから
+時間幅で絞り込むと、必要なのは先頭の数十件でもパース時間とメモリが増え続けます。
+ここでは新しい順（newest-first）に並んでいることを前提に、時間幅より古いアイテムが
+続いた時点でパースを止めます。並び順が単調でない・XMLとして壊れている場合は
+feedparser による全件パースにフォールバックします。
+"""
+
+import logging
+import math
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+from operator import attrgetter, itemgetter
+from typing import Callable, Iterator, List, Optional
+
+from kanpo_tweet.feed_entry import Entry, intern_categories
+
+# 時間幅より古いアイテムがこの件数続いたら打ち切る（同時刻のアイテムの揺れを吸収するため）
+STOP_AFTER_OLDER_ITEMS = 3
+
+
+class NotMonotonicError(Exception):
+    """フィードが新しい順に並んでいない場合に送出される例外。"""
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_pub_date(value: Optional[str]) -> Optional[datetime]:
+    """pubDate を UTC の datetime に変換する。解釈できない場合は None。
+
+    RFC 822 形式（例: Fri, 16 Oct 2026 08:30:00 +0900）と ISO 8601 形式（例: 2026-10-16T08:30:00+09:00）を
+    受け付けます。タイムゾーンのない日時は UTC とみなします。
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            logging.warning(f"pubDate を解釈できないためアイテムをスキップします: {value!r}")
+            return None
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _item_from_element(elem: ET.Element) -> dict:
+    item = {"title": "", "link": "", "description": "", "guid": "", "published": None, "categories": []}
+    for child in elem:
+        name = _local_name(child.tag)
+        text = (child.text or "").strip()
+        if name == "category":
+            item["categories"].append(text)
+        elif name == "pubDate":
+            item["published"] = parse_pub_date(text)
+        elif name in ("title", "link", "description", "guid") and not item[name]:
+            item[name] = text
+    return item
+
+
+def _entry_from_element(elem: ET.Element) -> Entry:
+    entry = Entry()
+    categories = []
+    for child in elem:
+        name = _local_name(child.tag)
+        text = (child.text or "").strip()
+        if name == "category":
+            categories.append(text)
+        elif name == "pubDate":
+            published = parse_pub_date(text)
+            entry.published_ts = int(published.timestamp()) if published is not None else None
+        elif name in ("title", "link", "description", "guid") and not getattr(entry, name):
+            setattr(entry, name, text)
+    entry.categories = intern_categories(categories)
+    return entry
+
+
+def iter_items(body: bytes) -> Iterator[dict]:
+    """RSS 2.0 の <item> を文書順に1件ずつ返す。
+
+    返す辞書のキー: title, link, description, guid, published (UTC の datetime または None), categories
+
+    Args:
+        body (bytes): フィード本文。
+
+    Raises:
+        xml.etree.ElementTree.ParseError: XMLとして解釈できない場合。
+        ValueError: RSS 2.0 のフィードでない場合。
+    """
+    return _iter_elements(body, _item_from_element)
+
+
+def iter_entries(body: bytes) -> Iterator[Entry]:
+    """iter_items と同じ順で、dict の代わりに Entry を返す。"""
+    return _iter_elements(body, _entry_from_element)
+
+
+def _iter_elements(body: bytes, convert: Callable[[ET.Element], object]) -> Iterator:
+    channel = None
+    root_checked = False
+    for event, elem in ET.iterparse(BytesIO(body), events=("start", "end")):
+        name = _local_name(elem.tag)
+        if event == "start":
+            if not root_checked:
+                root_checked = True
+                if name != "rss":
+                    raise ValueError(f"RSS 2.0 ではありません: <{name}>")
+            elif name == "channel":
+                channel = elem
+            continue
+        if name == "item":
+            yield convert(elem)
+            # パース済みの要素は捨てて、履歴が長くてもメモリを一定に保つ
+            if channel is not None:
+                channel.clear()
+            else:
+                elem.clear()
+
+
+def parse_all_items(body: bytes) -> List[dict]:
+    """feedparser で全件パースし、iter_items と同じ形の辞書のリストを返す。"""
+    import feedparser
+
+    items = []
+    for entry in feedparser.parse(body).entries:
+        published = None
+        if entry.get("published_parsed"):
+            published = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
+        items.append({
+            "title": entry.get("title", ""),
+            "link": entry.get("link", ""),
+            "description": entry.get("description", ""),
+            "guid": entry.get("id", ""),
+            "published": published,
+            "categories": [tag.get("term", "") for tag in entry.get("tags", [])],
+        })
+    return items
+
+
+def _filter_window(
+    items, start, end, stop_early: bool, published_of: Callable = itemgetter("published"), include_newest: bool = False
+) -> list:
+    selected = []
+    previous = None
+    older_run = 0
+    for item in items:
+        published = published_of(item)
+        if published is None:
+            continue  # pubDateがない場合はスキップ
+        if include_newest:
+            # 先頭（最新）のアイテムが時間幅より古ければ、その pubDate までを時間幅にする
+            start = min(start, published)
+            include_newest = False
+        if stop_early:
+            if previous is not None and published > previous:
+                raise NotMonotonicError(f"{published} > {previous}")
+            previous = published
+        if published < start:
+            older_run += 1
+            if stop_early and older_run >= STOP_AFTER_OLDER_ITEMS:
+                break
+            continue
+        older_run = 0
+        if end is None or published < end:
+            selected.append(item)
+    return selected
+
+
+def entries_in_window(
+    body: bytes, start: datetime, end: Optional[datetime] = None, compact: bool = False, include_newest: bool = False
+) -> list:
+    """start <= pubDate (< end) のアイテムを文書順で返す。
+
+    新しい順に並んだフィードでは、時間幅より古いアイテムが続いた時点でパースを打ち切ります。
+    並び順が単調でない場合や、XMLとして解釈できない場合は全件パースして同じ条件で絞り込みます。
+
+    Args:
+        body (bytes): フィード本文。
+        start (datetime): 時間幅の開始（この時刻を含む）。
+        end (Optional[datetime]): 時間幅の終了（この時刻を含まない）。省略時は上限なし。
+        compact (bool): True の場合は dict の代わりに Entry（エポック秒で比較する）を返す。
+        include_newest (bool): True の場合、先頭のアイテムが start より古くても、その pubDate 以降を返す
+            （時間幅に何もなくても最新のアイテムを含める。1回の走査で済ませるため）。
+
+    Returns:
+        list: iter_items と同じ形の辞書、または Entry のリスト。
+    """
+    if not body:
+        return []
+    if compact:
+        # Entry はエポック秒（int）で持つので、時間幅も int にして比較する（切り上げれば境界の扱いは同じ）
+        start_ts = math.ceil(start.timestamp())
+        end_ts = math.ceil(end.timestamp()) if end is not None else None
+        by_ts = attrgetter("published_ts")
+        try:
+            return _filter_window(
+                iter_entries(body), start_ts, end_ts, stop_early=True, published_of=by_ts, include_newest=include_newest
+            )
+        except NotMonotonicError as error:
+            logging.info(f"フィードが新しい順に並んでいないため全件パースします: {error}")
+        except (ET.ParseError, ValueError) as error:
+            logging.info(f"逐次パースできないため feedparser で全件パースします: {error}")
+        entries = [Entry.from_item(item) for item in parse_all_items(body)]
+        return _filter_window(
+            entries, start_ts, end_ts, stop_early=False, published_of=by_ts, include_newest=include_newest
+        )
+    try:
+        return _filter_window(iter_items(body), start, end, stop_early=True, include_newest=include_newest)
+    except NotMonotonicError as error:
+        logging.info(f"フィードが新しい順に並んでいないため全件パースします: {error}")
+    except (ET.ParseError, ValueError) as error:
+        logging.info(f"逐次パースできないため feedparser で全件パースします: {error}")
+    return _filter_window(parse_all_items(body), start, end, stop_early=False, include_newest=include_newest)
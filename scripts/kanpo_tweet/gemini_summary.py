@@ -0,0 +1,513 @@
+"""Gemini による官報（詳細版）の要約処理
+
+single: 当日分のエントリをすべて1つのプロンプトにまとめて要約する（従来どおり）。
+mapreduce: エントリをトークン数の上限で分割し、各グループを並列に要約（map）してから、
+    部分要約をまとめて最終的な投稿文を作る（reduce）。号外の多い日でもコンテキスト上限に
+    当たりにくく、1回あたりの呼び出しも短くなります。
+
+締め切り（deadline）を渡した場合は、ストリーミング API で呼び出し、最初のチャンクが遅ければ速いモデルでも
+並行して要約します（generate_with_deadline）。締め切りを過ぎると DeadlineExceeded になります。
+"""
+
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from kanpo_tweet.pre_ranker import RankedDigest, estimate_tokens, format_digest, format_entry
+from kanpo_tweet.run_metrics import get_metrics
+from kanpo_tweet.summary_cache import SummaryCache, make_key, normalize_entries
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+# プロンプトの文面を変えたら上げる（要約キャッシュのキーに含まれる）
+PROMPT_TEMPLATE_VERSION = 1
+SUMMARY_MODES = ("single", "mapreduce")
+DEFAULT_CHUNK_TOKENS = int(os.getenv("GEMINI_CHUNK_TOKENS", "8000"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "3"))
+MAX_RETRIES = 3
+# 締め切り付きの呼び出しで、最初のモデルが遅い場合に並行して使うモデルと、それを始めるまでの秒数
+DEFAULT_HEDGE_MODEL = os.getenv("GEMINI_HEDGE_MODEL", "gemini-2.0-flash-lite")
+DEFAULT_HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER_SECONDS", "10"))
+
+
+@dataclass
+class SummaryResult:
+    """要約結果。
+
+    Attributes:
+        text (str): 投稿文。
+        timings (Dict[str, float]): 段階ごとの所要秒数（chunk / map / reduce / total など）。
+        calls (int): Gemini API の呼び出し回数（リトライ・キャッシュヒットを除く）。
+        cache_hits (int): キャッシュから返した回数。
+    """
+
+    text: str
+    timings: Dict[str, float] = field(default_factory=dict)
+    calls: int = 0
+    cache_hits: int = 0
+
+
+def make_client(api_key: str, base_url: Optional[str] = None) -> "genai.Client":
+    """Gemini クライアントを作る。base_url を指定するとそのURL（benchmarks/mock_api.py など）へ送る。
+
+    google.genai は読み込みに時間がかかるので、クライアントを作るときに初めて読み込みます。
+    """
+    from google import genai
+    from google.genai import types
+
+    if base_url:
+        return genai.Client(api_key=api_key, http_options=types.HttpOptions(base_url=base_url))
+    return genai.Client(api_key=api_key)
+
+
+def get_model() -> str:
+    """環境変数 GEMINI_MODEL のモデル名を返す（未設定・不正な場合は既定のモデル）。"""
+    model = (os.environ.get("GEMINI_MODEL") or DEFAULT_MODEL).strip()
+    if not model or model == "{model}":
+        model = DEFAULT_MODEL
+    return model
+
+
+def build_prompt(raw_text: str, viewer_url: str) -> str:
+    """当日分をまとめて要約し、そのまま投稿できる文を作るプロンプト。"""
+    return f"""以下は本日の官報（詳細版）の内容です。
+X（Twitter）に投稿するための短い要約を日本語で作成してください。
+
+条件:
+- 25000文字以内に収めてください。
+- 文章は日本語で、Twitterユーザーに読みやすいように整形してください。
+- 最後に、各項目の詳細はこちらからも検索可能です: {viewer_url}
+- 最後に「#官報 #官報通知」を付けてください。
+- 日付や重要な項目名は残してください。箇条書きや改行は自由です。
+
+--- 本日の官報詳細 ---
+
+{raw_text}
+
+--- ここまで ---
+
+上記の条件を満たす投稿文のみを出力してください。"""
+
+
+def build_map_prompt(raw_text: str) -> str:
+    """分割した一部のエントリを箇条書きに要約するプロンプト。"""
+    return f"""以下は本日の官報（詳細版）の一部です。
+後でほかの部分の要約と統合するため、重要な項目を日本語の箇条書きで簡潔に要約してください。
+
+条件:
+- 1項目1行で、項目名・対象・要点を残してください。
+- ハッシュタグや前置き、締めの文は不要です。
+
+--- 官報詳細（一部） ---
+
+{raw_text}
+
+--- ここまで ---
+
+箇条書きのみを出力してください。"""
+
+
+def build_reduce_prompt(partial_summaries: List[str], viewer_url: str) -> str:
+    """部分要約を1つの投稿文にまとめるプロンプト。"""
+    joined = "\n\n".join(partial_summaries)
+    return f"""以下は本日の官報（詳細版）を分割して要約した箇条書きです。
+これらを統合して、X（Twitter）に投稿するための短い要約を日本語で作成してください。
+
+条件:
+- 25000文字以内に収めてください。
+- 文章は日本語で、Twitterユーザーに読みやすいように整形してください。
+- 重複する項目はまとめてください。
+- 最後に、各項目の詳細はこちらからも検索可能です: {viewer_url}
+- 最後に「#官報 #官報通知」を付けてください。
+- 日付や重要な項目名は残してください。箇条書きや改行は自由です。
+
+--- 部分要約 ---
+
+{joined}
+
+--- ここまで ---
+
+上記の条件を満たす投稿文のみを出力してください。"""
+
+
+def chunk_entries(entries: List[dict], max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[List[dict]]:
+    """エントリを元の順序のまま、1グループあたり max_tokens 以下になるように分割する。
+
+    1エントリだけで上限を超える場合は、そのエントリ単独で1グループにします。
+    """
+    chunks: List[List[dict]] = []
+    current: List[dict] = []
+    current_tokens = 0
+    for entry in entries:
+        tokens = estimate_tokens(format_entry(entry))
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(entry)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def estimate_calls(entries: List[dict], mode: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> int:
+    """要約に必要な Gemini API の呼び出し回数の見積もり（キャッシュヒットは考慮しない）。"""
+    if not entries:
+        return 0
+    if mode != "mapreduce":
+        return 1
+    chunks = len(chunk_entries(entries, max_tokens))
+    return 1 if chunks <= 1 else chunks + 1
+
+
+def _retry_delay(error: Exception) -> float:
+    """429 のメッセージに含まれる待機秒数（なければ 45 秒）。"""
+    wait_sec = 45
+    msg = getattr(error, "message", None) or str(getattr(error, "details", ""))
+    if msg:
+        match = re.search(r"retry in (\d+(?:\.\d+)?)\s*s", msg, re.I)
+        if match:
+            wait_sec = max(10, int(float(match.group(1))) + 1)
+    return wait_sec
+
+
+def _record_usage(usage) -> None:
+    if usage is not None:
+        metrics = get_metrics()
+        metrics.incr("gemini_prompt_tokens", getattr(usage, "prompt_token_count", None) or 0)
+        metrics.incr("gemini_output_tokens", getattr(usage, "candidates_token_count", None) or 0)
+
+
+def generate_text(client: "genai.Client", model: str, prompt: str, deadline: Optional[float] = None) -> str:
+    """Gemini でテキストを生成する。429 の場合はメッセージの待機秒数だけ待ってリトライする。
+
+    deadline（time.monotonic() の時刻）を指定した場合は generate_with_deadline を使います。
+    """
+    if deadline is not None:
+        return generate_with_deadline(client, model, prompt, deadline)
+    from google.genai import errors as genai_errors
+
+    last_error = None
+    metrics = get_metrics()
+
+    for attempt in range(MAX_RETRIES):
+        if attempt:
+            metrics.incr("gemini_retries")
+        try:
+            started = time.perf_counter()
+            response = client.models.generate_content(
+                model=model,
+                contents=prompt,
+            )
+            metrics.observe("gemini_call_seconds", time.perf_counter() - started)
+            _record_usage(getattr(response, "usage_metadata", None))
+            text = (response.text or "").strip()
+            if not text:
+                raise ValueError("Gemini が空の要約を返しました。")
+            return text
+        except genai_errors.ClientError as e:
+            last_error = e
+            if getattr(e, "code", None) != 429:
+                raise
+            # 429 の場合はメッセージから待機秒数を取り、リトライ
+            wait_sec = _retry_delay(e)
+            logging.warning(
+                "Gemini API 429 (クォータ/レート制限)。%d 秒後にリトライ (%d/%d)",
+                wait_sec,
+                attempt + 1,
+                MAX_RETRIES,
+            )
+            time.sleep(wait_sec)
+
+    raise last_error
+
+
+class DeadlineExceeded(TimeoutError):
+    """締め切りまでに Gemini の要約が得られなかった。"""
+
+
+@dataclass
+class Attempt:
+    """締め切り付きの呼び出しでの、1回分の試行の記録（秒はいずれも試行の開始から）。
+
+    Attributes:
+        model (str): モデル名。
+        kind (str): primary（最初の呼び出し）または hedge（遅い場合に追加した呼び出し）。
+        ttft (Optional[float]): 最初のチャンクが届くまでの秒数。
+        total (Optional[float]): 最後のチャンクまで（失敗した場合は失敗まで）の秒数。
+        outcome (str): running / ok / error / abandoned（締め切り・ほかの試行の成功で打ち切り）。
+        error (str): 失敗した場合のエラー。
+    """
+
+    model: str
+    kind: str
+    ttft: Optional[float] = None
+    total: Optional[float] = None
+    outcome: str = "running"
+    error: str = ""
+
+
+def _stream_attempt(
+    client: "genai.Client", prompt: str, attempt: Attempt, deadline: float, cancelled: threading.Event
+) -> Optional[str]:
+    """ストリーミングで1回分の試行を行う。429 は締め切りまでに間に合う場合だけ待ってリトライする。
+
+    打ち切られた場合は None を返します。
+    """
+    from google.genai import errors as genai_errors
+
+    started = time.perf_counter()
+    for retry in range(MAX_RETRIES):
+        try:
+            parts = []
+            usage = None
+            for chunk in client.models.generate_content_stream(model=attempt.model, contents=prompt):
+                if attempt.ttft is None:
+                    attempt.ttft = time.perf_counter() - started
+                if cancelled.is_set():
+                    attempt.outcome = "abandoned"
+                    return None
+                parts.append(chunk.text or "")
+                usage = getattr(chunk, "usage_metadata", None) or usage
+            attempt.total = time.perf_counter() - started
+            _record_usage(usage)
+            text = "".join(parts).strip()
+            if not text:
+                raise ValueError("Gemini が空の要約を返しました。")
+            attempt.outcome = "ok"
+            return text
+        except genai_errors.ClientError as e:
+            if getattr(e, "code", None) != 429 or retry + 1 >= MAX_RETRIES:
+                raise
+            wait_sec = _retry_delay(e)
+            if time.monotonic() + wait_sec >= deadline:
+                # 待っても締め切りに間に合わないので、この試行はあきらめる
+                raise
+            get_metrics().incr("gemini_retries")
+            logging.warning("Gemini API 429 (%s)。%d 秒後にリトライ (%d/%d)", attempt.model, wait_sec, retry + 1, MAX_RETRIES)
+            if cancelled.wait(wait_sec):
+                attempt.outcome = "abandoned"
+                return None
+    return None
+
+
+def generate_with_deadline(
+    client: "genai.Client",
+    model: str,
+    prompt: str,
+    deadline: float,
+    hedge_model: Optional[str] = None,
+    hedge_after: Optional[float] = None,
+) -> str:
+    """ストリーミング API で生成し、deadline（time.monotonic() の時刻）までに返らなければ DeadlineExceeded にする。
+
+    hedge_after 秒たっても最初のチャンクが届かない場合（または最初の試行が失敗した場合）は、
+    hedge_model（より速いモデル）で同じプロンプトを並行して投げ、先に完了した方を使います。
+    試行はデーモンスレッドで動くので、締め切りを過ぎたらその時点で戻ります（残った試行は結果を捨てる）。
+    試行ごとの TTFT・所要時間は gemini_ttft_seconds / gemini_attempt_seconds として記録します。
+    """
+    if hedge_model is None:
+        hedge_model = DEFAULT_HEDGE_MODEL
+    if hedge_after is None:
+        hedge_after = DEFAULT_HEDGE_AFTER
+    metrics = get_metrics()
+    results: "queue.Queue" = queue.Queue()
+    cancelled = threading.Event()
+    attempts: List[Attempt] = []
+    launched = time.monotonic()
+
+    def _launch(attempt_model: str, kind: str) -> None:
+        attempt = Attempt(model=attempt_model, kind=kind)
+        attempts.append(attempt)
+
+        def _run():
+            try:
+                results.put((attempt, _stream_attempt(client, prompt, attempt, deadline, cancelled), None))
+            except Exception as e:
+                attempt.outcome = "error"
+                attempt.error = str(e)
+                results.put((attempt, None, e))
+
+        threading.Thread(target=_run, name=f"gemini-{kind}", daemon=True).start()
+
+    _launch(model, "primary")
+    # ヘッジ用のモデルがない（同じモデル）場合は、最初からヘッジしない
+    can_hedge = bool(hedge_model) and hedge_model != model
+    pending = 1
+    last_error: Optional[Exception] = None
+    try:
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                raise DeadlineExceeded(f"{deadline - launched:.1f} 秒以内に Gemini の要約が返りませんでした")
+            wait = deadline - now
+            if can_hedge:
+                wait = min(wait, max(0.0, launched + hedge_after - now))
+            try:
+                attempt, text, error = results.get(timeout=wait)
+            except queue.Empty:
+                if can_hedge and time.monotonic() >= launched + hedge_after:
+                    can_hedge = False
+                    if attempts[0].ttft is None:
+                        logging.warning("Gemini (%s) の応答が %.1f 秒ないため %s でも要約します", model, hedge_after, hedge_model)
+                        metrics.incr("gemini_hedges")
+                        _launch(hedge_model, "hedge")
+                        pending += 1
+                continue
+            pending -= 1
+            if error is None and text is not None:
+                return text
+            last_error = error or last_error
+            if can_hedge:
+                # 最初の試行が失敗した場合は、待たずにヘッジする
+                can_hedge = False
+                metrics.incr("gemini_hedges")
+                _launch(hedge_model, "hedge")
+                pending += 1
+        raise last_error or DeadlineExceeded("Gemini の要約が得られませんでした")
+    finally:
+        cancelled.set()
+        for attempt in attempts:
+            if attempt.outcome == "running":
+                attempt.outcome = "abandoned"
+            if attempt.ttft is not None:
+                metrics.observe("gemini_ttft_seconds", attempt.ttft)
+            if attempt.total is not None:
+                metrics.observe("gemini_attempt_seconds", attempt.total)
+            logging.info(
+                "Gemini 試行 (%s, %s): TTFT %s / 合計 %s / %s%s",
+                attempt.kind,
+                attempt.model,
+                f"{attempt.ttft:.2f}秒" if attempt.ttft is not None else "-",
+                f"{attempt.total:.2f}秒" if attempt.total is not None else "-",
+                attempt.outcome,
+                f" ({attempt.error})" if attempt.error else "",
+            )
+
+
+def _generate_cached(
+    client: "genai.Client",
+    model: str,
+    prompt: str,
+    cache: Optional[SummaryCache],
+    kind: str,
+    key: str,
+    deadline: Optional[float] = None,
+):
+    """キャッシュにあればそれを、なければ生成して保存した結果を (text, キャッシュヒットか) で返す。"""
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+    text = generate_text(client, model, prompt, deadline=deadline)
+    if cache is not None:
+        cache.put(key, kind, model, text)
+    return text, False
+
+
+def summarize_single(
+    client: "genai.Client",
+    model: str,
+    entries: List[dict],
+    viewer_url: str,
+    cache: Optional[SummaryCache] = None,
+    deadline: Optional[float] = None,
+) -> SummaryResult:
+    """全エントリを1つのプロンプトで要約する。"""
+    started = time.perf_counter()
+    raw_text = "\n".join(format_entry(e) for e in entries)
+    key = make_key(model, PROMPT_TEMPLATE_VERSION, "single", viewer_url, normalize_entries(entries))
+    text, hit = _generate_cached(client, model, build_prompt(raw_text, viewer_url), cache, "single", key, deadline)
+    elapsed = time.perf_counter() - started
+    return SummaryResult(text=text, timings={"generate": elapsed, "total": elapsed}, calls=0 if hit else 1, cache_hits=int(hit))
+
+
+def summarize_ranked(
+    client: "genai.Client",
+    model: str,
+    digest: RankedDigest,
+    viewer_url: str,
+    cache: Optional[SummaryCache] = None,
+    deadline: Optional[float] = None,
+) -> SummaryResult:
+    """pre_ranker で絞り込んだエントリ（と残りの件数）を1つのプロンプトで要約する。"""
+    started = time.perf_counter()
+    key = make_key(
+        model, PROMPT_TEMPLATE_VERSION, "ranked", viewer_url, normalize_entries(digest.in_document_order()), digest.other_counts
+    )
+    text, hit = _generate_cached(client, model, build_prompt(format_digest(digest), viewer_url), cache, "ranked", key, deadline)
+    elapsed = time.perf_counter() - started
+    return SummaryResult(text=text, timings={"generate": elapsed, "total": elapsed}, calls=0 if hit else 1, cache_hits=int(hit))
+
+
+def summarize_map_reduce(
+    client: "genai.Client",
+    model: str,
+    entries: List[dict],
+    viewer_url: str,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    cache: Optional[SummaryCache] = None,
+    deadline: Optional[float] = None,
+) -> SummaryResult:
+    """エントリを分割して並列に要約し、最後に1つの投稿文へまとめる。
+
+    Args:
+        client (genai.Client): Gemini クライアント。
+        model (str): モデル名。
+        entries (List[dict]): 要約するエントリ。
+        viewer_url (str): 投稿文の最後に案内するURL。
+        max_tokens (int): 1グループあたりのトークン数の上限（概算）。
+        max_concurrency (int): 同時に実行する map 呼び出しの上限。
+        cache (Optional[SummaryCache]): 部分要約・最終要約のキャッシュ。
+        deadline (Optional[float]): map・reduce を通した締め切り（time.monotonic() の時刻）。
+
+    Returns:
+        SummaryResult: 投稿文と段階ごとの所要時間。
+    """
+    started = time.perf_counter()
+    chunks = chunk_entries(entries, max_tokens)
+    timings = {"chunk": time.perf_counter() - started}
+    if len(chunks) <= 1:
+        # 分割の必要がなければ1回で済ませる
+        result = summarize_single(client, model, entries, viewer_url, cache=cache, deadline=deadline)
+        result.timings = {**timings, **result.timings, "total": time.perf_counter() - started}
+        return result
+
+    def _map(chunk: List[dict]):
+        map_started = time.perf_counter()
+        key = make_key(model, PROMPT_TEMPLATE_VERSION, "map", normalize_entries(chunk))
+        prompt = build_map_prompt("\n".join(format_entry(e) for e in chunk))
+        text, hit = _generate_cached(client, model, prompt, cache, "map", key, deadline)
+        return text, hit, time.perf_counter() - map_started
+
+    map_started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        mapped = list(executor.map(_map, chunks))
+    timings["map"] = time.perf_counter() - map_started
+    chunk_seconds = [seconds for _, _, seconds in mapped]
+    timings["map_slowest"] = max(chunk_seconds)
+    timings["map_mean"] = sum(chunk_seconds) / len(chunk_seconds)
+    map_hits = sum(1 for _, hit, _ in mapped if hit)
+
+    reduce_started = time.perf_counter()
+    partial_summaries = [summary for summary, _, _ in mapped]
+    key = make_key(model, PROMPT_TEMPLATE_VERSION, "reduce", viewer_url, partial_summaries)
+    text, reduce_hit = _generate_cached(
+        client, model, build_reduce_prompt(partial_summaries, viewer_url), cache, "reduce", key, deadline
+    )
+    timings["reduce"] = time.perf_counter() - reduce_started
+    timings["total"] = time.perf_counter() - started
+    hits = map_hits + int(reduce_hit)
+    return SummaryResult(text=text, timings=timings, calls=len(chunks) + 1 - hits, cache_hits=hits)
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """ログ出力用に段階ごとの所要時間を整形する。"""
+    return ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items())
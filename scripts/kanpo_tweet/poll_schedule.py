@@ -0,0 +1,79 @@
+"""常駐モードでフィードを確認する間隔を決める処理
+
+官報は平日の 08:30 JST 頃に公開されるため、その前後（既定: 08:15〜09:30）は短い間隔で確認し、
+それ以外の時間帯や当日分を投稿し終えた後は長い間隔に戻します。長い間隔で待つ場合も、
+次の「短い間隔の時間帯」の開始は過ぎないようにします。
+"""
+
+import os
+from datetime import datetime, time as dtime, timedelta, timezone
+from typing import Optional
+
+JST = timezone(timedelta(hours=9))
+
+
+def _parse_hhmm(value: str) -> dtime:
+    hour, minute = value.split(":", 1)
+    return dtime(int(hour), int(minute))
+
+
+class PollSchedule:
+    """公開予定時刻の前後は短く、それ以外は長い確認間隔を返す。"""
+
+    def __init__(
+        self,
+        publish_time: Optional[dtime] = None,
+        fast_interval: Optional[float] = None,
+        slow_interval: Optional[float] = None,
+        before: Optional[timedelta] = None,
+        after: Optional[timedelta] = None,
+        weekdays_only: bool = True,
+    ):
+        self.publish_time = publish_time or _parse_hhmm(os.getenv("WATCH_PUBLISH_TIME", "08:30"))
+        self.fast_interval = fast_interval if fast_interval is not None else float(os.getenv("WATCH_FAST_INTERVAL", "5"))
+        self.slow_interval = slow_interval if slow_interval is not None else float(os.getenv("WATCH_SLOW_INTERVAL", "600"))
+        self.before = before if before is not None else timedelta(minutes=float(os.getenv("WATCH_FAST_BEFORE_MINUTES", "15")))
+        self.after = after if after is not None else timedelta(minutes=float(os.getenv("WATCH_FAST_AFTER_MINUTES", "60")))
+        self.weekdays_only = weekdays_only
+
+    def fast_window(self, day) -> tuple:
+        """JST の日付 day の「短い間隔の時間帯」(開始, 終了) を返す。"""
+        published = datetime.combine(day, self.publish_time, tzinfo=JST)
+        return published - self.before, published + self.after
+
+    def _next_fast_start(self, now: datetime) -> datetime:
+        day = now.astimezone(JST).date()
+        for offset in range(8):
+            candidate = day + timedelta(days=offset)
+            if self.weekdays_only and candidate.weekday() >= 5:
+                continue
+            start, end = self.fast_window(candidate)
+            if now < end:
+                return start
+        return now + timedelta(seconds=self.slow_interval)
+
+    def in_fast_window(self, now: datetime) -> bool:
+        day = now.astimezone(JST).date()
+        if self.weekdays_only and day.weekday() >= 5:
+            return False
+        start, end = self.fast_window(day)
+        return start <= now < end
+
+    def interval(self, now: datetime, published_today: bool = False) -> float:
+        """次に確認するまでの秒数を返す。
+
+        Args:
+            now (datetime): 現在時刻（タイムゾーン付き）。
+            published_today (bool): 当日分をすでに投稿済みなら True（時間帯内でも長い間隔にする）。
+        """
+        if self.in_fast_window(now) and not published_today:
+            return self.fast_interval
+        if published_today:
+            # 当日分は投稿済みなので、翌営業日の時間帯まで長い間隔で待つ
+            now_jst = now.astimezone(JST)
+            tomorrow = datetime.combine(now_jst.date() + timedelta(days=1), dtime(0, 0), tzinfo=JST)
+            next_start = self._next_fast_start(max(now, tomorrow))
+        else:
+            next_start = self._next_fast_start(now)
+        until_fast = (next_start - now).total_seconds()
+        return max(self.fast_interval, min(self.slow_interval, until_fast))
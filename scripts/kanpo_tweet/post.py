@@ -0,0 +1,567 @@
+"""post コマンド: 指定した時間幅内でRSSフィードの更新をチェックしてTweetする
+
+    python -m kanpo_tweet post <rss_url> <rss_toc_url> <minutes>
+
+twitter_text と tweepy（x_poster）は投稿文を組み立てる・投稿するときに初めて読み込むので、
+新着がない実行ではどちらも読み込みません。
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import signal
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+from kanpo_tweet.feed_fetch import fetch_feed, fetch_feeds_concurrently
+from kanpo_tweet.feed_snapshot import FeedSnapshot
+from kanpo_tweet.feed_stream import entries_in_window
+from kanpo_tweet.poll_schedule import JST, PollSchedule
+from kanpo_tweet.post_outbox import PostOutbox, poster_sender
+from kanpo_tweet.post_renderer import PostRenderer
+from kanpo_tweet.run_metrics import get_metrics
+from kanpo_tweet.summary_cache import make_key
+from kanpo_tweet.toc_index import TocIndex
+from kanpo_tweet.toc_matcher import group_toc_entries
+# from google import genai
+# from google.genai import types
+
+
+# 投稿本文全体は DEBUG で出力する（必要なときだけ LOG_LEVEL=DEBUG で確認する）
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+TWEET_URL_LENGTH = 23
+MAX_TWEET_LENGTH = 25000  # X（旧Twitter）のツイートの最大文字数
+RSS_VIEWER_URL = "https://kanpo-viewer.com"
+DEBUG = os.getenv("DEBUG_CHECK", "0").lower() in ("1", "true", "yes")
+# X API の代わりに投稿するベースURL（--target で指定。None は本番）
+API_TARGET = None
+# 投稿待ちのポストを保存するアウトボックス（main() で開く。DEBUG 時・POST_OUTBOX=0 の場合は None）
+OUTBOX = None
+# 詳細版の全項目を貯める全文検索インデックス（main() で開く。TOC_INDEX=0 の場合は None）
+TOC_INDEX = None
+# concurrent: feed.xml と feed_toc.xml を同時に取得・パース / sequential: 順番に取得
+FETCH_MODE = os.getenv("FETCH_MODE", "concurrent").lower()
+# sequential: 項目の順序どおりに詰める / first_fit: ポスト数が少なくなるように詰める
+PACK_MODE = os.getenv("PACK_MODE", "sequential").lower()
+# 投稿文のテンプレート・ハッシュタグ（実行中に同じ項目・カテゴリの文は1回だけ組み立てる）
+RENDERER = PostRenderer(viewer_url=RSS_VIEWER_URL)
+# ハッシュタグ（clean_duplicate_tags で使う）
+HASHTAG_RE = re.compile(r"#\S+")
+
+# def ping_to_gemini(prompt: str) -> str:
+#     """Gemini API にプロンプトを送信し、応答を返す関数。
+
+#     Google の Gemini モデル「gemini-2.5-flash」を使用して、
+#     指定したプロンプトに基づくテキストを生成します。
+#     APIキーは環境変数 `GEMINI_API_KEY` から取得します。
+#     処理速度を優先するため "thinking" 機能は無効化しています。
+
+#     Args:
+#         prompt (str): Gemini に送信するプロンプト（質問や指示文）。
+
+#     Returns:
+#         str: Gemini から返ってきた応答テキスト。
+
+#     Raises:
+#         EnvironmentError: 環境変数 `GEMINI_API_KEY` が設定されていない場合。
+#         Exception: Gemini API リクエストが失敗した場合など。
+#     """
+#     api_key = os.environ.get("GEMINI_API_KEY")
+#     if not api_key:
+#         raise EnvironmentError("環境変数 GEMINI_API_KEY が設定されていません。")
+
+#     try:
+#         client = genai.Client(api_key=api_key)
+#         response = client.models.generate_content(
+#             model="gemini-2.5-flash-lite",
+#             contents=prompt,
+#             config=types.GenerateContentConfig(
+#                 thinking_config=types.ThinkingConfig(thinking_budget=0)  # thinking無効化
+#             ),
+#         )
+#         return response.text
+#     except Exception as e:
+#         return f"エラーが発生しました: {str(e)}"
+
+
+def clean_duplicate_tags(text):
+    """ポスト用のタグ重複を削除し、本文の改行は保持して整形する関数."""
+    # ハッシュタグ（重複は順序を保って除く）と、タグを除いた本文（改行は保持）
+    unique_tags = dict.fromkeys(HASHTAG_RE.findall(text))
+    non_tag_text = "\n".join(HASHTAG_RE.sub("", text).splitlines()).rstrip()
+
+    # 本文 + タグ（本文最後に必ず1行空けてタグ）
+    return f"{non_tag_text}\n\n" + "\n".join(unique_tags)
+
+
+def count_tweet_length(text: str) -> int:
+    """
+    Twitterの文字数カウント仕様に準拠して、テキストの長さを返す。
+
+    Args:
+        text (str): ツイートテキスト
+
+    Returns:
+        Optional[int]: 投稿されたツイートのID。失敗した場合はNone。
+    """
+    from twitter_text import parse_tweet
+
+    res = parse_tweet(text)
+    text_weight = res.weightedLength
+    return text_weight
+
+
+def post_to_x(text, in_reply_to_tweet_id=None):
+    """
+    テキストをX（旧Twitter）に投稿します。tweepy（Twitter API v2）を使用します。
+    in_reply_to_tweet_idが指定された場合は、リプライとして投稿します。
+    投稿に成功した場合はツイートIDを返し、失敗した場合はNoneを返します。
+
+    Args:
+        text (str): 投稿するツイートの本文。
+        in_reply_to_tweet_id (Optional[int]): リプライ先のツイートID（省略可）。
+
+    Returns:
+        Optional[str]: 投稿されたツイートのID。失敗した場合はNone。
+    """
+
+    logging.info(f":-------------------Tweet内容:-------------------")
+
+    # if in_reply_to_tweet_id:
+    #     text = clean_duplicate_tags(text)
+    logging.debug(text)
+
+    if DEBUG and not API_TARGET:
+        return 1
+
+    # クライアントとレートリミッターは実行中ずっと使い回す
+    poster = default_poster()
+    if poster is None:
+        logging.error("Twitter APIの認証情報が環境変数に設定されていません。")
+        return None
+
+    tweet_id = poster.post(text, in_reply_to_tweet_id=in_reply_to_tweet_id)
+    logging.info(f"Tweet ID: {tweet_id}")
+    logging.info(f":-------------------Tweet内容End:-------------------")
+
+    return tweet_id
+
+
+def _parse_clock(value: str) -> str:
+    """--until の HH:MM を検証して HH:MM の形で返す。"""
+    try:
+        return datetime.strptime(value, "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"時刻の形式が不正です (HH:MM): {value}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する。"""
+    parser = argparse.ArgumentParser(description="RSSフィードの更新をチェックしてXに投稿します。")
+    parser.add_argument("rss_url", help="チェック対象のRSSフィードURL")
+    parser.add_argument("rss_toc_url", help="関連情報取得用（詳細版）のRSSフィードURL")
+    parser.add_argument("minutes", type=int, help="何分前からの更新をチェックするか")
+    parser.add_argument(
+        "--target",
+        default="production",
+        help="投稿先。production（既定）または代替サーバーのベースURL（例: http://127.0.0.1:8700）",
+    )
+    parser.add_argument("--watch", action="store_true", help="常駐してフィードを確認し続け、更新があればすぐに投稿する")
+    parser.add_argument("--until", type=_parse_clock, help="常駐モードを終了する時刻（JST の HH:MM。省略時は止めるまで動き続ける）")
+    parser.add_argument("--max-seconds", type=float, help="常駐モードの最大実行秒数")
+    parser.add_argument("--stop-after-post", action="store_true", help="常駐モードで1回投稿したら終了する（CI 向け）")
+    return parser.parse_args(argv)
+
+
+def default_poster():
+    """実行中に使い回す XPoster（tweepy は初めて投稿するときに読み込む）。"""
+    from kanpo_tweet.x_poster import get_default_poster
+
+    return get_default_poster(base_url=API_TARGET)
+
+
+def to_output_entries(items, with_categories=False):
+    """Entry のリストを GITHUB_OUTPUT 用の辞書に整形する（日時の文字列化は出力時だけ行う）。"""
+    return [item.to_output(with_categories=with_categories) for item in items]
+
+
+def collect_entries(rss_url, rss_toc_url, diff_time):
+    """2つのフィードを取得し、時間幅内の (本体のエントリ, 詳細版のエントリ) を返す。
+
+    本体フィードが前回取得から変更されていない（304）場合は、どちらも空のリストを返す。
+    """
+    metrics = get_metrics()
+
+    if FETCH_MODE == "sequential":
+        # 本体フィードが前回取得から変更されていなければ、詳細版の取得・パースも省略する
+        with metrics.stage("fetch"):
+            response = fetch_feed(rss_url)
+        if response.not_modified:
+            logging.info("RSSフィードは前回取得から変更されていません。更新なしとして扱います。")
+            return [], []
+        with metrics.stage("parse_filter"):
+            feed_items = entries_in_window(response.body, diff_time, compact=True)
+        feed_toc_items = []
+        if feed_items:
+            with metrics.stage("fetch"):
+                toc_body = fetch_feed(rss_toc_url).body
+            with metrics.stage("parse_filter"):
+                feed_toc_items = entries_in_window(toc_body, diff_time, compact=True)
+            index_toc(toc_body)
+        return feed_items, feed_toc_items
+
+    # 2つのフィードを同時に取得し、先に届いた方からパースする
+    with metrics.stage("fetch_parse"):
+        main_task, toc_task = fetch_feeds_concurrently(
+            [rss_url, rss_toc_url], lambda response: entries_in_window(response.body, diff_time, compact=True)
+        )
+    if main_task.response.not_modified:
+        logging.info("RSSフィードは前回取得から変更されていません。更新なしとして扱います。")
+        return [], []
+    feed_toc_items = toc_task.parsed
+    if feed_toc_items is None:
+        # 詳細版だけ 304 だった場合はキャッシュ済みの本文をパースする
+        feed_toc_items = entries_in_window(toc_task.response.body, diff_time, compact=True)
+    index_toc(toc_task.response.body)
+    return main_task.parsed, feed_toc_items
+
+
+def index_toc(body):
+    """詳細版の本文を全文検索インデックスに取り込み、取り込めたかを返す（TOC_INDEX=0 の場合は何もしない）。"""
+    if TOC_INDEX is None:
+        return False
+    metrics = get_metrics()
+    with metrics.stage("index"):
+        try:
+            added = TOC_INDEX.ingest(body)
+        except sqlite3.Error as error:
+            logging.warning(f"詳細版のインデックスを更新できません: {error}")
+            return False
+    metrics.incr("toc_index_added", added)
+    return True
+
+
+def post_delta(body, rss_toc_url, diff_time, snapshot, toc_body=None):
+    """本体フィードの本文から snapshot に記録のない新着を取り出し、投稿して記録する。
+
+    snapshot.locked() の中で呼ぶ。投稿できない（認証情報がない）場合や、DEBUG_CHECK で
+    実際には投稿しない場合は記録しないので、次の実行で改めて新着として扱われる。
+    toc_body を省略した場合は、新着があるときだけ詳細版を取得する。
+
+    Returns:
+        list: 新着のアイテム（Entry）。
+    """
+    metrics = get_metrics()
+    dry_run = DEBUG and not API_TARGET
+    with metrics.stage("parse_filter"):
+        new_items = snapshot.delta(body, diff_time, compact=True)
+    if not new_items:
+        # 初回で時間幅内に何もなかった場合も、現在の最新アイテムを基準として保存しておく
+        if not dry_run:
+            snapshot.save()
+        return []
+
+    # 遅れて実行された場合も新着の号の詳細版が入るように、時間幅を最も古い新着まで広げる
+    toc_start = min([diff_time] + [item["published"] for item in new_items])
+    if toc_body is None:
+        with metrics.stage("fetch"):
+            toc_body = fetch_feed(rss_toc_url).body
+    if index_toc(toc_body):
+        # 本文の項目はフィード上の順序のまま、feed_toc.xml から既に消えた項目はインデックスから補う
+        with metrics.stage("parse_filter"):
+            toc_items = TOC_INDEX.merge_window(toc_body, toc_start)
+    else:
+        with metrics.stage("parse_filter"):
+            toc_items = entries_in_window(toc_body, toc_start, compact=True)
+    metrics.set("toc_entries_in_window", len(toc_items))
+    logging.info(f"新しいエントリを {len(new_items)} 件検出しました（詳細版 {len(toc_items)} 件）")
+
+    if not can_post():
+        logging.warning("Twwitter APIの認証情報が不足しています。投稿をスキップします。")
+        return new_items
+    post_entries(new_items, toc_items)
+    if dry_run:
+        logging.info("DEBUG_CHECK のため投稿済みとして記録しません。")
+        return new_items
+    snapshot.mark(new_items)
+    snapshot.save()
+    return new_items
+
+
+def drain_outbox():
+    """前回までに失敗・中断したポストのうち、送信時刻を過ぎたものを続きから投稿する。"""
+    if OUTBOX is None or not can_post():
+        return
+    with get_metrics().stage("post"):
+        result = OUTBOX.drain(poster_sender(default_poster()))
+    if result.sent or result.failed or result.pending:
+        logging.info(f"アウトボックス: 投稿 {result.sent} 件 / 失敗 {result.failed} 件 / 未投稿 {result.pending} 件")
+
+
+def can_post():
+    """投稿に必要な認証情報がそろっているか（DEBUG や代替サーバー宛てなら常に True）。"""
+    if DEBUG or API_TARGET:
+        return True
+    required_env = ["X_API_KEY", "X_API_SECRET", "X_ACCESS_TOKEN", "X_ACCESS_TOKEN_SECRET"]
+    return all(os.environ.get(env_key) for env_key in required_env)
+
+
+def post_entries(updated_entries, updated_toc_entries):
+    """号ごとに、先頭のポストと詳細版の項目を連ねたスレッドを投稿する。
+
+    Args:
+        updated_entries (list): 本体フィードの新着（Entry）。
+        updated_toc_entries (list): 詳細版のエントリ（Entry）。
+    """
+    metrics = get_metrics()
+
+    # タイトル → 詳細版エントリの索引を1回だけ作る
+    with metrics.stage("match"):
+        toc_groups = group_toc_entries([entry["title"] for entry in updated_entries], updated_toc_entries)
+    for entry in updated_entries:
+        # 先頭の文（タイトル・リンク・ハッシュタグ）と、詳細版のカテゴリのある項目ごとの文を
+        # 文字数制限に収まるようにポストへ詰める
+        with metrics.stage("pack"):
+            fragments = RENDERER.render_fragments(toc_groups[entry["title"]])
+            posts = RENDERER.pack(
+                entry,
+                fragments,
+                max_length=MAX_TWEET_LENGTH,
+                mode=PACK_MODE,
+                count=count_tweet_length,
+            )
+        metrics.incr("posts_built", len(posts))
+        logging.info(f"{entry['title']}: {len(fragments)} 項目を {len(posts)} ポストに分割")
+        # 1つ目のポストを起点に、以降は直前のポストへのリプライとしてスレッドにする
+        with metrics.stage("post"):
+            if OUTBOX is not None:
+                # アウトボックスに保存してから1回ずつ送る。失敗したポスト以降は次回の drain で続きから投稿する
+                thread_key = f"{entry['link']}#{make_key(posts)[:16]}"
+                OUTBOX.enqueue_thread(thread_key, posts)
+                OUTBOX.drain(poster_sender(default_poster()), thread_keys=[thread_key])
+            else:
+                reply_to = None
+                for post_text in posts:
+                    tweet_id = post_to_x(post_text, in_reply_to_tweet_id=reply_to)
+                    if tweet_id is not None:
+                        reply_to = tweet_id
+
+
+def write_outputs(updated, updated_entries):
+    """GitHub Actions 用（または標準出力）に更新有無とエントリ（Entry）を出力する。"""
+    updated_entries = to_output_entries(updated_entries)
+    if "GITHUB_OUTPUT" in os.environ:
+        output_path = os.environ["GITHUB_OUTPUT"]
+        with open(output_path, "a") as fh:
+            print(f"updated={'true' if updated else 'false'}", file=fh)
+            print(f"entries={json.dumps(updated_entries, ensure_ascii=False)}", file=fh)
+    else:
+        result = {"updated": updated, "entries": updated_entries}
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def _deadline(until, max_seconds):
+    """--until / --max-seconds から常駐モードの終了時刻（UTC）を求める。どちらもなければ None。"""
+    now = datetime.now(timezone.utc)
+    deadlines = []
+    if until:
+        now_jst = now.astimezone(JST)
+        hour, minute = until.split(":", 1)
+        stop_at = now_jst.replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+        if stop_at <= now_jst:
+            stop_at += timedelta(days=1)
+        deadlines.append(stop_at.astimezone(timezone.utc))
+    if max_seconds:
+        deadlines.append(now + timedelta(seconds=max_seconds))
+    return min(deadlines) if deadlines else None
+
+
+def watch(rss_url, rss_toc_url, minutes, until=None, max_seconds=None, stop_after_post=False):
+    """常駐してフィードを確認し続け、未投稿のエントリが現れたらすぐに投稿する。
+
+    1プロセスのまま HTTP の接続・X のクライアント・投稿済みエントリの記録（FeedSnapshot）を使い回す。
+    本体フィードは条件付きGETで確認するため、変更がない間は 304 だけで済む。
+    FEED_SNAPSHOT=0 の場合、投稿済みの記録はメモリ上だけで持つ。
+    確認間隔は PollSchedule が決める（公開予定時刻の前後は短く、それ以外は長く）。
+
+    Returns:
+        list: 常駐中に投稿したエントリ（Entry）。
+    """
+    metrics = get_metrics()
+    schedule = PollSchedule()
+    deadline = _deadline(until, max_seconds)
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    snapshot = FeedSnapshot.for_feed(rss_url, "check_rss_and_posting") or FeedSnapshot()
+    posted_entries = []
+    posted_day = None
+    logging.info(f"常駐モードを開始します（終了: {deadline.isoformat() if deadline else 'なし'}）")
+
+    while not stop.is_set():
+        now = datetime.now(timezone.utc)
+        if deadline and now >= deadline:
+            break
+        diff_time = now - timedelta(minutes=minutes)
+        metrics.incr("watch_polls")
+
+        with metrics.stage("fetch"):
+            response = fetch_feed(rss_url)
+        if response.not_modified:
+            metrics.incr("watch_polls_not_modified")
+        drain_outbox()
+        if response.body:
+            # 304 でもキャッシュ済みの本文と記録を突き合わせる（前回の実行が投稿前に落ちた場合の取りこぼし防止）
+            with snapshot.locked():
+                new_items = post_delta(response.body, rss_toc_url, diff_time, snapshot)
+            if new_items:
+                detected_at = datetime.now(timezone.utc)
+                for item in new_items:
+                    # 公開（pubDate）から投稿完了までの遅れ
+                    metrics.observe("publish_to_post_seconds", (detected_at - item["published"]).total_seconds())
+                posted_entries.extend(new_items)
+                posted_day = detected_at.astimezone(JST).date()
+                if stop_after_post:
+                    break
+
+        now = datetime.now(timezone.utc)
+        interval = schedule.interval(now, published_today=posted_day == now.astimezone(JST).date())
+        if deadline:
+            interval = min(interval, max(0.0, (deadline - now).total_seconds()))
+        logging.debug(f"次の確認まで {interval:.0f}秒")
+        stop.wait(interval)
+
+    logging.info(f"常駐モードを終了します（投稿したエントリ: {len(posted_entries)} 件）")
+    return posted_entries
+
+
+def main(argv=None):
+    """
+    RSSフィードをチェックし、指定した時間幅内に更新されたエントリを抽出してX（旧Twitter）に投稿します。
+    また、関連する要約情報があればリプライとして投稿します。GitHub Actions用の出力も行います。
+
+    コマンドライン引数:
+        rss_url (str): チェック対象のRSSフィードURL。
+        rss_toc_url (str): 関連情報取得用のRSSフィードURL。
+        minutes (int): 何分前からの更新をチェックするか。
+        --target (str): production または代替サーバーのベースURL。代替サーバーを指定した場合は
+            DEBUG_CHECK に関係なく、クライアント・リトライ・レート制御を含めてそのサーバーへ投稿する。
+        --watch: 1回で終わらずに常駐し、公開予定時刻の前後は短い間隔でフィードを確認し続ける。
+        --until (str): 常駐モードを終了する時刻（JST の HH:MM）。
+        --max-seconds (float): 常駐モードの最大実行秒数。
+        --stop-after-post: 常駐モードで1回投稿したら終了する。
+
+    環境変数:
+        BEARER_TOKEN: X Bearerトークン。
+        X_API_KEY: X APIキー。
+        X_API_SECRET: X APIキーシークレット。
+        X_ACCESS_TOKEN: Xアクセストークン。
+        X_ACCESS_TOKEN_SECRET: Xアクセストークンシークレット。
+        GITHUB_OUTPUT: GitHub Actions用の出力ファイルパス（オプション）。
+        POST_OUTBOX*: 投稿待ちのポストの保存先とリトライ（kanpo_tweet/post_outbox.py を参照）。
+        TOC_INDEX*: 詳細版の全項目を全文検索インデックスに貯める（kanpo_tweet/toc_index.py を参照）。
+        FEED_SNAPSHOT*: 新着を前回までの記録との差分で判定する（kanpo_tweet/feed_snapshot.py を参照）。
+            FEED_SNAPSHOT=0 の場合は従来どおり minutes の時間幅で判定し、初回は minutes の時間幅を使う。
+        WATCH_*: 常駐モードの確認間隔（kanpo_tweet/poll_schedule.py を参照）。
+
+    処理内容:
+        1. RSSフィードから指定時間幅内の新規エントリを抽出。
+        2. 新規エントリがあればXに投稿し、関連する要約情報があればリプライとして投稿。
+        3. GitHub Actions用に更新有無とエントリ情報を出力。
+
+    例外:
+        Twitter APIの認証情報が不足している場合は投稿をスキップします。
+        新規エントリがない場合は警告を出力します。
+    """
+    logging.basicConfig(level=logging.INFO)
+
+    global API_TARGET, OUTBOX, TOC_INDEX
+    args = parse_args(argv)
+    rss_url = args.rss_url
+    rss_toc_url = args.rss_toc_url
+    minutes = args.minutes
+    API_TARGET = None if args.target == "production" else args.target
+    if API_TARGET:
+        logging.info(f"投稿先: {API_TARGET}（代替サーバー）")
+    diff_time = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+
+    logging.info(f"RSS URL: {rss_url}")
+    logging.info(f"RSS_toc URL: {rss_toc_url}")
+    logging.info(f"チェック時間幅: {minutes}分前 = {diff_time.isoformat()}以降")
+
+    metrics = get_metrics()
+    if not (DEBUG and not API_TARGET):
+        OUTBOX = PostOutbox.from_env()
+    TOC_INDEX = TocIndex.from_env()
+    # 前回の実行で途中になったスレッドを先に続ける
+    drain_outbox()
+
+    if args.watch:
+        posted_entries = watch(
+            rss_url,
+            rss_toc_url,
+            minutes,
+            until=args.until,
+            max_seconds=args.max_seconds,
+            stop_after_post=args.stop_after_post,
+        )
+        metrics.set("entries_in_window", len(posted_entries))
+        if API_TARGET:
+            metrics.log_latency_summary("post_seconds", stage="post")
+        write_outputs(bool(posted_entries), posted_entries)
+        return
+
+    snapshot = FeedSnapshot.for_feed(rss_url, "check_rss_and_posting")
+    if snapshot is not None:
+        # 時間幅ではなく、前回までの記録との差分で新着を決める
+        toc_body = None
+        if FETCH_MODE == "sequential":
+            with metrics.stage("fetch"):
+                body = fetch_feed(rss_url).body
+        else:
+            # 2つのフィードを同時に取得する（差分は記録のロックを取ってから本文で判定する）
+            with metrics.stage("fetch"):
+                main_task, toc_task = fetch_feeds_concurrently([rss_url, rss_toc_url])
+            body, toc_body = main_task.response.body, toc_task.response.body
+        with snapshot.locked():
+            new_items = post_delta(body, rss_toc_url, diff_time, snapshot, toc_body=toc_body)
+        if not new_items:
+            logging.warning("RSSフィードのアップデートが見つかりません.")
+        metrics.set("entries_in_window", len(new_items))
+        if API_TARGET:
+            metrics.log_latency_summary("post_seconds", stage="post")
+        write_outputs(bool(new_items), new_items)
+        return
+
+    feed_items, feed_toc_items = collect_entries(rss_url, rss_toc_url, diff_time)
+
+    # 出力用の整形（日時の文字列化）は write_outputs で行う
+    updated = bool(feed_items)
+    logging.info(f"更新されたRSSフィードのエントリ数: {len(feed_items)}")
+    logging.info(f"更新されたRSS_TOCのエントリ数: {len(feed_toc_items)}")
+    metrics.set("entries_in_window", len(feed_items))
+    metrics.set("toc_entries_in_window", len(feed_toc_items))
+
+    # --- X (Twitter) posting ---
+    if can_post():
+        if updated:
+            post_entries(feed_items, feed_toc_items)
+        else:
+            logging.warning("RSSフィードのアップデートが見つかりません.")
+    else:
+        logging.warning("Twwitter APIの認証情報が不足しています。投稿をスキップします。")
+
+    if API_TARGET:
+        metrics.log_latency_summary("post_seconds", stage="post")
+
+    # 結果の出力
+    write_outputs(updated, feed_items)
+
@@ -0,0 +1,324 @@
+"""投稿待ちのポストを保存し、失敗したものを後からリトライするアウトボックス（SQLite）
+
+組み立てたポストはスレッド単位（スレッドのキー・先頭からの位置）で保存してから投稿します。
+投稿に失敗したポストは指数バックオフで次の試行時刻を決めて残し、drain() で再送します。
+スレッドの途中で止まった場合も、投稿済みのポストのツイートIDを親にして続きから投稿します。
+
+各行のキー（冪等キー）は (スレッドのキー, 位置, 本文) のハッシュなので、同じスレッドを何度
+enqueue しても二重には保存されません。送信前に行を「送信中」にしてから投稿するため、
+同じファイルを使う実行が重なっても同じ行を同時に送ることはありません。送信中のまま落ちた行は claim_timeout 秒後に
+再送の対象になります（X は同じ本文の連続投稿を重複として拒否するため、その場合は投稿済みとして扱います）。
+
+投稿済みの行は、スレッドの全ポストが投稿済み（または諦めた）状態で retention 秒たったら drain() の最後に削除します。
+それまでは同じスレッドを enqueue しても二重に投稿されません。
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from kanpo_tweet.run_metrics import get_metrics
+from kanpo_tweet.summary_cache import make_key
+
+DEFAULT_OUTBOX_PATH = os.path.join(".cache", "outbox", "posts.sqlite3")
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BASE_DELAY = 60.0
+DEFAULT_MAX_DELAY = 3600.0
+DEFAULT_CLAIM_TIMEOUT = 900.0
+DEFAULT_RETENTION = 7 * 24 * 60 * 60.0
+
+
+class DuplicatePostError(Exception):
+    """送信関数が「同じ内容はすでに投稿済み」と判断した場合に送出する例外。"""
+
+
+@dataclass
+class DrainResult:
+    """drain() の結果。
+
+    Attributes:
+        sent (int): 今回投稿できたポスト数。
+        failed (int): 今回失敗し、後で再送するポスト数。
+        dead (int): 試行回数の上限に達して諦めたポスト数。
+        pending (int): drain 後もまだ投稿されていないポスト数（全スレッド）。
+        purged (int): 保持期間を過ぎて削除した投稿済みのポスト数。
+        thread_ids (dict): スレッドのキー → 投稿済みのツイートIDのリスト（今回処理したスレッドのみ）。
+    """
+
+    sent: int = 0
+    failed: int = 0
+    dead: int = 0
+    pending: int = 0
+    purged: int = 0
+    thread_ids: Optional[dict] = None
+
+
+class PostOutbox:
+    """ポストの永続キュー。1つの接続をロックで守って共有する。"""
+
+    def __init__(
+        self,
+        path: str = DEFAULT_OUTBOX_PATH,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        claim_timeout: float = DEFAULT_CLAIM_TIMEOUT,
+        retention: float = DEFAULT_RETENTION,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.claim_timeout = claim_timeout
+        self.retention = retention
+        self.clock = clock
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 重なった実行とも同じファイルを使うため、ロック待ちのタイムアウトを長めにする
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            " key TEXT PRIMARY KEY,"
+            " thread_key TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " in_reply_to TEXT,"
+            " status TEXT NOT NULL DEFAULT 'pending',"
+            " tweet_id TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " next_attempt_at REAL NOT NULL,"
+            " claimed_at REAL,"
+            " last_error TEXT,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS posts_thread ON posts (thread_key, position)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS posts_status ON posts (status, next_attempt_at)")
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls, path: Optional[str] = None) -> Optional["PostOutbox"]:
+        """環境変数から作る。POST_OUTBOX=0 の場合や開けない場合は None。
+
+        path を指定した場合は POST_OUTBOX_PATH の代わりにそのファイルを使います（アカウントごとの保存先など）。
+        """
+        if os.getenv("POST_OUTBOX", "1").lower() in ("0", "false", "no"):
+            return None
+        try:
+            return cls(
+                path=path or os.getenv("POST_OUTBOX_PATH") or DEFAULT_OUTBOX_PATH,
+                max_attempts=int(os.getenv("POST_OUTBOX_MAX_ATTEMPTS", str(DEFAULT_MAX_ATTEMPTS))),
+                base_delay=float(os.getenv("POST_OUTBOX_BASE_DELAY", str(DEFAULT_BASE_DELAY))),
+                max_delay=float(os.getenv("POST_OUTBOX_MAX_DELAY", str(DEFAULT_MAX_DELAY))),
+                retention=float(os.getenv("POST_OUTBOX_RETENTION_DAYS", "7")) * 24 * 60 * 60,
+            )
+        except (OSError, sqlite3.Error) as error:
+            logging.warning(f"アウトボックスを開けません（アウトボックスなしで続行）: {error}")
+            return None
+
+    def enqueue_thread(self, thread_key: str, texts: List[str], in_reply_to: Optional[str] = None) -> List[str]:
+        """スレッドのポストを保存し、各ポストの冪等キーを返す。保存済みのポストはそのまま残す。
+
+        Args:
+            thread_key (str): スレッドを識別するキー（号のリンクや要約の対象日に本文のハッシュを加えたものなど。
+                本文が変わったら別のスレッドとして投稿されるように、内容ごとに変わるキーにする）。
+            texts (List[str]): 先頭から順のポスト本文。
+            in_reply_to (Optional[str]): 先頭のポストのリプライ先（省略時は新規のスレッド）。
+        """
+        now = self.clock()
+        keys = [make_key("post", thread_key, position, text) for position, text in enumerate(texts)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO posts (key, thread_key, position, text, in_reply_to, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (key, thread_key, position, text, in_reply_to if position == 0 else None, now, now, now)
+                    for position, (key, text) in enumerate(zip(keys, texts))
+                ],
+            )
+            self._conn.commit()
+        return keys
+
+    def _backoff(self, attempts: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+
+    def _claim(self, key: str, now: float) -> bool:
+        """行を送信中にする。他の実行が先に取った場合は False。"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE posts SET status = 'sending', claimed_at = ?, updated_at = ?"
+                " WHERE key = ? AND (status = 'pending' OR (status = 'sending' AND claimed_at < ?))",
+                (now, now, key, now - self.claim_timeout),
+            )
+            self._conn.commit()
+            return cursor.rowcount == 1
+
+    def _finish(self, key: str, tweet_id: Optional[str]) -> None:
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE posts SET status = 'sent', tweet_id = ?, claimed_at = NULL, last_error = NULL, updated_at = ? WHERE key = ?",
+                (tweet_id, now, key),
+            )
+            self._conn.commit()
+
+    def _fail(self, key: str, attempts: int, error: str) -> str:
+        now = self.clock()
+        status = "dead" if attempts >= self.max_attempts else "pending"
+        with self._lock:
+            self._conn.execute(
+                "UPDATE posts SET status = ?, attempts = ?, next_attempt_at = ?, claimed_at = NULL, last_error = ?, updated_at = ?"
+                " WHERE key = ?",
+                (status, attempts, now + self._backoff(attempts), error, now, key),
+            )
+            self._conn.commit()
+        return status
+
+    def _thread_rows(self, thread_key: str):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, text, in_reply_to, status, tweet_id, attempts, next_attempt_at"
+                " FROM posts WHERE thread_key = ? ORDER BY position",
+                (thread_key,),
+            ).fetchall()
+
+    def _open_threads(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_key FROM posts WHERE status IN ('pending', 'sending')"
+                " GROUP BY thread_key ORDER BY MIN(created_at)"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def next_attempt_at(self) -> Optional[float]:
+        """次に drain() で送れるようになる最も早い時刻（未投稿のポストがなければ None）。
+
+        drain() はスレッドを先頭から順に送るので、各スレッドの最初の未投稿のポストだけを見ます。
+        送信中のポストは、他の実行の送信が claim_timeout 秒で切れる時刻を使います。
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT MIN(CASE WHEN status = 'sending' THEN claimed_at + ? ELSE next_attempt_at END)"
+                " FROM posts AS head WHERE status IN ('pending', 'sending') AND position = ("
+                "  SELECT MIN(position) FROM posts"
+                "  WHERE thread_key = head.thread_key AND status IN ('pending', 'sending'))",
+                (self.claim_timeout,),
+            ).fetchone()[0]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM posts WHERE status IN ('pending', 'sending')").fetchone()[0]
+
+    def purge_sent(self) -> int:
+        """投稿済みになってから retention 秒たった行を削除し、削除した件数を返す。
+
+        未投稿・送信中のポストが残っているスレッドの行は、続きのリプライ先になるので残します。
+        """
+        cutoff = self.clock() - self.retention
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM posts WHERE status = 'sent' AND updated_at < ? AND thread_key NOT IN"
+                " (SELECT thread_key FROM posts WHERE status IN ('pending', 'sending'))",
+                (cutoff,),
+            )
+            self._conn.commit()
+            return cursor.rowcount
+
+    def drain(
+        self,
+        send: Callable[[str, Optional[str]], Optional[str]],
+        thread_keys: Optional[List[str]] = None,
+        max_posts: Optional[int] = None,
+    ) -> DrainResult:
+        """送信時刻を過ぎたポストを、スレッドごとに先頭から順に投稿する。
+
+        スレッド内では直前の投稿済みポストを親にしてリプライします。送信時刻前・他の実行が送信中の
+        ポストに当たったら、そのスレッドはそこで止めて（順序を保つため）次のスレッドに進みます。
+        試行回数の上限に達したポストは飛ばし、続きは直前の投稿済みポストにつなげます。
+
+        Args:
+            send: (本文, 親のツイートID) を受け取り、ツイートIDを返す関数。失敗時は None を返すか例外を送出する。
+                同じ内容が投稿済みの場合は DuplicatePostError を送出する。
+            thread_keys: 処理するスレッド（省略時は未投稿のポストがある全スレッド）。
+            max_posts: 今回投稿する最大数。
+        """
+        metrics = get_metrics()
+        result = DrainResult(thread_ids={})
+        for thread_key in thread_keys if thread_keys is not None else self._open_threads():
+            tweet_ids = result.thread_ids.setdefault(thread_key, [])
+            parent = None
+            for key, text, in_reply_to, status, tweet_id, attempts, next_attempt_at in self._thread_rows(thread_key):
+                if in_reply_to and parent is None:
+                    parent = in_reply_to
+                if status == "sent":
+                    if tweet_id:
+                        parent = tweet_id
+                        tweet_ids.append(tweet_id)
+                    continue
+                if status == "dead":
+                    continue
+                now = self.clock()
+                if next_attempt_at > now or (max_posts is not None and result.sent >= max_posts):
+                    break
+                if not self._claim(key, now):
+                    break
+                try:
+                    new_id = send(text, parent)
+                    error = "投稿に失敗しました" if new_id is None else None
+                except DuplicatePostError as duplicate:
+                    # 前回の実行で投稿できていた（送信中に落ちた）とみなし、IDは不明のまま続ける
+                    logging.warning(f"投稿済みのポストとして扱います（{thread_key} #{key[:8]}）: {duplicate}")
+                    self._finish(key, None)
+                    continue
+                except Exception as exception:  # noqa: BLE001 - 送信関数の失敗はすべて再送の対象にする
+                    new_id = None
+                    error = str(exception)
+                if new_id is None:
+                    status = self._fail(key, attempts + 1, error)
+                    if status == "dead":
+                        result.dead += 1
+                        metrics.incr("outbox_dead")
+                        logging.error(f"試行回数の上限に達したため投稿を諦めます（{thread_key} #{key[:8]}）: {error}")
+                        continue
+                    result.failed += 1
+                    metrics.incr("outbox_failed")
+                    logging.warning(
+                        f"投稿に失敗したためアウトボックスに残します（{thread_key} #{key[:8]}、"
+                        f"{self._backoff(attempts + 1):.0f}秒後に再送）: {error}"
+                    )
+                    break
+                self._finish(key, str(new_id))
+                parent = str(new_id)
+                tweet_ids.append(parent)
+                result.sent += 1
+                metrics.incr("outbox_sent")
+        result.pending = self.pending_count()
+        metrics.set("outbox_pending", result.pending)
+        result.purged = self.purge_sent()
+        if result.purged:
+            metrics.incr("outbox_purged", result.purged)
+        return result
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def poster_sender(poster) -> Callable[[str, Optional[str]], Optional[str]]:
+    """XPoster で1回だけ送る drain() 用の送信関数を返す（リトライはアウトボックスのバックオフに任せる）。"""
+
+    def send(text: str, in_reply_to_tweet_id: Optional[str]) -> Optional[str]:
+        logging.debug(text)
+        tweet_id = poster.post(text, in_reply_to_tweet_id=in_reply_to_tweet_id, max_retries=1)
+        if tweet_id is None and poster.last_error == "duplicate":
+            raise DuplicatePostError("同じ内容のポストがすでにあります")
+        logging.info(f"Tweet ID: {tweet_id}")
+        return tweet_id
+
+    return send
@@ -0,0 +1,197 @@
+"""投稿文（号の先頭文・詳細版の各項目・末尾の文）を組み立てる処理
+
+これまでは項目ごとに f-string でカテゴリからハッシュタグ文字列を作り直し、そのまま `#{カテゴリ}` にしていたため、
+カテゴリに空白や「」（）などハッシュタグに使えない文字があるとタグが途中で切れていました。ここでは
+
+- テンプレート（str.format の書式）は最初に1回だけ検証する（check_template）
+- カテゴリ → ハッシュタグの正規化結果と、カテゴリの並び → タグ行を実行中ずっと覚えておく
+- 各項目の文は1回だけ作り、重み付き文字数（weighted_length）も一緒に持って pack_posts に渡す
+
+ことで、同じ文字列を何度も作ったり数え直したりしないようにしています。
+
+ハッシュタグに使える文字は twitter-text と同じく、文字・結合文字・数字と一部の記号（_ ・ など）です。
+NFKC で正規化したうえで、空白は _ に置き換え、それ以外の使えない文字は取り除きます。数字だけになる場合はタグにしません。
+"""
+
+import string
+import unicodedata
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from kanpo_tweet.feed_entry import Entry
+from kanpo_tweet.tweet_packer import MAX_TWEET_LENGTH, pack_posts, weighted_length
+
+DEFAULT_HASHTAGS = ("#官報", "#官報通知")
+DEFAULT_EXTRA = "👇各項目のリンクなどは以下項目ごとのリンクをご覧ください"
+DEFAULT_VIEWER_URL = "https://kanpo-viewer.com"
+DEFAULT_TEMPLATES: Dict[str, str] = {
+    # 1つ目のポストの先頭（号のタイトル・リンク）
+    "header": "📚{title}\n{link}\n\n{hashtags}\n\n{extra}\n\n",
+    # 詳細版の1項目
+    "fragment": "{title}\n{link}\n{category_tags}\n\n",
+    # 各ポストの末尾
+    "footer": "👇以下RSSビューワーwebで項目ごとで見ることも可能です\n{viewer_url}",
+}
+# 各テンプレートで使える項目
+TEMPLATE_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "header": ("title", "link", "hashtags", "extra"),
+    "fragment": ("title", "link", "category_tags", "categories"),
+    "footer": ("viewer_url",),
+}
+
+# twitter-text の hashtagSpecialChars（文字・結合文字・数字以外でハッシュタグに使える文字）
+HASHTAG_SPECIAL_CHARS = frozenset("_\u200c\u200d\ua67e\u05be\u05f3\u05f4\uff5e\u301c\u309b\u309c\u30a0\u30fb\u3003\u0f0b\u0f0c\u00b7")
+
+_hashtags: Dict[str, Optional[str]] = {}
+_tag_lines: Dict[Tuple[str, ...], str] = {}
+
+
+def _hashtag_char(char: str) -> bool:
+    category = unicodedata.category(char)
+    return category[0] in "LM" or category == "Nd" or char in HASHTAG_SPECIAL_CHARS
+
+
+def normalize_hashtag(name: str) -> Optional[str]:
+    """カテゴリ名（先頭の # はあってもなくてもよい）を X でそのまま1つのタグになる "#..." にする。
+
+    タグにできない場合（空・数字だけ）は None。結果は実行中ずっと覚えておきます。
+    """
+    if name in _hashtags:
+        return _hashtags[name]
+    text = unicodedata.normalize("NFKC", name).strip().lstrip("#＃")
+    chars = []
+    for char in text:
+        if char.isspace():
+            if chars and chars[-1] != "_":
+                chars.append("_")
+        elif _hashtag_char(char):
+            chars.append(char)
+    body = "".join(chars).strip("_")
+    # 数字だけのタグはハッシュタグとして扱われない
+    tag = f"#{body}" if any(unicodedata.category(char)[0] in "LM" for char in body) else None
+    _hashtags[name] = tag
+    return tag
+
+
+def format_hashtags(names: Sequence[str]) -> str:
+    """カテゴリ名の並びを、重複を除いたハッシュタグの行（空白区切り）にする。結果は並びごとに覚えておく。"""
+    key = tuple(names)
+    line = _tag_lines.get(key)
+    if line is None:
+        tags = (normalize_hashtag(name) for name in key)
+        line = _tag_lines[key] = " ".join(dict.fromkeys(tag for tag in tags if tag))
+    return line
+
+
+def check_template(source: str, allowed: Sequence[str]) -> Tuple[str, ...]:
+    """str.format の書式のテンプレートを検証し、使っている項目を返す。
+
+    使える項目は allowed だけで、書式指定（{title:>10} など）・変換（!r）・属性や添字の参照は使えません。
+    """
+    fields = []
+    try:
+        parsed = list(string.Formatter().parse(source))
+    except ValueError as error:
+        raise ValueError(f"テンプレートの書式が不正です: {error}: {source!r}")
+    for _literal, name, format_spec, conversion in parsed:
+        if name is None:
+            continue
+        if name not in allowed:
+            raise ValueError(f"テンプレートに使えない項目です: {{{name}}}（使える項目: {', '.join(allowed)}）")
+        if format_spec or conversion:
+            raise ValueError(f"テンプレートの書式指定は使えません: {{{name}}}")
+        fields.append(name)
+    return tuple(fields)
+
+
+class Fragment(NamedTuple):
+    """組み立て済みの1項目の文と、その重み付き文字数。"""
+
+    text: str
+    length: int
+
+
+class PostRenderer:
+    """テンプレート・ハッシュタグ・末尾の文を固定して、号ごとのスレッドを組み立てる。
+
+    1つの実行（アカウント）につき1つ作って使い回します。同じ項目（タイトル・リンク・カテゴリが同じ）の文は
+    1回だけ組み立てて覚えておきます。
+    """
+
+    def __init__(
+        self,
+        templates: Optional[Dict[str, str]] = None,
+        hashtags: Iterable[str] = DEFAULT_HASHTAGS,
+        extra: str = DEFAULT_EXTRA,
+        viewer_url: str = DEFAULT_VIEWER_URL,
+    ):
+        sources = dict(DEFAULT_TEMPLATES)
+        sources.update(templates or {})
+        unknown = sorted(set(sources) - set(DEFAULT_TEMPLATES))
+        if unknown:
+            raise ValueError(f"不明なテンプレートがあります: {', '.join(unknown)}")
+        fields = {name: check_template(source, TEMPLATE_FIELDS[name]) for name, source in sources.items()}
+        self.header = sources["header"]
+        self.fragment = sources["fragment"]
+        self.hashtags = format_hashtags(list(hashtags))
+        self.extra = extra
+        self.footer_text = sources["footer"].format(viewer_url=viewer_url)
+        self._with_categories = "categories" in fields["fragment"]
+        self._fragments: Dict[Tuple[str, str, Tuple[str, ...]], Fragment] = {}
+
+    def render_header(self, entry) -> str:
+        return self.header.format(title=entry["title"], link=entry["link"], hashtags=self.hashtags, extra=self.extra)
+
+    def render_fragments(self, items: Iterable) -> List[Fragment]:
+        """カテゴリのある項目の文を作る（カテゴリのない項目は飛ばす）。"""
+        fragments = []
+        cache = self._fragments
+        render = self.fragment.format
+        for item in items:
+            if isinstance(item, Entry):
+                title, link, categories = item.title, item.link, item.categories
+            else:
+                title, link, categories = item.get("title", ""), item.get("link", ""), tuple(item.get("categories") or ())
+            if not categories:
+                continue
+            key = (title, link, categories)
+            fragment = cache.get(key)
+            if fragment is None:
+                text = render(
+                    title=title,
+                    link=link,
+                    category_tags=format_hashtags(categories),
+                    categories=", ".join(categories) if self._with_categories else "",
+                )
+                fragment = cache[key] = Fragment(text, weighted_length(text))
+            fragments.append(fragment)
+        return fragments
+
+    def pack(
+        self,
+        entry,
+        fragments: List[Fragment],
+        max_length: int = MAX_TWEET_LENGTH,
+        mode: str = "sequential",
+        count: Optional[Callable[[str], int]] = None,
+    ) -> List[str]:
+        """先頭の文と組み立て済みの項目の文を、文字数制限に収まるようにポストへ詰める（重み付き文字数は数え直さない）。"""
+        return pack_posts(
+            self.render_header(entry),
+            [fragment.text for fragment in fragments],
+            self.footer_text,
+            max_length=max_length,
+            mode=mode,
+            count=count,
+            sizes=[fragment.length for fragment in fragments],
+        )
+
+    def render_thread(
+        self,
+        entry,
+        items: Iterable,
+        max_length: int = MAX_TWEET_LENGTH,
+        mode: str = "sequential",
+        count: Optional[Callable[[str], int]] = None,
+    ) -> List[str]:
+        """1つの号のスレッド（ポスト本文のリスト）を作る。"""
+        return self.pack(entry, self.render_fragments(items), max_length=max_length, mode=mode, count=count)
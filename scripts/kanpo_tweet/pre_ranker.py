@@ -0,0 +1,237 @@
+"""Gemini に渡す前に、当日分のエントリをローカルで重要度順に絞り込む処理
+
+号外の多い日は数百〜数千項目になり、その全文（タイトル・description）をプロンプトに入れていましたが、
+最終的な投稿文で取り上げられるのは一部だけです。ここでは外部ライブラリなしで各項目に点数を付け、
+
+- カテゴリの重み（法律・政令 > 告示 > 公告・会社その他 など）
+- タイトルの文字 n-gram（2〜3文字）の TF-IDF による特徴度（その日のほかの項目と似ていないほど高い）
+
+の積が大きい上位 K 件だけを全文で残し、残りはカテゴリごとの件数1行にまとめて、
+プロンプトをトークン数の予算に収めます。同じ結果から、Gemini を使わない要約文（build_offline_summary）も作れます。
+"""
+
+import math
+import os
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from kanpo_tweet.tweet_packer import MAX_TWEET_LENGTH, weighted_length
+
+DEFAULT_TOP_K = int(os.getenv("GEMINI_RANK_TOP_K", "40"))
+DEFAULT_TOKEN_BUDGET = int(os.getenv("GEMINI_PROMPT_TOKEN_BUDGET", "6000"))
+NGRAM_SIZES = (2, 3)
+OTHER_CATEGORY = "その他"
+
+DEFAULT_CATEGORY_WEIGHTS: Dict[str, float] = {
+    "法律": 3.0,
+    "政令": 2.5,
+    "条約": 2.5,
+    "府令": 2.0,
+    "省令": 2.0,
+    "規則": 1.8,
+    "告示": 1.5,
+    "公示": 1.2,
+    "官庁報告": 1.0,
+    "国会事項": 1.0,
+    "地方自治": 0.8,
+    "人事異動": 0.8,
+    "叙位・叙勲": 0.5,
+    "公告": 0.5,
+    "会社その他": 0.3,
+}
+
+
+def format_entry(entry: dict) -> str:
+    """プロンプトに入れる1エントリ分のテキスト。"""
+    return f"【{entry['title']}】\n{entry.get('description') or entry.get('summary', '')}\nリンク: {entry['link']}\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """トークン数の概算（日本語などの非ASCII文字は1文字1トークン、ASCIIは4文字1トークン）。"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def prompt_tokens(entries: List[dict]) -> int:
+    """全エントリをそのままプロンプトに入れた場合のトークン数の概算。"""
+    return sum(estimate_tokens(format_entry(entry)) for entry in entries)
+
+
+def category_weights_from_env() -> Dict[str, float]:
+    """既定の重みに、環境変数 GEMINI_RANK_CATEGORY_WEIGHTS（例: "公告=0.2,人事異動=1.5"）を上書きする。"""
+    weights = dict(DEFAULT_CATEGORY_WEIGHTS)
+    for pair in os.getenv("GEMINI_RANK_CATEGORY_WEIGHTS", "").split(","):
+        name, sep, value = pair.partition("=")
+        if not sep:
+            continue
+        try:
+            weights[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return weights
+
+
+def primary_category(entry: dict) -> str:
+    """件数をまとめるときのカテゴリ（先頭のカテゴリ、なければ「その他」）。"""
+    categories = entry.get("categories") or ()
+    return categories[0] if categories else OTHER_CATEGORY
+
+
+def _ngrams(text: str) -> Counter:
+    text = "".join(unicodedata.normalize("NFKC", text or "").split())
+    return Counter(text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1))
+
+
+def title_salience(titles: List[str]) -> List[float]:
+    """各タイトルの文字 n-gram の TF-IDF の合計（0〜1 に正規化）。
+
+    TF はタイトル内の相対頻度なので、値は「そのタイトルの n-gram がほかのタイトルにどれだけ出てこないか」の平均です。
+    同じ定型文のタイトルが大量に並ぶ日でも、それ以外の項目が上に来ます。
+    """
+    documents = [_ngrams(title) for title in titles]
+    document_frequency: Counter = Counter()
+    for document in documents:
+        document_frequency.update(document.keys())
+    total_documents = len(documents)
+    scores = []
+    for document in documents:
+        total = sum(document.values())
+        if not total:
+            scores.append(0.0)
+            continue
+        scores.append(
+            sum(
+                count / total * math.log((1 + total_documents) / (1 + document_frequency[gram]))
+                for gram, count in document.items()
+            )
+        )
+    highest = max(scores, default=0.0)
+    return [score / highest for score in scores] if highest > 0 else scores
+
+
+def rank_entries(entries: List[dict], weights: Optional[Dict[str, float]] = None) -> List[float]:
+    """各エントリの点数（カテゴリの重み ×（0.5 + タイトルの特徴度））を元の順序で返す。"""
+    if weights is None:
+        weights = category_weights_from_env()
+    salience = title_salience([entry.get("title", "") for entry in entries])
+    scores = []
+    for entry, title_score in zip(entries, salience):
+        categories = entry.get("categories") or ()
+        weight = max((weights.get(category, 1.0) for category in categories), default=1.0)
+        scores.append(weight * (0.5 + title_score))
+    return scores
+
+
+@dataclass
+class RankedDigest:
+    """絞り込みの結果。
+
+    Attributes:
+        selected (List[dict]): 全文で残すエントリ（点数の高い順）。
+        indices (List[int]): selected の各エントリの元の位置。
+        other_counts (Dict[str, int]): 残さなかったエントリのカテゴリごとの件数（多い順）。
+        total (int): 元のエントリ数。
+        full_tokens (int): 全件をプロンプトに入れた場合のトークン数（概算）。
+    """
+
+    selected: List[dict]
+    indices: List[int]
+    other_counts: Dict[str, int] = field(default_factory=dict)
+    total: int = 0
+    full_tokens: int = 0
+
+    @property
+    def omitted(self) -> int:
+        return self.total - len(self.selected)
+
+    def in_document_order(self) -> List[dict]:
+        """selected をフィード上の順序に並べ直したもの。"""
+        return [entry for _, entry in sorted(zip(self.indices, self.selected), key=lambda pair: pair[0])]
+
+
+def format_other_counts(other_counts: Dict[str, int]) -> str:
+    """残さなかったエントリの件数を1行にまとめる。"""
+    return " / ".join(f"{category} {count}件" for category, count in other_counts.items())
+
+
+def select_entries(
+    entries: List[dict],
+    top_k: int = DEFAULT_TOP_K,
+    token_budget: int = DEFAULT_TOKEN_BUDGET,
+    weights: Optional[Dict[str, float]] = None,
+) -> RankedDigest:
+    """点数の高い順に、top_k 件かつ token_budget に収まるだけのエントリを残す。
+
+    件数行の分のトークンは先に予算から差し引きます。1件も予算に収まらない場合でも、
+    最も点数の高い1件は残します。
+    """
+    formatted = [format_entry(entry) for entry in entries]
+    tokens = [estimate_tokens(text) for text in formatted]
+    scores = rank_entries(entries, weights)
+    order = sorted(range(len(entries)), key=lambda index: (-scores[index], index))
+
+    all_counts = Counter(primary_category(entry) for entry in entries)
+    remaining = token_budget - estimate_tokens(format_other_counts(dict(all_counts))) - 50
+    indices: List[int] = []
+    for index in order:
+        if len(indices) >= top_k:
+            break
+        if indices and tokens[index] > remaining:
+            continue
+        indices.append(index)
+        remaining -= tokens[index]
+
+    chosen = set(indices)
+    other_counts = Counter(primary_category(entry) for index, entry in enumerate(entries) if index not in chosen)
+    return RankedDigest(
+        selected=[entries[index] for index in indices],
+        indices=indices,
+        other_counts=dict(other_counts.most_common()),
+        total=len(entries),
+        full_tokens=sum(tokens),
+    )
+
+
+def format_digest(digest: RankedDigest) -> str:
+    """プロンプトに入れる本文（残したエントリの全文と、残りの件数）。"""
+    text = "\n".join(format_entry(entry) for entry in digest.in_document_order())
+    if digest.omitted:
+        text += (
+            f"\n--- 上記のほか {digest.omitted} 件（カテゴリ別の件数） ---\n"
+            f"{format_other_counts(digest.other_counts)}\n"
+        )
+    return text
+
+
+def build_offline_summary(
+    digest: RankedDigest,
+    viewer_url: str,
+    heading: str = "本日の官報（詳細版）",
+    max_length: int = MAX_TWEET_LENGTH,
+) -> str:
+    """Gemini を使わずに、点数の高い項目とカテゴリ別の件数から投稿文を作る。
+
+    文字数は weighted_length（X の数え方の近似）で max_length に収めます。
+    """
+    header = f"📚{heading}の主な項目（全{digest.total}件）\n\n"
+    footer = f"\n各項目の詳細はこちらからも検索可能です: {viewer_url}\n\n#官報 #官報通知"
+    lines = []
+    shown = 0
+    length = weighted_length(header + footer)
+    for entry in digest.selected:
+        line = f"・{entry.get('title', '')}\n{entry.get('link', '')}\n"
+        line_length = weighted_length(line)
+        if length + line_length > max_length - 200:
+            break
+        lines.append(line)
+        length += line_length
+        shown += 1
+
+    rest = Counter(digest.other_counts)
+    for entry in digest.selected[shown:]:
+        rest[primary_category(entry)] += 1
+    if rest:
+        lines.append(f"\nそのほか {sum(rest.values())} 件: {format_other_counts(dict(rest.most_common()))}\n")
+    return header + "".join(lines) + footer
@@ -0,0 +1,235 @@
+"""実行ごとの計測値（段階ごとの所要時間・件数・レイテンシ）を集めて出力する処理
+
+出力先:
+    GITHUB_OUTPUT: `metrics_<名前>=<値>` のキーと、全体をまとめた `run_report=<JSON>`。
+    RUN_REPORT_PATH: 実行レポートの JSON ファイル。
+    PROMETHEUS_TEXTFILE: node_exporter の textfile collector 形式のファイル。
+
+PROFILE_RUN=1 の場合は cProfile と tracemalloc を有効にし、実行時間が PROFILE_SLOW_SECONDS 以上だった
+ときに PROFILE_DIR（既定: .cache/profiles）へプロファイルを保存します。
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+
+def _quantile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+class RunMetrics:
+    """1回の実行の計測値。スレッドから同時に記録しても安全。"""
+
+    def __init__(self, script: str = ""):
+        self.script = script
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.values: Dict[str, float] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self._profiler: Optional["cProfile.Profile"] = None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """with ブロックの所要時間を段階 name の時間として加算する。"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - started)
+
+    def add_stage(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def set(self, name: str, value: float) -> None:
+        with self._lock:
+            self.values[name] = value
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """投稿1回ごとのレイテンシなど、分布を見たい値を記録する。"""
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def report(self) -> dict:
+        """JSON にできる形の実行レポートを返す。"""
+        with self._lock:
+            latencies = {
+                name: {
+                    "count": len(values),
+                    "p50": _quantile(values, 0.5),
+                    "p95": _quantile(values, 0.95),
+                    "p99": _quantile(values, 0.99),
+                    "max": max(values),
+                    "sum": sum(values),
+                }
+                for name, values in self.latencies.items()
+                if values
+            }
+            return {
+                "script": self.script,
+                "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+                "total_seconds": round(self.elapsed(), 6),
+                "stages": {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                "values": dict(self.values),
+                "latencies": latencies,
+            }
+
+    def log_latency_summary(self, name: str, stage: Optional[str] = None) -> None:
+        """レイテンシ name の件数・スループット・パーセンタイルをログに出す。"""
+        summary = self.report()["latencies"].get(name)
+        if not summary:
+            return
+        seconds = self.stages.get(stage or "", 0.0) or summary["sum"]
+        throughput = summary["count"] / seconds if seconds else 0.0
+        logging.info(
+            f"{name}: {summary['count']} 件 / {seconds:.2f}秒 ({throughput:.2f} 件/秒)"
+            f" p50={summary['p50'] * 1000:.0f}ms p95={summary['p95'] * 1000:.0f}ms"
+            f" p99={summary['p99'] * 1000:.0f}ms max={summary['max'] * 1000:.0f}ms"
+        )
+
+    def github_output_lines(self) -> List[str]:
+        report = self.report()
+        lines = [f"metrics_total_seconds={report['total_seconds']}"]
+        lines += [f"metrics_{_metric_name(name)}_seconds={seconds}" for name, seconds in report["stages"].items()]
+        lines += [f"metrics_{_metric_name(name)}={value}" for name, value in report["values"].items()]
+        for name, summary in report["latencies"].items():
+            lines.append(f"metrics_{_metric_name(name)}_p95={round(summary['p95'], 6)}")
+        lines.append(f"run_report={json.dumps(report, ensure_ascii=False, separators=(',', ':'))}")
+        return lines
+
+    def prometheus_text(self) -> str:
+        report = self.report()
+        script = self.script.replace('"', "")
+        lines = [
+            "# TYPE kanpo_tweet_run_seconds gauge",
+            f'kanpo_tweet_run_seconds{{script="{script}"}} {report["total_seconds"]}',
+            "# TYPE kanpo_tweet_run_timestamp_seconds gauge",
+            f'kanpo_tweet_run_timestamp_seconds{{script="{script}"}} {self.started_at:.3f}',
+            "# TYPE kanpo_tweet_stage_seconds gauge",
+        ]
+        lines += [f'kanpo_tweet_stage_seconds{{script="{script}",stage="{_metric_name(name)}"}} {seconds}' for name, seconds in report["stages"].items()]
+        lines.append("# TYPE kanpo_tweet_value gauge")
+        lines += [f'kanpo_tweet_value{{script="{script}",name="{_metric_name(name)}"}} {value}' for name, value in report["values"].items()]
+        lines.append("# TYPE kanpo_tweet_latency_seconds summary")
+        for name, summary in report["latencies"].items():
+            label = f'script="{script}",name="{_metric_name(name)}"'
+            lines.append(f'kanpo_tweet_latency_seconds{{{label},quantile="0.5"}} {summary["p50"]}')
+            lines.append(f'kanpo_tweet_latency_seconds{{{label},quantile="0.95"}} {summary["p95"]}')
+            lines.append(f'kanpo_tweet_latency_seconds{{{label},quantile="0.99"}} {summary["p99"]}')
+            lines.append(f"kanpo_tweet_latency_seconds_sum{{{label}}} {summary['sum']}")
+            lines.append(f"kanpo_tweet_latency_seconds_count{{{label}}} {summary['count']}")
+        return "\n".join(lines) + "\n"
+
+    def emit(self) -> None:
+        """環境変数で指定された出力先に計測値を書き出す。"""
+        report = self.report()
+        logging.info(f"実行レポート: {json.dumps(report, ensure_ascii=False)}")
+
+        if "GITHUB_OUTPUT" in os.environ:
+            with open(os.environ["GITHUB_OUTPUT"], "a") as fh:
+                for line in self.github_output_lines():
+                    print(line, file=fh)
+
+        report_path = os.getenv("RUN_REPORT_PATH")
+        if report_path:
+            with open(report_path, "w", encoding="utf-8") as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+
+        textfile = os.getenv("PROMETHEUS_TEXTFILE")
+        if textfile:
+            # collector が書きかけのファイルを読まないように置き換えで書く
+            tmp_path = f"{textfile}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                fh.write(self.prometheus_text())
+            os.replace(tmp_path, textfile)
+
+    def start_profiling(self) -> None:
+        # プロファイルを取らない実行の起動時間を増やさないように、ここで読み込む
+        import cProfile
+
+        tracemalloc.start(10)
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def stop_profiling(self) -> None:
+        if self._profiler is None:
+            return
+        self._profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.set("memory_peak_bytes", peak)
+
+        elapsed = self.elapsed()
+        slow_seconds = float(os.getenv("PROFILE_SLOW_SECONDS", "0"))
+        if elapsed < slow_seconds:
+            logging.info(f"実行時間 {elapsed:.1f}秒 < {slow_seconds}秒 のためプロファイルは保存しません")
+            return
+
+        profile_dir = os.getenv("PROFILE_DIR") or os.path.join(".cache", "profiles")
+        os.makedirs(profile_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        base = os.path.join(profile_dir, f"{self.script or 'run'}-{stamp}")
+        self._profiler.dump_stats(f"{base}.prof")
+
+        import io
+        import pstats
+
+        text = io.StringIO()
+        pstats.Stats(self._profiler, stream=text).sort_stats("cumulative").print_stats(30)
+        text.write("\n--- tracemalloc top 20 ---\n")
+        for stat in snapshot.statistics("lineno")[:20]:
+            text.write(f"{stat}\n")
+        with open(f"{base}.txt", "w", encoding="utf-8") as fh:
+            fh.write(text.getvalue())
+        logging.info(f"プロファイルを保存しました: {base}.prof / {base}.txt")
+
+
+_current = RunMetrics()
+
+
+def get_metrics() -> RunMetrics:
+    """実行中の RunMetrics を返す。"""
+    return _current
+
+
+@contextmanager
+def metrics_run(script: str) -> Iterator[RunMetrics]:
+    """スクリプト1回分の計測を開始し、終了時（例外時も含む）に出力する。"""
+    global _current
+    _current = RunMetrics(script)
+    profiling = os.getenv("PROFILE_RUN", "0").lower() in ("1", "true", "yes")
+    if profiling:
+        _current.start_profiling()
+    try:
+        yield _current
+    finally:
+        if profiling:
+            _current.stop_profiling()
+        try:
+            _current.emit()
+        except OSError as error:
+            logging.error(f"計測値の出力に失敗: {error}")
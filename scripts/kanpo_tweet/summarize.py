@@ -0,0 +1,484 @@
+"""summarize コマンド: 詳細版RSSから当日分を取得し、Geminiで要約してXに投稿する
+
+    python -m kanpo_tweet summarize [rss_toc_url] [YYYY-MM-DD]
+
+--from / --to を指定すると、その期間（JST）の各日を要約して古い日から順に投稿します（障害後の取り戻し用）。
+google.genai は Gemini のクライアントを作るとき、tweepy は投稿するときに初めて読み込むので、
+当日分のエントリがない実行ではどちらも読み込みません。
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from kanpo_tweet.feed_fetch import fetch_feed
+from kanpo_tweet import gemini_summary, pre_ranker
+from kanpo_tweet.feed_stream import entries_in_window
+from kanpo_tweet.post_outbox import PostOutbox, poster_sender
+from kanpo_tweet.run_metrics import get_metrics
+from kanpo_tweet.summary_cache import SummaryCache, make_key
+from kanpo_tweet.toc_index import TocIndex
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+JST = ZoneInfo("Asia/Tokyo")
+RSS_VIEWER_URL = "https://kanpo-viewer.com"
+MAX_TWEET_LENGTH = 25000  # 要約ツイート用
+DEBUG = os.getenv("DEBUG_GEMINI_POST", "0").lower() in ("1", "true", "yes")
+# Gemini に渡す前にエントリを絞り込む（pre_ranker）。0 で全件を渡す
+PRERANK = os.getenv("GEMINI_PRERANK", "1").lower() not in ("0", "false", "no")
+# Gemini で要約できなかった・間に合わなかった場合に、ローカルの要約文で投稿する
+OFFLINE_FALLBACK = os.getenv("GEMINI_OFFLINE_FALLBACK", "1").lower() not in ("0", "false", "no")
+# 要約全体の締め切り（秒）。指定するとストリーミングで呼び出し、遅い場合は速いモデルでもヘッジする。0 で無制限
+DEADLINE_SECONDS = float(os.getenv("GEMINI_DEADLINE_SECONDS", "0"))
+# X / Gemini の代わりに使うベースURL（--target で指定。None は本番）
+API_TARGET = None
+
+
+def _to_summary_entry(item) -> dict:
+    """Entry を要約用の辞書（summary・categories 付き）にする。"""
+    entry = item.to_output(with_categories=True, date_format="%Y-%m-%d %H:%M:%S UTC")
+    entry["summary"] = item.description
+    return entry
+
+
+def get_entries_by_date(rss_toc_url: str, first_date: date, last_date: date) -> Dict[date, List[dict]]:
+    """詳細版RSSを1回だけ取得・パースし、first_date〜last_date（JST）のエントリを日付ごとに返す。
+
+    エントリのない日も空のリストとして含めます。各日のエントリはフィード上の順序のままです。
+    詳細版のインデックス（TOC_INDEX）が有効な場合は本文を取り込み、feed_toc.xml から既に消えた項目を
+    インデックスから補うので、消えた日も要約できます。
+    """
+    start_utc = datetime(first_date.year, first_date.month, first_date.day, tzinfo=JST).astimezone(timezone.utc)
+    end_jst = datetime(last_date.year, last_date.month, last_date.day, tzinfo=JST) + timedelta(days=1)
+    end_utc = end_jst.astimezone(timezone.utc)
+
+    # 304 の場合もキャッシュ済みの本文を使う（同じ日付での再実行でも要約できるように）
+    metrics = get_metrics()
+    with metrics.stage("fetch"):
+        body = fetch_feed(rss_toc_url).body
+
+    buckets: Dict[date, List[dict]] = {
+        first_date + timedelta(days=offset): [] for offset in range((last_date - first_date).days + 1)
+    }
+    index = TocIndex.from_env()
+    try:
+        if index is not None:
+            with metrics.stage("index"):
+                index.ingest(body)
+        with metrics.stage("parse_filter"):
+            if index is not None:
+                items = index.merge_window(body, start_utc, end_utc)
+            else:
+                items = entries_in_window(body, start_utc, end_utc, compact=True)
+            for item in items:
+                buckets[item.published.astimezone(JST).date()].append(_to_summary_entry(item))
+    finally:
+        if index is not None:
+            index.close()
+    return buckets
+
+
+def get_today_entries_from_toc(rss_toc_url: str, target_date: Optional[datetime] = None) -> List[dict]:
+    """詳細版RSSから指定日（省略時は今日・JST）のエントリを返す。"""
+    if target_date is None:
+        target_date = datetime.now(JST).date()
+    elif hasattr(target_date, "date"):
+        target_date = target_date.date()
+    return get_entries_by_date(rss_toc_url, target_date, target_date)[target_date]
+
+
+def get_summary_mode() -> str:
+    """環境変数 GEMINI_SUMMARY_MODE の要約方法（不明な値の場合は single）。"""
+    mode = os.getenv("GEMINI_SUMMARY_MODE", "single").lower()
+    if mode not in gemini_summary.SUMMARY_MODES + ("offline",):
+        logging.warning("不明な GEMINI_SUMMARY_MODE です: %s（single で実行します）", mode)
+        mode = "single"
+    return mode
+
+
+def make_gemini_client():
+    """環境変数 GEMINI_API_KEY のキーで Gemini クライアントを作る。"""
+    api_key = os.environ.get("GEMINI_API_KEY") or ("mock" if API_TARGET else None)
+    if not api_key:
+        raise EnvironmentError("環境変数 GEMINI_API_KEY が設定されていません。")
+    return gemini_summary.make_client(api_key, base_url=API_TARGET)
+
+
+def estimate_calls(entries: List[dict], mode: str) -> int:
+    """1日分の要約に必要な Gemini API の呼び出し回数の見積もり。"""
+    if mode == "offline" or not entries:
+        return 0
+    if PRERANK and pre_ranker.prompt_tokens(entries) > pre_ranker.DEFAULT_TOKEN_BUDGET:
+        # 絞り込んだ場合は1回のプロンプトに収まる
+        return 1
+    return gemini_summary.estimate_calls(entries, mode)
+
+
+def summarize_entries(
+    client,
+    model: str,
+    mode: str,
+    entries: List[dict],
+    cache: Optional[SummaryCache],
+    heading: str = "本日の官報（詳細版）",
+) -> gemini_summary.SummaryResult:
+    """1日分のエントリを要約し、所要時間と呼び出し回数を計測値に加える。
+
+    PRERANK が有効でプロンプトが予算（GEMINI_PROMPT_TOKEN_BUDGET）を超える場合だけ、pre_ranker で絞り込んだ
+    エントリを渡します。予算に収まる日は件数によらず mode の方法（single / mapreduce）で全エントリを要約します。
+    DEADLINE_SECONDS を指定した場合は、呼び出しの開始からその秒数を締め切りとします。
+    mode が offline の場合、または Gemini の呼び出しが失敗・締め切り超過になった場合（OFFLINE_FALLBACK）は、
+    Gemini を使わずに pre_ranker の結果から投稿文を作ります。
+    """
+    metrics = get_metrics()
+    deadline = time.monotonic() + DEADLINE_SECONDS if DEADLINE_SECONDS else None
+    digest = None
+    if mode == "offline" or (PRERANK and pre_ranker.prompt_tokens(entries) > pre_ranker.DEFAULT_TOKEN_BUDGET):
+        with metrics.stage("prerank"):
+            digest = pre_ranker.select_entries(entries)
+        if digest.omitted:
+            selected_tokens = pre_ranker.estimate_tokens(pre_ranker.format_digest(digest))
+            metrics.set("prompt_tokens_full", digest.full_tokens)
+            metrics.set("prompt_tokens", selected_tokens)
+            logging.info(
+                "事前選別: %d 件 → %d 件（残り %d 件は件数のみ、約 %d → %d トークン）",
+                digest.total,
+                len(digest.selected),
+                digest.omitted,
+                digest.full_tokens,
+                selected_tokens,
+            )
+
+    def _summarize() -> gemini_summary.SummaryResult:
+        if digest is not None and digest.omitted:
+            return gemini_summary.summarize_ranked(client, model, digest, RSS_VIEWER_URL, cache=cache, deadline=deadline)
+        if mode == "mapreduce":
+            return gemini_summary.summarize_map_reduce(client, model, entries, RSS_VIEWER_URL, cache=cache, deadline=deadline)
+        return gemini_summary.summarize_single(client, model, entries, RSS_VIEWER_URL, cache=cache, deadline=deadline)
+
+    if mode == "offline":
+        result = offline_summary(entries, digest, heading)
+    else:
+        try:
+            result = _summarize()
+        except Exception as e:
+            if not OFFLINE_FALLBACK:
+                raise
+            logging.warning("Gemini で要約できなかったため、ローカルで作った要約文を使います: %s", e)
+            metrics.incr("gemini_fallbacks")
+            result = offline_summary(entries, digest, heading)
+
+    for stage, seconds in result.timings.items():
+        metrics.add_stage(f"gemini_{stage}", seconds)
+    metrics.incr("gemini_calls", result.calls)
+    metrics.incr("gemini_cache_hits", result.cache_hits)
+    logging.info(
+        "Gemini 要約 (%s, %s, 呼び出し %d 回, キャッシュ %d 件): %s",
+        mode,
+        model,
+        result.calls,
+        result.cache_hits,
+        gemini_summary.format_timings(result.timings),
+    )
+    return result
+
+
+def offline_summary(entries: List[dict], digest: Optional[pre_ranker.RankedDigest], heading: str) -> gemini_summary.SummaryResult:
+    """Gemini を使わず、pre_ranker の点数の高い項目とカテゴリ別の件数で投稿文を作る。"""
+    started = time.perf_counter()
+    if digest is None:
+        digest = pre_ranker.select_entries(entries)
+    text = pre_ranker.build_offline_summary(digest, RSS_VIEWER_URL, heading=heading, max_length=MAX_TWEET_LENGTH)
+    elapsed = time.perf_counter() - started
+    return gemini_summary.SummaryResult(text=text, timings={"offline": elapsed, "total": elapsed})
+
+
+def summarize_with_gemini(entries: List[dict], target_day: Optional[date] = None) -> str:
+    """Gemini APIで当日分の内容を要約する。APIキーは環境変数 GEMINI_API_KEY から取得。
+
+    環境変数 GEMINI_SUMMARY_MODE で要約方法を切り替える。
+        single: 全エントリを1つのプロンプトで要約する（既定）。
+        mapreduce: トークン数で分割したグループを並列に要約し、最後にまとめる。
+        offline: Gemini を使わず、pre_ranker で選んだ項目とカテゴリ別の件数で投稿文を作る。
+    """
+    mode = get_summary_mode()
+    client = None if mode == "offline" else make_gemini_client()
+    if not entries:
+        return ""
+
+    cache = SummaryCache.from_env()
+    try:
+        return summarize_entries(client, gemini_summary.get_model(), mode, entries, cache, heading=_heading(target_day)).text
+    finally:
+        if cache is not None:
+            cache.log_stats()
+            cache.close()
+
+
+def _heading(day: Optional[date]) -> str:
+    if day is None:
+        return "本日の官報（詳細版）"
+    return f"{day.year}年{day.month}月{day.day}日の官報（詳細版）"
+
+
+def post_to_x(text: str, thread_key: Optional[str] = None) -> Optional[str]:
+    """テキストをXに投稿する。成功時はツイートID、失敗時はNone。
+
+    thread_key を指定し、アウトボックスが有効な場合は、保存してから投稿する。失敗した場合は
+    アウトボックスに残り、次回の実行（または scripts/drain_outbox.py）で再送される。
+    """
+    logging.info(f"Tweet内容: {text}")
+    # logging.info("Tweet内容: %s", text[:200] + "..." if len(text) > 200 else text)
+
+    if DEBUG and not API_TARGET:
+        logging.info("DEBUG のため投稿をスキップしました")
+        return "debug"
+
+    from kanpo_tweet.x_poster import get_default_poster
+
+    poster = get_default_poster(base_url=API_TARGET)
+    if poster is None:
+        logging.error("X API の認証情報が環境変数に設定されていません。")
+        return None
+
+    outbox = PostOutbox.from_env() if thread_key else None
+    if outbox is None:
+        tweet_id = poster.post(text)
+        logging.info("Tweet ID: %s", tweet_id)
+        return tweet_id
+    try:
+        send = poster_sender(poster)
+        # 前回までに失敗したポストを先に送ってから、今回のポストを送る
+        outbox.drain(send)
+        outbox.enqueue_thread(thread_key, [text])
+        result = outbox.drain(send, thread_keys=[thread_key])
+    finally:
+        outbox.close()
+    tweet_ids = result.thread_ids.get(thread_key) or []
+    if result.pending:
+        logging.warning("アウトボックスに未投稿のポストが %d 件あります", result.pending)
+    return tweet_ids[0] if tweet_ids else None
+
+
+def plan_backfill(buckets: Dict[date, List[dict]], mode: str, max_calls: int) -> Tuple[List[date], List[date]]:
+    """要約する日と、呼び出し回数の予算を超えるため見送る日を、それぞれ古い順に返す。
+
+    投稿を日付順に保つため、予算に収まらない日が出たらそれ以降の日もすべて見送ります。
+    エントリのない日はどちらにも含めません。max_calls が 0 の場合は無制限です。
+    """
+    planned: List[date] = []
+    deferred: List[date] = []
+    used = 0
+    for day in sorted(buckets):
+        entries = buckets[day]
+        if not entries:
+            continue
+        calls = estimate_calls(entries, mode)
+        if deferred or (max_calls and used + calls > max_calls):
+            deferred.append(day)
+            continue
+        planned.append(day)
+        used += calls
+    return planned, deferred
+
+
+def backfill(rss_toc_url: str, first_date: date, last_date: date, concurrency: int, max_calls: int) -> List[dict]:
+    """first_date〜last_date の各日を要約し、古い日から順に投稿する。
+
+    フィードの取得・パースは1回だけで、要約は concurrency 日ずつ並列に行います。
+    ある日の要約・投稿に失敗した場合、日付順を崩さないようにそれ以降の日は投稿しません
+    （要約はキャッシュに残るので、同じ範囲で再実行すれば続きから投稿できます）。
+
+    Returns:
+        List[dict]: 日ごとの進捗（date / entries / status / calls / cache_hits / seconds / tweet_id）。
+            status は posted / empty / deferred / failed / skipped のいずれか。
+    """
+    metrics = get_metrics()
+    buckets = get_entries_by_date(rss_toc_url, first_date, last_date)
+    mode = get_summary_mode()
+    model = gemini_summary.get_model()
+    planned, deferred = plan_backfill(buckets, mode, max_calls)
+    progress = {day: {"date": day.isoformat(), "entries": len(entries), "status": "empty"} for day, entries in buckets.items()}
+    for day in deferred:
+        progress[day]["status"] = "deferred"
+    logging.info(
+        "バックフィル %s〜%s: %d 日（要約 %d 日 / 予算超過で見送り %d 日 / エントリなし %d 日）",
+        first_date,
+        last_date,
+        len(buckets),
+        len(planned),
+        len(deferred),
+        len(buckets) - len(planned) - len(deferred),
+    )
+    metrics.set("backfill_days", len(buckets))
+    metrics.set("backfill_deferred", len(deferred))
+    if not planned:
+        return list(progress.values())
+
+    client = None if mode == "offline" else make_gemini_client()
+    cache = SummaryCache.from_env()
+    stopped = False
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = [
+                (day, executor.submit(summarize_entries, client, model, mode, buckets[day], cache, _heading(day))) for day in planned
+            ]
+            for index, (day, future) in enumerate(futures, 1):
+                record = progress[day]
+                if stopped:
+                    # まだ始まっていない要約は取り消し、呼び出し回数を使わない
+                    future.cancel()
+                    record["status"] = "skipped"
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error("[%d/%d] %s: 要約に失敗しました: %s", index, len(futures), day, e)
+                    record["status"] = "failed"
+                    stopped = True
+                    continue
+                record.update(calls=result.calls, cache_hits=result.cache_hits, seconds=round(result.timings.get("total", 0.0), 3))
+                with metrics.stage("post"):
+                    tweet_id = post_to_x(result.text, thread_key=f"gemini:{day.isoformat()}#{make_key(result.text)[:16]}")
+                record["tweet_id"] = tweet_id
+                if tweet_id is None:
+                    record["status"] = "failed"
+                    stopped = True
+                else:
+                    record["status"] = "posted"
+                    metrics.incr("backfill_posted")
+                logging.info(
+                    "[%d/%d] %s: エントリ %d 件 / 要約 %.2f秒（呼び出し %d 回, キャッシュ %d 件）/ %s",
+                    index,
+                    len(futures),
+                    day,
+                    record["entries"],
+                    record["seconds"],
+                    result.calls,
+                    result.cache_hits,
+                    f"投稿 {tweet_id}" if tweet_id is not None else "投稿に失敗",
+                )
+    finally:
+        if cache is not None:
+            cache.log_stats()
+            cache.close()
+    return list(progress.values())
+
+
+def _parse_date(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付の形式が不正です (YYYY-MM-DD): {value}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する。"""
+    parser = argparse.ArgumentParser(description="詳細版RSSから当日分を取得し、Geminiで要約してXに投稿します。")
+    parser.add_argument("rss_toc_url", nargs="?", default="https://kanpo-viewer.com/feed_toc.xml", help="詳細版RSSのURL")
+    parser.add_argument("date", nargs="?", help="対象日 YYYY-MM-DD（省略時は当日 JST）")
+    parser.add_argument("--from", dest="date_from", type=_parse_date, help="バックフィルの開始日 YYYY-MM-DD（JST）")
+    parser.add_argument("--to", dest="date_to", type=_parse_date, help="バックフィルの終了日 YYYY-MM-DD（省略時は当日 JST）")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=int(os.getenv("GEMINI_BACKFILL_CONCURRENCY", "2")),
+        help="バックフィルで同時に要約する日数（既定 2）",
+    )
+    parser.add_argument(
+        "--max-calls",
+        type=int,
+        default=int(os.getenv("GEMINI_BACKFILL_MAX_CALLS", "30")),
+        help="バックフィル1回で使う Gemini API 呼び出し回数の上限（見積もり、0 で無制限、既定 30）",
+    )
+    parser.add_argument(
+        "--target",
+        default="production",
+        help="X / Gemini の接続先。production（既定）または代替サーバーのベースURL（例: http://127.0.0.1:8700）",
+    )
+    args = parser.parse_args(argv)
+    if args.date_to and not args.date_from:
+        parser.error("--to は --from と一緒に指定してください")
+    if args.date_from and args.date:
+        parser.error("対象日と --from は同時に指定できません")
+    if args.date_from:
+        args.date_to = args.date_to or datetime.now(JST).date()
+        if args.date_from > args.date_to:
+            parser.error("--from が --to より後の日付です")
+    return args
+
+
+def main(argv=None) -> None:
+    """詳細版RSSから当日分を取得し、Geminiで要約してXに投稿する。"""
+    global API_TARGET
+    # 引数: rss_toc_url [YYYY-MM-DD] [--from YYYY-MM-DD [--to YYYY-MM-DD]] [--target URL]
+    args = parse_args(argv)
+    rss_toc_url = args.rss_toc_url
+    API_TARGET = None if args.target == "production" else args.target
+    if API_TARGET:
+        logging.info("接続先: %s（代替サーバー）", API_TARGET)
+    target_date = None
+    if args.date:
+        try:
+            target_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+        except ValueError:
+            logging.warning("日付の形式が不正です (YYYY-MM-DD): %s", args.date)
+
+    logging.info("RSS TOC URL: %s", rss_toc_url)
+
+    if args.date_from:
+        days = backfill(rss_toc_url, args.date_from, args.date_to, args.concurrency, args.max_calls)
+        for record in days:
+            logging.info(
+                "  %s: %-8s エントリ %4d 件 / 呼び出し %s 回 / キャッシュ %s 件 / tweet_id %s",
+                record["date"],
+                record["status"],
+                record["entries"],
+                record.get("calls", "-"),
+                record.get("cache_hits", "-"),
+                record.get("tweet_id") or "-",
+            )
+        posted = sum(1 for record in days if record["status"] == "posted")
+        if os.environ.get("GITHUB_OUTPUT"):
+            with open(os.environ["GITHUB_OUTPUT"], "a") as f:
+                f.write(f"updated={'true' if posted else 'false'}\n")
+                f.write(f"posted_days={posted}\n")
+                f.write(f"days={json.dumps(days, ensure_ascii=False)}\n")
+        return
+
+    entries = get_today_entries_from_toc(rss_toc_url, target_date=target_date)
+    logging.info("当日分のエントリ数: %d", len(entries))
+    get_metrics().set("entries_in_window", len(entries))
+
+    if not entries:
+        logging.warning("当日の詳細版エントリがありません。投稿をスキップします。")
+        if os.environ.get("GITHUB_OUTPUT"):
+            with open(os.environ["GITHUB_OUTPUT"], "a") as f:
+                f.write("updated=false\n")
+                f.write("entries=[]\n")
+        return
+
+    summary = summarize_with_gemini(entries, target_date)
+    # if len(summary) > MAX_TWEET_LENGTH:
+    #     summary = summary[: MAX_TWEET_LENGTH - 3] + "..."
+
+    target_day = target_date or datetime.now(JST).date()
+    with get_metrics().stage("post"):
+        tweet_id = post_to_x(summary, thread_key=f"gemini:{target_day.isoformat()}#{make_key(summary)[:16]}")
+
+    if os.environ.get("GITHUB_OUTPUT"):
+        with open(os.environ["GITHUB_OUTPUT"], "a") as f:
+            f.write("updated=true\n")
+            f.write(f"tweet_id={tweet_id or ''}\n")
+            f.write(f"entries_count={len(entries)}\n")
+
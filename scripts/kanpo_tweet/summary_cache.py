@@ -0,0 +1,127 @@
+"""Gemini の要約結果をプロンプトの内容で引けるようにするキャッシュ（SQLite）
+
+キーは (モデル名, プロンプトテンプレートのバージョン, 種類, 正規化したエントリ) のハッシュです。
+同じ日付での再実行や投稿失敗後のリトライでは API を呼ばずに結果を返します。
+map-reduce の場合はグループごとの部分要約もキャッシュするので、変わったグループだけが再度問い合わされます。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, List, Optional
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "gemini", "summaries.sqlite3")
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+def normalize_text(text: str) -> str:
+    """NFKC 正規化と空白の畳み込みを行う（表記揺れだけの違いでキャッシュを外さないため）。"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+def normalize_entries(entries: List[dict]) -> List[List[str]]:
+    """要約に使うフィールドだけを取り出して正規化する。"""
+    return [
+        [
+            normalize_text(entry.get("title", "")),
+            normalize_text(entry.get("description") or entry.get("summary", "")),
+            entry.get("link", "").strip(),
+        ]
+        for entry in entries
+    ]
+
+
+def make_key(*parts: Any) -> str:
+    """JSON に直列化できる値の組から SHA-256 のキーを作る。"""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """要約結果の永続キャッシュ。サイズと経過日数で古いものから削除する。"""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES, max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 24 * 60 * 60
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # map の並列呼び出しから使うため、1つの接続をロックで守って共有する
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " model TEXT NOT NULL,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self.evict()
+
+    @classmethod
+    def from_env(cls) -> Optional["SummaryCache"]:
+        """環境変数から作る。GEMINI_CACHE=0 の場合や開けない場合は None。"""
+        if os.getenv("GEMINI_CACHE", "1").lower() in ("0", "false", "no"):
+            return None
+        try:
+            return cls(
+                path=os.getenv("GEMINI_CACHE_PATH") or DEFAULT_CACHE_PATH,
+                max_bytes=int(os.getenv("GEMINI_CACHE_MAX_BYTES", str(DEFAULT_MAX_BYTES))),
+                max_age_days=float(os.getenv("GEMINI_CACHE_MAX_AGE_DAYS", str(DEFAULT_MAX_AGE_DAYS))),
+            )
+        except (OSError, sqlite3.Error) as error:
+            logging.warning("要約キャッシュを開けません（キャッシュなしで続行）: %s", error)
+            return None
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE summaries SET used_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key: str, kind: str, model: str, text: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, kind, model, text, size, created_at, used_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, kind, model, text, len(text.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """期限切れを削除し、合計サイズが上限を超えていれば最近使われていないものから削除する。"""
+        with self._lock:
+            self._conn.execute("DELETE FROM summaries WHERE used_at < ?", (time.time() - self.max_age,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+            if total > self.max_bytes:
+                for key, size in self._conn.execute("SELECT key, size FROM summaries ORDER BY used_at").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    total -= size
+            self._conn.commit()
+
+    def log_stats(self) -> None:
+        logging.info("要約キャッシュ: ヒット %d / ミス %d (%s)", self.hits, self.misses, self.path)
+
+    def close(self) -> None:
+        self._conn.close()
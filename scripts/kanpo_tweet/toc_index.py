@@ -0,0 +1,256 @@
+"""詳細版フィード（feed_toc.xml）の全項目を貯めておく全文検索インデックス（SQLite FTS5）
+
+feed_toc.xml から消えた項目も後から検索できるように、取得のたびに項目（タイトル・リンク・カテゴリ・
+description・pubDate）を追記します。項目は feed_snapshot.item_id（guid → link → title のハッシュ）で
+識別するので、同じ本文を何度取り込んでも重複しません。前回と同じ本文の場合はパースもしません。
+フィードは新しい順なので、インデックスの最新の pubDate より grace 以上古い項目まで来たらパースを打ち切ります
+（取り込み済みとみなす。full=True で全件を確認）。
+
+全文検索は FTS5 の trigram トークナイザを使うので、日本語でも分かち書きなしで部分一致します。
+trigram で引けない2文字以下のキーワードは instr で絞り込みます。
+
+rowid は「pubDate（エポック秒）<< 20 | 連番」で、rowid の降順がそのまま新しい順（同じ pubDate 内はフィード上の順）
+になります。キーワード（FTS5）・カテゴリ・期間のどれで引いても rowid の降順に走査して LIMIT 件で止まるので、
+10万件規模でも1回の検索は1ミリ秒程度です。
+
+    index = TocIndex.from_env()
+    index.ingest(body)
+    index.search("道路交通法", category="告示", since=datetime(2026, 9, 1, tzinfo=timezone.utc))
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import List, Optional
+
+from kanpo_tweet.feed_entry import Entry, intern_categories
+from kanpo_tweet.feed_snapshot import item_id
+from kanpo_tweet.feed_stream import entries_in_window, iter_entries
+
+DEFAULT_INDEX_PATH = os.path.join(".cache", "toc_index", "toc.sqlite3")
+# カテゴリを1列に連結するときの区切り（項目名に現れない文字）
+CATEGORY_SEPARATOR = "\x1f"
+TRIGRAM_MIN_LENGTH = 3
+# rowid の下位ビット（同じ pubDate の項目の連番）
+SEQUENCE_BITS = 20
+# 差分の取り込みで、インデックスの最新の pubDate からどれだけ古い項目まで確認するか（秒）
+DEFAULT_GRACE_SECONDS = int(float(os.getenv("TOC_INDEX_GRACE_HOURS", "48")) * 60 * 60)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS entries ("
+    " id INTEGER PRIMARY KEY,"
+    " key TEXT NOT NULL UNIQUE,"
+    " title TEXT NOT NULL,"
+    " link TEXT NOT NULL,"
+    " description TEXT NOT NULL,"
+    " guid TEXT NOT NULL,"
+    " categories TEXT NOT NULL,"
+    " published_ts INTEGER)",
+    "CREATE TABLE IF NOT EXISTS entry_categories ("
+    " entry_id INTEGER NOT NULL REFERENCES entries (id),"
+    " category TEXT NOT NULL,"
+    " PRIMARY KEY (category, entry_id)) WITHOUT ROWID",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+    " title, description, content='entries', content_rowid='id', tokenize='trigram')",
+    "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)",
+)
+
+
+def _row_to_entry(row) -> Entry:
+    title, link, description, guid, categories, published_ts = row
+    return Entry(
+        title=title,
+        link=link,
+        description=description,
+        guid=guid,
+        published_ts=published_ts,
+        categories=intern_categories(categories.split(CATEGORY_SEPARATOR) if categories else ()),
+    )
+
+
+def _fts_phrase(keyword: str) -> str:
+    """キーワードを FTS5 のフレーズとして引用する（記号を演算子として解釈させない）。"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+class TocIndex:
+    """詳細版の項目の全文検索インデックス。"""
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["TocIndex"]:
+        """環境変数から作る。TOC_INDEX=0 の場合や開けない場合は None。"""
+        if os.getenv("TOC_INDEX", "1").lower() in ("0", "false", "no"):
+            return None
+        try:
+            return cls(path=os.getenv("TOC_INDEX_PATH") or DEFAULT_INDEX_PATH)
+        except (OSError, sqlite3.Error) as error:
+            logging.warning("詳細版のインデックスを開けません（インデックスなしで続行）: %s", error)
+            return None
+
+    def _next_rowids(self, published_ts: int) -> int:
+        """その pubDate で次に使う rowid。"""
+        low = published_ts << SEQUENCE_BITS
+        row = self._conn.execute(
+            "SELECT MAX(id) FROM entries WHERE id >= ? AND id < ?", (low, low + (1 << SEQUENCE_BITS))
+        ).fetchone()
+        return low if row[0] is None else row[0] + 1
+
+    def ingest(self, body: bytes, source: str = "feed_toc", full: bool = False, grace: int = DEFAULT_GRACE_SECONDS) -> int:
+        """フィード本文の項目を追加し、新しく追加した件数を返す。前回と同じ本文ならパースしない。
+
+        full=False の場合、インデックスの最新の pubDate より grace 秒以上古い項目が出てきた時点でパースを打ち切ります。
+        """
+        if not body:
+            return 0
+        digest = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (f"body_sha1:{source}",)).fetchone()
+            if row is not None and row[0] == digest:
+                return 0
+            newest_rowid = self._conn.execute("SELECT MAX(id) FROM entries").fetchone()[0]
+        stop_before = None if full or newest_rowid is None else (newest_rowid >> SEQUENCE_BITS) - grace
+        try:
+            entries = []
+            for entry in iter_entries(body):
+                if stop_before is not None and entry.published_ts is not None and entry.published_ts < stop_before:
+                    break
+                entries.append(entry)
+        except (ET.ParseError, ValueError) as error:
+            logging.warning("詳細版のインデックスに取り込めません（フィードを解析できません）: %s", error)
+            return 0
+
+        added = []
+        next_rowids = {}
+        with self._lock:
+            try:
+                # 古い項目から入れて、同じ pubDate の中ではフィード上で先の項目ほど大きい rowid にする
+                for entry in reversed(entries):
+                    published_ts = max(0, entry.published_ts or 0)
+                    rowid = next_rowids.get(published_ts)
+                    if rowid is None:
+                        rowid = self._next_rowids(published_ts)
+                    cursor = self._conn.execute(
+                        "INSERT OR IGNORE INTO entries (id, key, title, link, description, guid, categories, published_ts)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            rowid,
+                            item_id(entry),
+                            entry.title,
+                            entry.link,
+                            entry.description,
+                            entry.guid,
+                            CATEGORY_SEPARATOR.join(entry.categories),
+                            entry.published_ts,
+                        ),
+                    )
+                    if cursor.rowcount:
+                        added.append((rowid, entry))
+                        rowid += 1
+                    next_rowids[published_ts] = rowid
+                self._conn.executemany(
+                    "INSERT INTO entries_fts (rowid, title, description) VALUES (?, ?, ?)",
+                    [(rowid, entry.title, entry.description) for rowid, entry in added],
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO entry_categories (entry_id, category) VALUES (?, ?)",
+                    [(rowid, category) for rowid, entry in added for category in entry.categories],
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (f"body_sha1:{source}", digest)
+                )
+                self._conn.commit()
+            except sqlite3.Error:
+                self._conn.rollback()
+                raise
+        if added:
+            logging.info("詳細版のインデックスに %d 件を追加しました（%s）", len(added), self.path)
+        return len(added)
+
+    def search(
+        self,
+        keyword: Optional[str] = None,
+        category: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = 50,
+    ) -> List[Entry]:
+        """キーワード・カテゴリ・期間（since 以上 until 未満）で検索し、新しい順に返す。
+
+        キーワードはタイトルと description の部分一致です（空白区切りで複数指定した場合はすべてを含むもの）。
+        """
+        keywords = keyword.split() if keyword else []
+        long_words = [word for word in keywords if len(word) >= TRIGRAM_MIN_LENGTH]
+        short_words = [word for word in keywords if len(word) < TRIGRAM_MIN_LENGTH]
+
+        # 最も絞り込める条件の表から rowid の降順に走査し、残りの条件は1件ずつ確かめる
+        if long_words:
+            driver, params = "entries_fts d JOIN entries e ON e.id = d.rowid", []
+            clauses = ["entries_fts MATCH ?"]
+            params.append(" AND ".join(_fts_phrase(word) for word in long_words))
+            rowid = "d.rowid"
+            if category:
+                clauses.append("EXISTS (SELECT 1 FROM entry_categories c WHERE c.category = ? AND c.entry_id = e.id)")
+                params.append(category)
+        elif category:
+            driver, params = "entry_categories d JOIN entries e ON e.id = d.entry_id", [category]
+            clauses = ["d.category = ?"]
+            rowid = "d.entry_id"
+        else:
+            driver, params, clauses, rowid = "entries e", [], [], "e.id"
+        for word in short_words:
+            clauses.append("(instr(e.title, ?) > 0 OR instr(e.description, ?) > 0)")
+            params.extend([word, word])
+        if since is not None:
+            clauses.append(f"{rowid} >= ?")
+            params.append(max(0, int(since.timestamp())) << SEQUENCE_BITS)
+        if until is not None:
+            clauses.append(f"{rowid} < ?")
+            params.append(max(0, int(until.timestamp())) << SEQUENCE_BITS)
+
+        sql = f"SELECT e.title, e.link, e.description, e.guid, e.categories, e.published_ts FROM {driver}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {rowid} DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_entry(row) for row in rows]
+
+    def window(self, start: datetime, end: Optional[datetime] = None) -> List[Entry]:
+        """pubDate が start 以上 end 未満の項目を新しい順に返す（フィード上の順序とは限らない）。"""
+        return self.search(since=start, until=end, limit=None)
+
+    def merge_window(self, body: bytes, start: datetime, end: Optional[datetime] = None) -> List[Entry]:
+        """entries_in_window(body, start, end, compact=True) の結果に、本文から既に消えた項目を続けて返す。
+
+        本文にある項目はフィード上の順序のままなので、投稿文の組み立てや要約の結果は本文だけを使う場合と変わりません。
+        """
+        items = entries_in_window(body, start, end, compact=True)
+        seen = {item_id(item) for item in items}
+        return items + [entry for entry in self.window(start, end) if item_id(entry) not in seen]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,92 @@
+"""本体フィードのタイトル（本紙・号外などの号名）から詳細版エントリを引くための索引
+
+各タイトルについて全 description を `in` で走査すると、タイトル数 × 詳細版エントリ数の
+部分文字列検索になります。ここでは全タイトルから Aho–Corasick オートマトンを1回だけ作り、
+各 description を1回走査するだけで、含まれているタイトルをすべて見つけます。
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class TitleMatcher:
+    """複数のタイトルを同時に検索する Aho–Corasick オートマトン。"""
+
+    def __init__(self, titles: Iterable[str]):
+        self.titles: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for title in dict.fromkeys(titles):
+            if title:
+                self._add(title)
+        self._build_failure_links()
+
+    def _add(self, title: str) -> None:
+        node = 0
+        for char in title:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append(len(self.titles))
+        self.titles.append(title)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child].extend(self._output[self._fail[child]])
+
+    def find(self, text: str) -> Set[str]:
+        """text に部分文字列として含まれるタイトルの集合を返す。"""
+        found: Set[int] = set()
+        node = 0
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return {self.titles[index] for index in found}
+
+
+def group_toc_entries(titles: Iterable[str], toc_entries: List[dict]) -> Dict[str, List[dict]]:
+    """タイトルごとに、description にそのタイトルを含む詳細版エントリを元の順序で返す。
+
+    `[e for e in toc_entries if title in e.get("description", "")]` をタイトルごとに実行した結果と同じです。
+
+    Args:
+        titles (Iterable[str]): 本体フィードのタイトル。
+        toc_entries (List[dict]): 詳細版のエントリ。
+
+    Returns:
+        Dict[str, List[dict]]: タイトル → 該当する詳細版エントリのリスト。
+    """
+    titles = list(dict.fromkeys(titles))
+    groups: Dict[str, List[dict]] = {title: [] for title in titles}
+    matcher = TitleMatcher(titles)
+    match_all = "" in groups  # 空文字のタイトルはすべての description に含まれる
+
+    for toc_entry in toc_entries:
+        matched = matcher.find(toc_entry.get("description", ""))
+        if match_all:
+            matched.add("")
+        # 各リストには詳細版の順に追加されるので、集合の走査順は結果に影響しない
+        for title in matched:
+            groups[title].append(toc_entry)
+    return groups
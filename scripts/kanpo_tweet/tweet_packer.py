@@ -0,0 +1,141 @@
+"""詳細版の各項目（フラグメント）をポストの文字数上限に収まるよう詰める処理
+
+これまではフラグメントを1つ追加するたびに、それまでに溜まった本文全体を
+twitter_text.parse_tweet で数え直していたため、項目数に対して二乗の計算量でした。
+ここでは各フラグメントの重み付き文字数を1回だけ計算して足し合わせ、
+parse_tweet による正確なカウントは完成したポストごとに1回だけ行います。
+"""
+
+import logging
+import re
+import unicodedata
+from typing import Callable, List, Optional
+
+TWEET_URL_LENGTH = 23
+MAX_TWEET_LENGTH = 25000
+
+# twitter-text v3 の設定: 以下の範囲は重み1、それ以外（CJK・絵文字など）は重み2
+_LIGHT_RANGES = ((0, 4351), (8192, 8205), (8208, 8223), (8242, 8247))
+# 重み2の文字（_LIGHT_RANGES 以外）。1文字ずつ ord を調べる代わりに正規表現でまとめて数える
+_HEAVY_RE = re.compile("[^" + "".join(f"\\U{low:08x}-\\U{high:08x}" for low, high in _LIGHT_RANGES) + "]")
+_URL_RE = re.compile(r"https?://[^\s]+")
+
+PACK_MODES = ("sequential", "first_fit")
+
+
+def weighted_length(text: str) -> int:
+    """X の文字数カウント（URLは23文字、CJKは2文字）を近似的に計算する。
+
+    URLの自動検出（スキーム無しのドメインなど）や絵文字の結合シーケンスは厳密には扱わないため、
+    最終的な判定は parse_tweet で行ってください。
+    """
+    text = unicodedata.normalize("NFC", text)
+    length = len(text) + len(_HEAVY_RE.findall(text))
+    # URL の部分は文字によらず TWEET_URL_LENGTH として数え直す
+    for match in _URL_RE.finditer(text):
+        start, end = match.span()
+        length += TWEET_URL_LENGTH - (end - start) - len(_HEAVY_RE.findall(text, start, end))
+    return length
+
+
+def _default_count(text: str) -> int:
+    from twitter_text import parse_tweet
+
+    return parse_tweet(text).weightedLength
+
+
+def _sequential_bins(sizes: List[int], first_capacity: int, capacity: int) -> List[List[int]]:
+    bins: List[List[int]] = [[]]
+    remaining = first_capacity
+    for index, size in enumerate(sizes):
+        if bins[-1] and size > remaining:
+            bins.append([])
+            remaining = capacity
+        bins[-1].append(index)
+        remaining -= size
+    return bins
+
+
+def _first_fit_bins(sizes: List[int], first_capacity: int, capacity: int) -> List[List[int]]:
+    # 大きい順に、入る最初のポストへ詰める（First-Fit Decreasing）
+    bins: List[List[int]] = [[]]
+    remaining = [first_capacity]
+    for index in sorted(range(len(sizes)), key=lambda i: -sizes[i]):
+        size = sizes[index]
+        for bin_index, room in enumerate(remaining):
+            if size <= room or not bins[bin_index]:
+                bins[bin_index].append(index)
+                remaining[bin_index] -= size
+                break
+        else:
+            bins.append([index])
+            remaining.append(capacity - size)
+    # ポスト内では元の並び順を保つ
+    return [sorted(indexes) for indexes in bins]
+
+
+def pack_posts(
+    header: str,
+    fragments: List[str],
+    footer: str,
+    max_length: int = MAX_TWEET_LENGTH,
+    mode: str = "sequential",
+    count: Optional[Callable[[str], int]] = None,
+    sizes: Optional[List[int]] = None,
+) -> List[str]:
+    """フラグメントを上限文字数に収まるポストに分割する。
+
+    1つ目のポストは header + フラグメント + footer、2つ目以降はフラグメント + footer です。
+    1つのフラグメントだけで上限を超える場合は、そのまま1ポストにします。
+
+    Args:
+        header (str): 1つ目のポストの先頭に付ける文。
+        fragments (List[str]): 詰めるフラグメント（各項目の文）。
+        footer (str): 各ポストの末尾に付ける文。
+        max_length (int): ポストの上限文字数（重み付き）。
+        mode (str): "sequential" は元の順序のまま詰める。"first_fit" は大きい項目から
+            入るポストに詰めてポスト数を減らす（ポスト内の順序は元のまま）。
+        count (Optional[Callable[[str], int]]): 完成したポストを数える関数。省略時は parse_tweet。
+        sizes (Optional[List[int]]): 各フラグメントの weighted_length（計算済みの場合。post_renderer が渡す）。
+
+    Returns:
+        List[str]: 投稿するポスト本文（前後の空白は除去済み）。
+    """
+    if mode not in PACK_MODES:
+        raise ValueError(f"不明なパックモードです: {mode}")
+    if count is None:
+        count = _default_count
+
+    if sizes is None:
+        sizes = [weighted_length(fragment) for fragment in fragments]
+    footer_size = weighted_length(footer)
+    first_capacity = max_length - weighted_length(header) - footer_size
+    capacity = max_length - footer_size
+    if mode == "first_fit":
+        bins = _first_fit_bins(sizes, first_capacity, capacity)
+    else:
+        bins = _sequential_bins(sizes, first_capacity, capacity)
+
+    def _render(bin_index: int, indexes: List[int]) -> str:
+        prefix = header if bin_index == 0 else ""
+        return (prefix + "".join(fragments[i] for i in indexes) + footer).strip()
+
+    posts = []
+    bin_index = 0
+    while bin_index < len(bins):
+        indexes = bins[bin_index]
+        text = _render(bin_index, indexes)
+        # 近似値で詰めたので、完成したポストだけ正確に数え直し、超えていれば末尾を次のポストへ回す
+        overflow: List[int] = []
+        while len(indexes) > 1 and count(text) > max_length:
+            overflow.insert(0, indexes.pop())
+            text = _render(bin_index, indexes)
+        if overflow:
+            logging.info(f"文字数超過のため {len(overflow)} 項目を次のポストに回します")
+            if bin_index + 1 < len(bins):
+                bins[bin_index + 1] = sorted(overflow + bins[bin_index + 1])
+            else:
+                bins.append(overflow)
+        posts.append(text)
+        bin_index += 1
+    return posts
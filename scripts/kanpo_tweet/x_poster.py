@@ -0,0 +1,252 @@
+"""X（旧Twitter）への投稿処理
+
+1つの tweepy.Client（= 1つの requests.Session のコネクションプール）を実行中は使い回し、
+固定の sleep の代わりにレスポンスの x-rate-limit-* ヘッダーから残り回数とリセット時刻を読んで
+投稿間隔を調整します。tweepy の wait_on_rate_limit は 429 を受けてからリセットまで待つだけなので使いません。
+"""
+
+import logging
+import os
+import time
+from typing import Callable, List, Mapping, Optional
+
+import requests
+import requests.adapters
+import tweepy
+
+from kanpo_tweet.run_metrics import get_metrics
+
+X_API_HOST = "https://api.twitter.com"
+DEFAULT_MIN_INTERVAL = float(os.getenv("X_POST_MIN_INTERVAL", "1.0"))
+# これ以上待たないとリセットされない場合は待たずに失敗にする（24時間枠の枯渇など）
+DEFAULT_MAX_RATE_WAIT = float(os.getenv("X_MAX_RATE_WAIT", "900"))
+# 認証情報の環境変数名（接頭辞 "X_" などの後ろの部分）
+CREDENTIAL_NAMES = ("API_KEY", "API_SECRET", "ACCESS_TOKEN", "ACCESS_TOKEN_SECRET")
+
+
+class RateLimiter:
+    """x-rate-limit-remaining / x-rate-limit-reset ヘッダーに基づく token bucket。
+
+    残り回数（トークン）がある間は min_interval の間隔で投稿し、
+    トークンが尽きたらリセット時刻まで待ちます。ヘッダーを受け取るまでは残り回数不明として扱います。
+    """
+
+    def __init__(
+        self,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_wait: float = DEFAULT_MAX_RATE_WAIT,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self._last_request: Optional[float] = None
+
+    def wait_seconds(self) -> float:
+        """次のリクエストまでに待つべき秒数を返す。"""
+        now = self.clock()
+        if self.reset_at is not None and now >= self.reset_at:
+            # リセット時刻を過ぎたらバケットは補充済みとみなす
+            self.remaining = None
+            self.reset_at = None
+        if self.remaining is not None and self.remaining <= 0 and self.reset_at is not None:
+            return self.reset_at - now + 1
+        if self._last_request is not None:
+            return max(0.0, self._last_request + self.min_interval - now)
+        return 0.0
+
+    def acquire(self) -> bool:
+        """トークンを1つ取得する。待ち時間が max_wait を超える場合は待たずに False を返す。"""
+        wait = self.wait_seconds()
+        if wait > self.max_wait:
+            logging.error(f"レート制限のリセットまで {wait:.0f} 秒かかるため投稿を中止します")
+            return False
+        if wait > 0:
+            if wait > self.min_interval:
+                logging.info(f"レート制限のため {wait:.1f} 秒待機します")
+            get_metrics().incr("post_rate_wait_seconds", wait)
+            self.sleep(wait)
+        self._last_request = self.clock()
+        if self.remaining is not None:
+            self.remaining -= 1
+        return True
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        """レスポンスヘッダーから残り回数とリセット時刻を取り込む。"""
+        # ユーザー単位の24時間枠が先に尽きる場合があるので、より厳しい方を採用する
+        pairs = (
+            ("x-rate-limit-remaining", "x-rate-limit-reset"),
+            ("x-user-limit-24hour-remaining", "x-user-limit-24hour-reset"),
+            ("x-app-limit-24hour-remaining", "x-app-limit-24hour-reset"),
+        )
+        strictest = None
+        for remaining_key, reset_key in pairs:
+            try:
+                remaining = int(headers[remaining_key])
+                reset_at = float(headers[reset_key])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if strictest is None or remaining < strictest[0]:
+                strictest = (remaining, reset_at)
+        if strictest is not None:
+            self.remaining, self.reset_at = strictest
+
+    def exhaust(self, headers: Mapping[str, str]) -> None:
+        """429 を受けたときに呼ぶ。ヘッダーにリセット時刻がなければ15分後とみなす。"""
+        self.update(headers)
+        self.remaining = 0
+        if self.reset_at is None:
+            self.reset_at = self.clock() + 15 * 60
+
+
+class _RedirectAdapter(requests.adapters.HTTPAdapter):
+    """X API 宛てのリクエストを別のベースURL（ローカルの代替サーバーなど）へ送り直すアダプター。"""
+
+    def __init__(self, base_url: str):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+
+    def send(self, request, **kwargs):
+        if request.url.startswith(X_API_HOST):
+            request.url = self.base_url + request.url[len(X_API_HOST):]
+        return super().send(request, **kwargs)
+
+
+class XPoster:
+    """1つのクライアントとレートリミッターを使い回して投稿するクラス。
+
+    base_url を指定すると、X API の代わりにそのURL（benchmarks/mock_api.py など）へ投稿します。
+    """
+
+    def __init__(
+        self,
+        consumer_key: str,
+        consumer_secret: str,
+        access_token: str,
+        access_token_secret: str,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: int = 3,
+        base_url: Optional[str] = None,
+    ):
+        self._credentials = dict(
+            consumer_key=consumer_key,
+            consumer_secret=consumer_secret,
+            access_token=access_token,
+            access_token_secret=access_token_secret,
+        )
+        self.limiter = limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.base_url = base_url
+        # 直前の post() が失敗した理由（"duplicate" / "rate_limit" / "server_error" / "error"）。成功時は None
+        self.last_error: Optional[str] = None
+        self._client: Optional[tweepy.Client] = None
+
+    @classmethod
+    def from_env(cls, prefix: str = "X_", **kwargs) -> Optional["XPoster"]:
+        """環境変数 X_API_KEY などから作る。認証情報が不足している場合は None。
+
+        prefix を指定すると、別のアカウントの認証情報（例: "X_LAWS_" なら X_LAWS_API_KEY など）を読みます。
+        base_url（代替サーバー）を指定した場合は、認証情報がなくてもダミーの値で作ります。
+        """
+        credentials = [os.environ.get(f"{prefix}{name}") for name in CREDENTIAL_NAMES]
+        if not all(credentials):
+            if not kwargs.get("base_url"):
+                return None
+            credentials = ["mock"] * 4
+        return cls(*credentials, **kwargs)
+
+    @property
+    def client(self) -> tweepy.Client:
+        if self._client is None:
+            # ヘッダーを読むために requests.Response をそのまま受け取る
+            self._client = tweepy.Client(
+                **self._credentials,
+                return_type=requests.Response,
+                wait_on_rate_limit=False,
+            )
+            if self.base_url:
+                self._client.session.mount(X_API_HOST, _RedirectAdapter(self.base_url))
+        return self._client
+
+    def post(self, text: str, in_reply_to_tweet_id: Optional[str] = None, max_retries: Optional[int] = None) -> Optional[str]:
+        """1件投稿する。成功時はツイートID、失敗時はNone（理由は last_error）。
+
+        429 はリセット時刻まで待って、5xx は指数バックオフしてリトライします。
+        アウトボックスから送る場合は max_retries=1 にして、リトライはアウトボックスのバックオフに任せます。
+        """
+        metrics = get_metrics()
+        max_retries = self.max_retries if max_retries is None else max_retries
+        self.last_error = None
+        for attempt in range(max_retries):
+            if attempt:
+                metrics.incr("post_retries")
+            if not self.limiter.acquire():
+                metrics.incr("posts_failed")
+                self.last_error = "rate_limit"
+                return None
+            started = time.perf_counter()
+            try:
+                if in_reply_to_tweet_id:
+                    response = self.client.create_tweet(text=text, in_reply_to_tweet_id=in_reply_to_tweet_id)
+                else:
+                    response = self.client.create_tweet(text=text)
+                metrics.observe("post_seconds", time.perf_counter() - started)
+                metrics.incr("posts_sent")
+                self.limiter.update(response.headers)
+                return str(response.json()["data"]["id"])
+            except tweepy.TooManyRequests as e:
+                self.limiter.exhaust(e.response.headers)
+                self.last_error = "rate_limit"
+                logging.warning(f"X API 429 (レート制限)。リセット後にリトライ ({attempt + 1}/{max_retries})")
+            except tweepy.TwitterServerError as e:
+                self.last_error = "server_error"
+                if attempt + 1 < max_retries:
+                    wait_sec = 2 ** attempt
+                    logging.warning(f"X API サーバーエラー: {e}。{wait_sec} 秒後にリトライ ({attempt + 1}/{max_retries})")
+                    time.sleep(wait_sec)
+                else:
+                    logging.warning(f"X API サーバーエラー: {e} ({attempt + 1}/{max_retries})")
+            except tweepy.Forbidden as e:
+                # 同じ本文の再投稿は 403 で拒否される（送信後に落ちた投稿の再送など）
+                self.last_error = "duplicate" if "duplicate" in str(e).lower() else "error"
+                logging.error(f"Tweetに失敗 tweet: {e}")
+                metrics.incr("posts_failed")
+                return None
+            except Exception as e:
+                self.last_error = "error"
+                logging.error(f"Tweetに失敗 tweet: {e}")
+                metrics.incr("posts_failed")
+                return None
+        logging.error("リトライ回数の上限に達したため投稿を中止します")
+        metrics.incr("posts_failed")
+        return None
+
+    def post_thread(self, texts: List[str], in_reply_to_tweet_id: Optional[str] = None) -> List[Optional[str]]:
+        """texts をスレッドとして投稿する。2件目以降は直前に投稿できたポストへのリプライにする。"""
+        tweet_ids: List[Optional[str]] = []
+        parent_id = in_reply_to_tweet_id
+        for text in texts:
+            tweet_id = self.post(text, in_reply_to_tweet_id=parent_id)
+            tweet_ids.append(tweet_id)
+            if tweet_id is not None:
+                parent_id = tweet_id
+        return tweet_ids
+
+
+_default_poster: Optional[XPoster] = None
+
+
+def get_default_poster(base_url: Optional[str] = None) -> Optional[XPoster]:
+    """環境変数の認証情報で作った XPoster を返す（実行中は同じインスタンスを使い回す）。
+
+    Args:
+        base_url (Optional[str]): X API の代わりに使うベースURL（初回の呼び出し時のみ有効）。
+    """
+    global _default_poster
+    if _default_poster is None:
+        _default_poster = XPoster.from_env(base_url=base_url)
+    return _default_poster
@@ -0,0 +1,80 @@
+"""詳細版の全文検索インデックス（.cache/toc_index/）を検索するスクリプト
+
+    python scripts/search_toc.py 道路交通法 --category 告示 --from 2026-09-01 --to 2026-09-30
+    python scripts/search_toc.py --ingest https://kanpo-viewer.com/feed_toc.xml 号外
+
+キーワードはタイトルと description の部分一致です（空白区切りで複数指定した場合はすべてを含むもの）。
+期間は JST の日付で、--to の日を含みます。
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from kanpo_tweet.feed_fetch import fetch_feed
+from kanpo_tweet.poll_schedule import JST
+from kanpo_tweet.toc_index import DEFAULT_INDEX_PATH, TocIndex
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+
+
+def _parse_date(value: str) -> datetime:
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=JST)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付の形式が不正です (YYYY-MM-DD): {value}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数を解析する。"""
+    parser = argparse.ArgumentParser(description="詳細版の全文検索インデックスを検索します。")
+    parser.add_argument("keyword", nargs="*", help="検索するキーワード（省略時は条件に合うすべての項目）")
+    parser.add_argument("--category", help="カテゴリ（例: 告示）")
+    parser.add_argument("--from", dest="date_from", type=_parse_date, help="開始日 YYYY-MM-DD（JST）")
+    parser.add_argument("--to", dest="date_to", type=_parse_date, help="終了日 YYYY-MM-DD（JST、この日を含む）")
+    parser.add_argument("--limit", type=int, default=50, help="表示する件数の上限（0 で無制限、既定 50）")
+    parser.add_argument("--ingest", metavar="URL", help="検索の前に、このURLの詳細版フィードを取り込む")
+    parser.add_argument("--json", action="store_true", help="JSON Lines で出力する")
+    parser.add_argument("--index", default=os.getenv("TOC_INDEX_PATH") or DEFAULT_INDEX_PATH, help="インデックスのパス")
+    return parser.parse_args(argv)
+
+
+def main() -> int:
+    """検索結果を出力し、1件もなければ 1 を返す。"""
+    args = parse_args()
+    index = TocIndex(args.index)
+    try:
+        if args.ingest:
+            index.ingest(fetch_feed(args.ingest).body)
+        started = time.perf_counter()
+        results = index.search(
+            keyword=" ".join(args.keyword) or None,
+            category=args.category,
+            since=args.date_from,
+            until=args.date_to + timedelta(days=1) if args.date_to else None,
+            limit=args.limit or None,
+        )
+        elapsed = time.perf_counter() - started
+        total = index.count()
+    finally:
+        index.close()
+
+    for entry in results:
+        if args.json:
+            print(json.dumps(entry.to_output(with_categories=True), ensure_ascii=False))
+            continue
+        published = entry.published.astimezone(JST).strftime("%Y-%m-%d %H:%M") if entry.published else "-"
+        print(f"{published} [{', '.join(entry.categories)}] {entry.title}\n    {entry.link}")
+    logging.info(f"{len(results)} 件（インデックス {total} 件中、検索 {elapsed * 1000:.2f} ミリ秒）")
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""scripts/ の kanpo_tweet パッケージを読み込めるようにする（python -m pytest でリポジトリのルートから実行）"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
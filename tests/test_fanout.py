@@ -0,0 +1,48 @@
+"""fanout: フィードの本文を1回だけ走査して時間幅のアイテムを取り出す"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from kanpo_tweet import fanout, feed_stream
+
+NOW = datetime(2026, 10, 16, 23, 0, tzinfo=timezone.utc)
+
+
+def _feed(*items):
+    body = "".join(
+        f"<item><title>{title}</title><guid>{title}</guid><pubDate>{format_datetime(published)}</pubDate></item>"
+        for title, published in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel>{body}</channel></rss>'.encode("utf-8")
+
+
+def _titles(entries):
+    return [entry.title for entry in entries]
+
+
+def test_parse_window_returns_items_in_window():
+    body = _feed(("a", NOW - timedelta(minutes=5)), ("b", NOW - timedelta(minutes=30)), ("c", NOW - timedelta(hours=3)))
+
+    assert _titles(fanout.parse_window(body, int((NOW - timedelta(hours=1)).timestamp()))) == ["a", "b"]
+
+
+def test_parse_window_includes_newest_when_window_is_empty():
+    body = _feed(("a", NOW - timedelta(hours=5)), ("b", NOW - timedelta(hours=5)), ("c", NOW - timedelta(hours=6)))
+
+    assert _titles(fanout.parse_window(body, int((NOW - timedelta(hours=1)).timestamp()))) == ["a", "b"]
+    assert fanout.parse_window(b"", 0) == []
+
+
+def test_parse_window_walks_the_body_once(monkeypatch):
+    calls = []
+    original = feed_stream.iter_entries
+
+    def iter_entries(body):
+        calls.append(body)
+        return original(body)
+
+    monkeypatch.setattr(feed_stream, "iter_entries", iter_entries)
+    body = _feed(("a", NOW - timedelta(hours=5)), ("b", NOW - timedelta(hours=6)))
+
+    assert _titles(fanout.parse_window(body, int(NOW.timestamp()))) == ["a"]
+    assert len(calls) == 1
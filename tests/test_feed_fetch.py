@@ -0,0 +1,129 @@
+"""feed_fetch: リクエストごとのタイムアウト・プロキシ・ローカルファイル"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from kanpo_tweet.feed_fetch import HTTPSession, fetch_feed
+
+BODY = b'<?xml version="1.0"?><rss version="2.0"><channel></channel></rss>'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(1.0)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class _ProxyHandler(_Handler):
+    """受けたリクエスト行を記録し、GET にはフィードを返す（CONNECT は拒否する）。"""
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(("GET", self.path, self.headers.get("Proxy-Authorization")))
+        super().do_GET()
+
+    def do_CONNECT(self):
+        self.requests.append(("CONNECT", self.path, self.headers.get("Proxy-Authorization")))
+        self.send_response(502)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def _serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def server():
+    server = _serve(_Handler)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    for name in ("http_proxy", "https_proxy", "no_proxy", "HTTP_PROXY", "HTTPS_PROXY", "NO_PROXY", "all_proxy", "ALL_PROXY"):
+        monkeypatch.delenv(name, raising=False)
+    _ProxyHandler.requests = []
+    server = _serve(_ProxyHandler)
+    yield f"127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_timeout_applies_to_the_call_only(server, tmp_path):
+    session = HTTPSession(timeout=10)
+    try:
+        assert fetch_feed(f"{server}/fast", cache_dir=str(tmp_path), session=session).status == 200
+
+        # 使い回したコネクションでも指定したタイムアウトで打ち切る
+        started = time.perf_counter()
+        response = fetch_feed(f"{server}/slow", cache_dir=str(tmp_path), timeout=0.2, session=session)
+        assert response.status is None
+        assert time.perf_counter() - started < 0.9
+        assert session.timeout == 10
+
+        assert fetch_feed(f"{server}/slow", cache_dir=str(tmp_path), session=session).status == 200
+    finally:
+        session.close()
+
+
+def test_http_request_goes_through_proxy(proxy, monkeypatch, tmp_path):
+    monkeypatch.setenv("http_proxy", f"http://user:p%40ss@{proxy}")
+    session = HTTPSession()
+    try:
+        response = fetch_feed("http://feeds.example.invalid/feed.xml", cache_dir=str(tmp_path), session=session)
+    finally:
+        session.close()
+
+    assert response.status == 200 and response.body == BODY
+    assert _ProxyHandler.requests == [("GET", "http://feeds.example.invalid/feed.xml", "Basic dXNlcjpwQHNz")]
+
+
+def test_https_request_tunnels_through_proxy(proxy, monkeypatch, tmp_path):
+    monkeypatch.setenv("https_proxy", f"http://{proxy}")
+    session = HTTPSession(timeout=5)
+    try:
+        response = fetch_feed("https://feeds.example.invalid/feed.xml", cache_dir=str(tmp_path), session=session)
+    finally:
+        session.close()
+
+    assert response.status is None
+    assert _ProxyHandler.requests == [("CONNECT", "feeds.example.invalid:443", None)]
+
+
+def test_no_proxy_connects_directly(proxy, server, monkeypatch, tmp_path):
+    monkeypatch.setenv("http_proxy", f"http://{proxy}")
+    monkeypatch.setenv("no_proxy", "127.0.0.1")
+    session = HTTPSession()
+    try:
+        assert fetch_feed(f"{server}/fast", cache_dir=str(tmp_path), session=session).status == 200
+    finally:
+        session.close()
+
+    assert _ProxyHandler.requests == []
+
+
+def test_missing_local_file_returns_empty_body(tmp_path):
+    response = fetch_feed(str(tmp_path / "missing.xml"))
+
+    assert response.status is None
+    assert response.body == b""
@@ -0,0 +1,111 @@
+"""feed_snapshot: 記録との差分による新着判定と、post の記録の更新"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+
+import pytest
+
+from kanpo_tweet import post
+from kanpo_tweet.feed_snapshot import FeedSnapshot
+from kanpo_tweet.feed_stream import iter_items
+
+NOW = datetime(2026, 10, 16, 23, 0, tzinfo=timezone.utc)
+
+
+def _feed(*items):
+    """(guid, pubDate) の並びから RSS 2.0 の本文を作る。"""
+    body = "".join(
+        f"<item><title>{guid}</title><link>https://example.com/{guid}</link><guid>{guid}</guid>"
+        f"<pubDate>{format_datetime(published)}</pubDate></item>"
+        for guid, published in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{body}</channel></rss>'.encode("utf-8")
+
+
+@pytest.fixture
+def debug_run(monkeypatch):
+    posted = []
+    monkeypatch.setattr(post, "DEBUG", True)
+    monkeypatch.setattr(post, "API_TARGET", None)
+    monkeypatch.setattr(post, "TOC_INDEX", None)
+    monkeypatch.setattr(post, "fetch_feed", lambda url: SimpleNamespace(body=_feed()))
+    monkeypatch.setattr(post, "post_entries", lambda items, toc_items: posted.extend(items))
+    return posted
+
+
+def test_debug_post_delta_does_not_record(tmp_path, debug_run):
+    path = tmp_path / "snapshot.json"
+    body = _feed(("a", NOW - timedelta(minutes=5)))
+    snapshot = FeedSnapshot(str(path))
+
+    with snapshot.locked():
+        new_items = post.post_delta(body, "https://example.com/toc", NOW - timedelta(minutes=60), snapshot)
+
+    assert [item.guid for item in new_items] == ["a"]
+    assert [item.guid for item in debug_run] == ["a"]
+    assert not path.exists()
+    # 次の実行でも同じアイテムが新着として扱われる
+    with snapshot.locked():
+        assert [item["guid"] for item in snapshot.delta(body, NOW - timedelta(minutes=60))] == ["a"]
+
+
+def test_debug_post_delta_does_not_save_bootstrap(tmp_path, debug_run):
+    path = tmp_path / "snapshot.json"
+    body = _feed(("a", NOW - timedelta(hours=5)))
+    snapshot = FeedSnapshot(str(path))
+
+    with snapshot.locked():
+        assert post.post_delta(body, "https://example.com/toc", NOW - timedelta(minutes=60), snapshot) == []
+
+    assert debug_run == []
+    assert not path.exists()
+
+
+def test_delta_reports_late_item_older_than_high_water():
+    snapshot = FeedSnapshot()
+    start = NOW - timedelta(minutes=60)
+    first = _feed(("a", NOW - timedelta(minutes=10)), ("b", NOW - timedelta(minutes=20)))
+    snapshot.mark(snapshot.delta(first, start))
+
+    # 後から追加された c は pubDate が high_water（a）より古い
+    body = _feed(("a", NOW - timedelta(minutes=10)), ("c", NOW - timedelta(minutes=15)), ("b", NOW - timedelta(minutes=20)))
+    assert [item["guid"] for item in snapshot.delta(body, start)] == ["c"]
+    assert [item["guid"] for item in snapshot.select(list(iter_items(body)), start)] == ["c"]
+
+
+def test_grace_does_not_reach_before_bootstrap(tmp_path):
+    path = tmp_path / "snapshot.json"
+    start = NOW - timedelta(minutes=60)
+    body = _feed(("a", NOW - timedelta(minutes=10)), ("old", NOW - timedelta(hours=5)))
+
+    snapshot = FeedSnapshot(str(path))
+    with snapshot.locked():
+        snapshot.mark(snapshot.delta(body, start))
+        snapshot.save()
+
+    # 初回の時間幅より前のアイテムは、猶予の範囲内でも新着にしない
+    snapshot = FeedSnapshot(str(path))
+    with snapshot.locked():
+        assert snapshot.delta(body, start) == []
+
+
+def test_main_fetches_both_feeds_concurrently_with_snapshot(tmp_path, monkeypatch, debug_run):
+    body = _feed(("a", datetime.now(timezone.utc) - timedelta(minutes=5)))
+    fetched = []
+
+    def fetch_feeds_concurrently(urls, parse=None):
+        fetched.append(urls)
+        return [SimpleNamespace(response=SimpleNamespace(body=body)), SimpleNamespace(response=SimpleNamespace(body=_feed()))]
+
+    monkeypatch.setenv("FEED_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setenv("TOC_INDEX", "0")
+    monkeypatch.delenv("GITHUB_OUTPUT", raising=False)
+    monkeypatch.setattr(post, "FETCH_MODE", "concurrent")
+    monkeypatch.setattr(post, "fetch_feeds_concurrently", fetch_feeds_concurrently)
+    monkeypatch.setattr(post, "fetch_feed", lambda url: pytest.fail(f"順番に取得した: {url}"))
+
+    post.main(["https://example.com/feed.xml", "https://example.com/feed_toc.xml", "60"])
+
+    assert fetched == [["https://example.com/feed.xml", "https://example.com/feed_toc.xml"]]
+    assert [item.guid for item in debug_run] == ["a"]
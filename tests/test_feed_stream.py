@@ -0,0 +1,49 @@
+"""feed_stream: pubDate の解釈と時間幅での絞り込み"""
+
+import logging
+from datetime import datetime, timezone
+
+import pytest
+
+from kanpo_tweet.feed_stream import entries_in_window, parse_pub_date
+
+
+def _feed(*pub_dates):
+    body = "".join(f"<item><title>{index}</title><pubDate>{value}</pubDate></item>" for index, value in enumerate(pub_dates))
+    return f'<?xml version="1.0"?><rss version="2.0"><channel>{body}</channel></rss>'.encode("utf-8")
+
+
+def test_parse_pub_date_rfc822():
+    assert parse_pub_date("Fri, 16 Oct 2026 08:30:00 +0900") == datetime(2026, 10, 15, 23, 30, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("2026-10-16T08:30:00+09:00", datetime(2026, 10, 15, 23, 30, tzinfo=timezone.utc)),
+        ("2026-10-15T23:30:00Z", datetime(2026, 10, 15, 23, 30, tzinfo=timezone.utc)),
+        ("2026-10-15T23:30:00.250+00:00", datetime(2026, 10, 15, 23, 30, 0, 250000, tzinfo=timezone.utc)),
+        ("2026-10-15 23:30:00", datetime(2026, 10, 15, 23, 30, tzinfo=timezone.utc)),
+        ("2026-10-15", datetime(2026, 10, 15, tzinfo=timezone.utc)),
+    ],
+)
+def test_parse_pub_date_iso8601(value, expected):
+    assert parse_pub_date(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "not a date", "2026-13-01T00:00:00Z", "Fri, 32 Oct 2026 08:30:00 +0900"])
+def test_parse_pub_date_rejects_unknown_formats(value):
+    assert parse_pub_date(value) is None
+
+
+def test_unparseable_pub_date_is_logged_and_skipped(caplog):
+    body = _feed("2026-10-16T08:30:00+09:00", "not a date")
+    start = datetime(2026, 10, 15, tzinfo=timezone.utc)
+
+    with caplog.at_level(logging.WARNING):
+        items = entries_in_window(body, start)
+        entries = entries_in_window(body, start, compact=True)
+
+    assert [item["title"] for item in items] == ["0"]
+    assert [entry.title for entry in entries] == ["0"]
+    assert "not a date" in caplog.text
@@ -0,0 +1,20 @@
+"""post: コマンドライン引数の検証"""
+
+import pytest
+
+from kanpo_tweet import post
+
+URLS = ["https://example.com/feed.xml", "https://example.com/feed_toc.xml", "720"]
+
+
+@pytest.mark.parametrize("value, expected", [("10:00", "10:00"), ("9:05", "09:05"), ("23:59", "23:59")])
+def test_until_accepts_hh_mm(value, expected):
+    assert post.parse_args(URLS + ["--watch", "--until", value]).until == expected
+
+
+@pytest.mark.parametrize("value", ["10", "25:00", "ab:cd", "10:60", ""])
+def test_until_rejects_malformed_time(value, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        post.parse_args(URLS + ["--watch", "--until", value])
+    assert exit_info.value.code == 2
+    assert "HH:MM" in capsys.readouterr().err
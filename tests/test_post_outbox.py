@@ -0,0 +1,113 @@
+"""post_outbox: 投稿済みの行は保持期間を過ぎたら削除する"""
+
+import pytest
+
+from kanpo_tweet.post_outbox import PostOutbox
+
+DAY = 24 * 60 * 60
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def outbox(tmp_path, clock):
+    outbox = PostOutbox(path=str(tmp_path / "posts.sqlite3"), retention=7 * DAY, clock=clock)
+    yield outbox
+    outbox.close()
+
+
+def _rows(outbox):
+    return outbox._conn.execute("SELECT thread_key, position, status FROM posts ORDER BY thread_key, position").fetchall()
+
+
+def _sender(ids):
+    def send(text, parent):
+        ids.append((text, parent))
+        return str(len(ids))
+
+    return send
+
+
+def test_drain_purges_sent_rows_after_retention(outbox, clock):
+    sent = []
+    outbox.enqueue_thread("old", ["a", "b"])
+    assert outbox.drain(_sender(sent)).purged == 0
+    assert [status for _, _, status in _rows(outbox)] == ["sent", "sent"]
+
+    clock.now += 7 * DAY + 1
+    outbox.enqueue_thread("new", ["c"])
+    result = outbox.drain(_sender(sent))
+
+    assert result.sent == 1
+    assert result.purged == 2
+    assert _rows(outbox) == [("new", 0, "sent")]
+
+
+def test_purge_keeps_sent_rows_of_unfinished_threads(outbox, clock):
+    def fail_second(text, parent):
+        return "1" if text == "a" else None
+
+    outbox.enqueue_thread("thread", ["a", "b"])
+    outbox.drain(fail_second)
+    clock.now += 7 * DAY + 1
+
+    assert outbox.purge_sent() == 0
+    # 続きは残っている投稿済みのポストにリプライする
+    sent = []
+    outbox.drain(_sender(sent))
+    assert sent == [("b", "1")]
+
+
+def test_next_attempt_at_waits_for_stale_claim(outbox, clock):
+    outbox.enqueue_thread("thread", ["a", "b"])
+    # 送信中のまま落ちた実行の行（送信時刻はすでに過ぎている）
+    assert outbox._claim(outbox._thread_rows("thread")[0][0], clock.now)
+    clock.now += 60
+
+    assert outbox.drain(_sender([])).sent == 0
+    assert outbox.next_attempt_at() == clock.now - 60 + outbox.claim_timeout
+
+
+def test_next_attempt_at_ignores_rows_behind_the_thread_head(outbox, clock):
+    def fail(text, parent):
+        return None
+
+    outbox.enqueue_thread("thread", ["a", "b"])
+    outbox.drain(fail)
+
+    # b の送信時刻は過ぎているが、先頭の a のバックオフが終わるまでは送れない
+    assert outbox.next_attempt_at() == clock.now + outbox.base_delay
+
+
+def test_drain_outbox_stops_at_wait_deadline(monkeypatch, tmp_path, clock):
+    import drain_outbox
+
+    outbox = PostOutbox(path=str(tmp_path / "posts.sqlite3"), clock=clock)
+    outbox.enqueue_thread("thread", ["a"])
+    assert outbox._claim(outbox._thread_rows("thread")[0][0], clock.now)
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += max(seconds, 1.0)
+
+    monkeypatch.setattr(drain_outbox.PostOutbox, "from_env", classmethod(lambda cls: outbox))
+    monkeypatch.setattr(drain_outbox, "get_default_poster", lambda base_url=None: object())
+    monkeypatch.setattr(drain_outbox.time, "time", clock)
+    monkeypatch.setattr(drain_outbox.time, "sleep", sleep)
+    monkeypatch.setattr("sys.argv", ["drain_outbox.py", "--wait", "300"])
+
+    assert drain_outbox.main() == 1
+    # 送信中の行は claim_timeout（900秒）後まで取れないので、--wait 300 の範囲では待たずに終わる
+    assert sleeps == []
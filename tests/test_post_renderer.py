@@ -0,0 +1,49 @@
+"""post_renderer: テンプレートの検証と str.format による組み立て"""
+
+import pytest
+
+from kanpo_tweet.post_renderer import PostRenderer
+
+ENTRY = {"title": "本紙（第1570号）", "link": "https://kanpo-viewer.com/1570"}
+ITEMS = [
+    {"title": "道路交通法施行令の一部を改正する政令", "link": "https://example.com/1", "categories": ["政令", "道路 交通"]},
+    {"title": "カテゴリなし", "link": "https://example.com/2", "categories": []},
+]
+
+
+def test_default_templates_render_thread():
+    posts = PostRenderer(viewer_url="https://kanpo-viewer.com").render_thread(ENTRY, ITEMS, count=len)
+
+    assert posts == [
+        "📚本紙（第1570号）\nhttps://kanpo-viewer.com/1570\n\n#官報 #官報通知\n\n"
+        "👇各項目のリンクなどは以下項目ごとのリンクをご覧ください\n\n"
+        "道路交通法施行令の一部を改正する政令\nhttps://example.com/1\n#政令 #道路_交通\n\n"
+        "👇以下RSSビューワーwebで項目ごとで見ることも可能です\nhttps://kanpo-viewer.com"
+    ]
+
+
+def test_custom_templates_use_str_format_rules():
+    renderer = PostRenderer(
+        templates={"header": "{{{title}}} 100%\n", "fragment": "- {title} [{categories}]\n", "footer": "{viewer_url}"},
+        viewer_url="https://example.com",
+    )
+
+    assert renderer.render_thread(ENTRY, ITEMS, count=len) == [
+        "{本紙（第1570号）} 100%\n- 道路交通法施行令の一部を改正する政令 [政令, 道路 交通]\nhttps://example.com"
+    ]
+
+
+@pytest.mark.parametrize(
+    "templates",
+    [
+        {"header": "{unknown}"},
+        {"fragment": "{title:>10}"},
+        {"fragment": "{title!r}"},
+        {"fragment": "{title.__class__}"},
+        {"footer": "{viewer_url"},
+        {"signature": "{title}"},
+    ],
+)
+def test_invalid_templates_are_rejected(templates):
+    with pytest.raises(ValueError):
+        PostRenderer(templates=templates)
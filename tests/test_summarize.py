@@ -0,0 +1,79 @@
+"""summarize: 予算に収まる日は事前選別せずに全エントリを要約する"""
+
+import pytest
+
+from kanpo_tweet import gemini_summary, pre_ranker, summarize
+from kanpo_tweet.summary_cache import SummaryCache, make_key
+
+
+def _entries(count):
+    return [
+        {"title": f"告示第{index}号", "description": "", "link": f"https://example.com/{index}", "categories": ["告示"]}
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SummaryCache(path=str(tmp_path / "summaries.sqlite3"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    sent = []
+
+    def _generate_text(client, model, prompt, deadline=None):
+        sent.append(prompt)
+        return "要約"
+
+    monkeypatch.setattr(summarize, "PRERANK", True)
+    monkeypatch.setattr(gemini_summary, "generate_text", _generate_text)
+    return sent
+
+
+def test_under_budget_day_with_many_entries_uses_single(cache, prompts, monkeypatch):
+    entries = _entries(60)
+    assert len(entries) > pre_ranker.DEFAULT_TOP_K
+    assert pre_ranker.prompt_tokens(entries) <= pre_ranker.DEFAULT_TOKEN_BUDGET
+    monkeypatch.setattr(gemini_summary, "summarize_ranked", lambda *args, **kwargs: pytest.fail("事前選別された"))
+
+    result = summarize.summarize_entries(None, "model", "single", entries, cache)
+
+    assert result.text == "要約"
+    assert len(prompts) == 1
+    assert all(entry["title"] in prompts[0] for entry in entries)
+    key = make_key(
+        "model",
+        gemini_summary.PROMPT_TEMPLATE_VERSION,
+        "single",
+        summarize.RSS_VIEWER_URL,
+        gemini_summary.normalize_entries(entries),
+    )
+    assert cache.get(key) == "要約"
+
+
+def test_under_budget_day_keeps_map_reduce(cache, prompts, monkeypatch):
+    entries = _entries(60)
+    called = []
+
+    def _map_reduce(client, model, entries, viewer_url, **kwargs):
+        called.append(entries)
+        return gemini_summary.SummaryResult(text="要約")
+
+    monkeypatch.setattr(gemini_summary, "summarize_map_reduce", _map_reduce)
+
+    summarize.summarize_entries(None, "model", "mapreduce", entries, cache)
+
+    assert called == [entries]
+
+
+def test_over_budget_day_is_ranked(cache, prompts, monkeypatch):
+    entries = _entries(60)
+    monkeypatch.setattr(pre_ranker, "DEFAULT_TOKEN_BUDGET", pre_ranker.prompt_tokens(entries) - 1)
+
+    summarize.summarize_entries(None, "model", "single", entries, cache)
+
+    assert len(prompts) == 1
+    assert "件（カテゴリ別の件数）" in prompts[0]
@@ -0,0 +1,51 @@
+"""toc_index: インデックスを使っても投稿・要約に渡す項目の順序はフィード上の順序のまま"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from kanpo_tweet.feed_stream import entries_in_window
+from kanpo_tweet.toc_index import TocIndex
+
+NOW = datetime(2026, 10, 16, 23, 0, tzinfo=timezone.utc)
+
+
+def _feed(*items):
+    body = "".join(
+        f"<item><title>{title}</title><link>https://example.com/{title}</link><guid>{title}</guid>"
+        f"<pubDate>{format_datetime(published)}</pubDate></item>"
+        for title, published in items
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel>{body}</channel></rss>'.encode("utf-8")
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TocIndex(path=str(tmp_path / "toc.sqlite3"))
+    yield index
+    index.close()
+
+
+def test_merge_window_keeps_feed_order_when_not_newest_first(index):
+    # 同じ号の項目でも pubDate が前後している（新しい順に並んでいない）
+    body = _feed(
+        ("b", NOW - timedelta(minutes=30)),
+        ("a", NOW - timedelta(minutes=10)),
+        ("c", NOW - timedelta(minutes=20)),
+    )
+    index.ingest(body)
+    start = NOW - timedelta(hours=1)
+
+    expected = [entry.title for entry in entries_in_window(body, start, compact=True)]
+    assert expected == ["b", "a", "c"]
+    assert [entry.title for entry in index.window(start)] != expected
+    assert [entry.title for entry in index.merge_window(body, start)] == expected
+
+
+def test_merge_window_appends_items_dropped_from_feed(index):
+    index.ingest(_feed(("new", NOW - timedelta(minutes=10)), ("old", NOW - timedelta(minutes=50))))
+    body = _feed(("newer", NOW - timedelta(minutes=5)), ("new", NOW - timedelta(minutes=10)))
+    index.ingest(body)
+
+    assert [entry.title for entry in index.merge_window(body, NOW - timedelta(hours=1))] == ["newer", "new", "old"]
@@ -0,0 +1,52 @@
+"""toc_matcher: Aho–Corasick による振り分けが従来の `in` による振り分けと一致する"""
+
+import random
+
+import pytest
+
+from kanpo_tweet.toc_matcher import TitleMatcher, group_toc_entries
+
+
+def _reference(titles, toc_entries):
+    """置き換える前の処理（タイトルごとに全 description を `in` で走査する）。"""
+    return {title: [e for e in toc_entries if title in e.get("description", "")] for title in titles}
+
+
+def test_find_overlapping_titles():
+    matcher = TitleMatcher(["号外", "号外第1号", "第1号", "本紙", "he", "she", "hers"])
+
+    assert matcher.find("令和8年10月16日 号外第1号") == {"号外", "号外第1号", "第1号"}
+    assert matcher.find("ushers") == {"he", "she", "hers"}
+    assert matcher.find("本紙号") == {"本紙"}
+    assert matcher.find("") == set()
+
+
+def test_group_matches_in_scan_for_kanpo_titles():
+    titles = ["本紙（第1570号）", "号外（第220号）", "号外（第22号）", "政府調達（第200号）", "本紙（第1570号）"]
+    toc_entries = [
+        {"title": "告示1", "description": "令和8年10月16日 本紙（第1570号）"},
+        {"title": "政令", "description": "令和8年10月16日 号外（第220号）"},
+        {"title": "省令", "description": "令和8年10月16日 号外（第22号）"},
+        {"title": "説明なし"},
+        {"title": "公告", "description": "令和8年10月16日 政府調達（第200号） 本紙（第1570号）"},
+    ]
+
+    groups = group_toc_entries(titles, toc_entries)
+
+    assert groups == _reference(dict.fromkeys(titles), toc_entries)
+    # 号外（第22号） は 号外（第220号） の部分文字列ではない
+    assert [e["title"] for e in groups["号外（第22号）"]] == ["省令"]
+    assert all(a is b for a, b in zip(groups["本紙（第1570号）"], [toc_entries[0], toc_entries[4]]))
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_group_matches_in_scan_randomized(seed):
+    rng = random.Random(seed)
+    alphabet = "号外本紙第12（）ab"
+    titles = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 4))) for _ in range(rng.randint(1, 12))]
+    toc_entries = [
+        {"title": str(index), "description": "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))}
+        for index in range(rng.randint(0, 40))
+    ]
+
+    assert group_toc_entries(titles, toc_entries) == _reference(dict.fromkeys(titles), toc_entries)
@@ -0,0 +1,86 @@
+"""tweet_packer: 重み付き文字数の近似と、上限を超えたフラグメントの繰り越し"""
+
+import random
+
+import pytest
+from twitter_text import parse_tweet
+
+from kanpo_tweet.tweet_packer import pack_posts, weighted_length
+
+HEADER = "#号外 本日の官報\n"
+FOOTER = "\n続きはこちら https://kanpo-viewer.com"
+
+
+def _count(text):
+    return parse_tweet(text).weightedLength
+
+
+def _fragments(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        f"・{'道路交通法施行令' * rng.randint(1, 4)}の一部を改正する政令（第{index}号） https://kanpo-viewer.com/{index}\n"
+        for index in range(count)
+    ]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "官報",
+        "abc def",
+        "本紙（第1570号） https://www.kanpo.go.jp/20261017/20261017h01570/pdf/20261017h015700001f.pdf",
+        "#告示 #省令\n地方税法の一部を改正する法律\nhttps://kanpo-viewer.com/a http://example.com/b",
+        "…「」—“quoted” ①②",
+    ],
+)
+def test_weighted_length_matches_parse_tweet(text):
+    assert weighted_length(text) == _count(text)
+
+
+@pytest.mark.parametrize("mode", ["sequential", "first_fit"])
+def test_posts_fit_and_keep_every_fragment(mode):
+    fragments = _fragments(60)
+
+    posts = pack_posts(HEADER, fragments, FOOTER, max_length=280, mode=mode, count=_count)
+
+    assert posts[0].startswith(HEADER.strip())
+    assert all(post.endswith(FOOTER.strip()) for post in posts)
+    assert all(_count(post) <= 280 for post in posts)
+    bodies = [post.replace(HEADER.strip(), "", 1).replace(FOOTER.strip(), "").strip() for post in posts]
+    lines = [line for body in bodies for line in body.splitlines()]
+    if mode == "sequential":
+        assert lines == [fragment.strip() for fragment in fragments]
+    else:
+        assert sorted(lines) == sorted(fragment.strip() for fragment in fragments)
+        # ポスト内の順序は元の順序のまま
+        for body in bodies:
+            positions = [fragments.index(line + "\n") for line in body.splitlines()]
+            assert positions == sorted(positions)
+
+
+def test_first_fit_uses_no_more_posts_than_sequential():
+    fragments = _fragments(80, seed=3)
+    sequential = pack_posts(HEADER, fragments, FOOTER, max_length=280, count=_count)
+    first_fit = pack_posts(HEADER, fragments, FOOTER, max_length=280, mode="first_fit", count=_count)
+
+    assert len(first_fit) <= len(sequential)
+
+
+def test_overflow_rolls_accumulated_fragments_into_next_post():
+    fragments = [f"項目{index}\n" for index in range(6)]
+
+    # 近似では1ポストに収まるが、正確に数えると 3 項目までしか入らない
+    def strict_count(text):
+        return 100 * text.count("項目")
+
+    posts = pack_posts("", fragments, "", max_length=300, count=strict_count)
+
+    assert posts == ["項目0\n項目1\n項目2", "項目3\n項目4\n項目5"]
+
+
+def test_oversized_fragment_is_posted_alone():
+    fragments = ["短い\n", "長" * 200 + "\n", "短い2\n"]
+
+    posts = pack_posts("", fragments, "", max_length=280, count=_count)
+
+    assert posts == ["短い", "長" * 200, "短い2"]
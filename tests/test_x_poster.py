@@ -0,0 +1,122 @@
+"""x_poster: レスポンスヘッダーに基づく投稿間隔の調整とリプライのつなぎ方"""
+
+import json
+
+import pytest
+import requests
+import tweepy
+
+from kanpo_tweet.x_poster import RateLimiter, XPoster
+
+
+class Clock:
+    """sleep すると進む時計。"""
+
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _response(status, headers, data=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    response._content = json.dumps(data or {}).encode("utf-8")
+    return response
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def limiter(clock):
+    return RateLimiter(min_interval=1.0, max_wait=900, clock=clock, sleep=clock.sleep)
+
+
+def test_min_interval_between_requests_without_headers(limiter, clock):
+    assert limiter.acquire()
+    clock.now += 0.25
+    assert limiter.acquire()
+
+    assert clock.sleeps == [0.75]
+
+
+def test_waits_until_reset_when_remaining_is_exhausted(limiter, clock):
+    limiter.acquire()
+    limiter.update({"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(clock.now + 120)})
+
+    assert limiter.acquire()
+    assert clock.sleeps == [121]
+    # リセット後は残り回数不明に戻り、最小間隔だけ空ける
+    assert limiter.acquire()
+    assert clock.sleeps == [121, 1.0]
+
+
+def test_remaining_tokens_are_used_without_waiting_for_reset(limiter, clock):
+    limiter.update({"x-rate-limit-remaining": "2", "x-rate-limit-reset": str(clock.now + 600)})
+
+    assert limiter.acquire() and limiter.acquire()
+    assert clock.sleeps == [1.0]
+    assert limiter.remaining == 0
+
+
+def test_strictest_window_wins(limiter, clock):
+    limiter.update({
+        "x-rate-limit-remaining": "50",
+        "x-rate-limit-reset": str(clock.now + 60),
+        "x-user-limit-24hour-remaining": "0",
+        "x-user-limit-24hour-reset": str(clock.now + 300),
+    })
+
+    assert limiter.wait_seconds() == 301
+
+
+def test_gives_up_when_reset_is_beyond_max_wait(limiter, clock):
+    limiter.update({"x-app-limit-24hour-remaining": "0", "x-app-limit-24hour-reset": str(clock.now + 3600)})
+
+    assert not limiter.acquire()
+    assert clock.sleeps == []
+
+
+def test_exhaust_without_headers_waits_fifteen_minutes(limiter, clock):
+    limiter.exhaust({})
+
+    assert limiter.wait_seconds() == 15 * 60 + 1
+
+
+class FakeClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def create_tweet(self, text, in_reply_to_tweet_id=None):
+        self.calls.append((text, in_reply_to_tweet_id))
+        response = self.responses.pop(0)
+        if response.status_code == 429:
+            raise tweepy.TooManyRequests(response)
+        return response
+
+
+def test_post_thread_paces_by_headers_and_chains_replies(limiter, clock):
+    reset = clock.now + 100
+    poster = XPoster("k", "s", "t", "ts", limiter=limiter)
+    poster._client = FakeClient([
+        _response(201, {"x-rate-limit-remaining": "1", "x-rate-limit-reset": str(reset)}, {"data": {"id": "1"}}),
+        _response(201, {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset)}, {"data": {"id": "2"}}),
+        _response(429, {"x-rate-limit-remaining": "0", "x-rate-limit-reset": str(reset + 200)}),
+        _response(201, {}, {"data": {"id": "3"}}),
+    ])
+
+    assert poster.post_thread(["a", "b", "c"], in_reply_to_tweet_id="0") == ["1", "2", "3"]
+    assert poster._client.calls == [("a", "0"), ("b", "1"), ("c", "2"), ("c", "2")]
+    # 1件目の後は最小間隔、残り0になったらリセット（+1秒）まで、429 の後はそのリセット（+1秒）まで待つ
+    assert clock.sleeps == [1.0, 100.0, 200.0]